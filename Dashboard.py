@@ -1,79 +1,80 @@
 import streamlit as st
 from utils import navbar, footer  # Changed from pages.utils to utils
 import pandas as pd
-import os
-import gdown
 import matplotlib.pyplot as plt
 import seaborn as sns
-import time # Added import for time.sleep
+from data_store import get_store
+from aggregates import monthly_trend
+from instrumentation import timed, span, start_rerun, dev_panel
 
-@st.cache_data
-def load_data():
-    # Create a data directory if it doesn't exist
-    data_dir = "data"
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-
-    # Local file paths
-    employee_excel = os.path.join(data_dir, "employee_data.xlsx")
-    target_excel = os.path.join(data_dir, "target_data.xlsx")
-    agent_perf_csv = os.path.join(data_dir, "agent_perf.csv") # Added agent_perf.csv path
+# The data store hands out shallow views of its shared frames. Copy-on-write
+# makes any change a page makes land in a private copy instead of the shared
+# data. It is set by each page script (any page can be the first to run in the
+# app process) rather than by the store, so scripts and notebooks keep pandas' defaults.
+pd.set_option("mode.copy_on_write", True)
 
-    # Read Excel files and CSV file
+@timed(name="dashboard.load_data")
+def load_data():
+    # Shared with the other pages through the process-wide data store
     try:
-        employee_df = pd.read_excel(employee_excel)
-        target_df = pd.read_excel(target_excel)
-        agent_perf_df = pd.read_csv(agent_perf_csv) # Load agent_perf.csv
-
-        # Convert date columns
-        date_columns = ['agent_join_month', 'first_policy_sold_month', 'year_month']
-        for col in date_columns:
-            if col in employee_df.columns: # Check if col exists in employee_df
-                employee_df[col] = pd.to_datetime(employee_df[col], errors='coerce')
-            if col in target_df.columns: # Added check if col exists
-                target_df[col] = pd.to_datetime(target_df[col], errors='coerce') # Added errors='coerce'
-
-        return employee_df, target_df, agent_perf_df # Added agent_perf_df to return
+        store = get_store()
+        return store.employee(), store.nill_flags()
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
-        return None, None, None # Added None for agent_perf_df
+        return None, None
 
 st.set_page_config(page_title="ABC Company Dashboard", layout="wide")
+start_rerun("Dashboard")
 
 # START SPLASH SCREEN
-splash_placeholder = st.empty()
-logo_path = "assets/logo.png"  # Relative path from Dashboard.py
+# Only shown on a cold start, for as long as the shared datasets are actually loading
+store = get_store()
+load_error = None
+if not store.is_loaded('employee'):
+    splash_placeholder = st.empty()
+    logo_path = "assets/logo.png"  # Relative path from Dashboard.py
 
-with splash_placeholder.container():
-    # CSS to hide the sidebar
-    st.markdown("""
-        <style>
-            section[data-testid="stSidebar"] {display: none;}
-        </style>
-    """, unsafe_allow_html=True)
-    
-    # Use columns for horizontal centering and add manual vertical spacing
-    st.markdown("<br>" * 8, unsafe_allow_html=True)  # Adjust for vertical positioning
+    with splash_placeholder.container():
+        # CSS to hide the sidebar
+        st.markdown("""
+            <style>
+                section[data-testid="stSidebar"] {display: none;}
+            </style>
+        """, unsafe_allow_html=True)
+
+        # Use columns for horizontal centering and add manual vertical spacing
+        st.markdown("<br>" * 8, unsafe_allow_html=True)  # Adjust for vertical positioning
 
-    s_col1, s_col2, s_col3 = st.columns([1, 1.5, 1])  # Middle column for content
-    with s_col2:
-        st.image(logo_path, width=250)  # Display logo
-        st.markdown("<h2 style='text-align: center;'>Loading Your Dashboard...</h2>", unsafe_allow_html=True)
+        s_col1, s_col2, s_col3 = st.columns([1, 1.5, 1])  # Middle column for content
+        with s_col2:
+            st.image(logo_path, width=250)  # Display logo
+            st.markdown("<h2 style='text-align: center;'>Loading Your Dashboard...</h2>", unsafe_allow_html=True)
+            progress = st.progress(0, text="Loading agent data...")
 
-    st.markdown("<br>" * 8, unsafe_allow_html=True)  # Adjust for vertical positioning
+        st.markdown("<br>" * 8, unsafe_allow_html=True)  # Adjust for vertical positioning
 
-time.sleep(3)  # Display splash screen for 3 seconds
-splash_placeholder.empty()  # Clear the splash screen
+    # Load through the store; a missing or unreadable data file or snapshot is
+    # reported once the splash is gone
+    try:
+        store.employee()
+        progress.progress(70, text="Loading NILL scores...")
+        store.nill_flags()
+        progress.progress(100, text="Ready")
+    except (OSError, ValueError) as e:
+        load_error = e
+    splash_placeholder.empty()  # Clear the splash screen
+    if load_error is not None:
+        st.error(f"Error loading data: {str(load_error)}")
 # END SPLASH SCREEN
 
 navbar()
 
 st.title("Dashboard") # Added title
 
-# Load data
-employee_df, target_df, agent_perf_df = load_data() # Unpack agent_perf_df
+# Load data (already reported above if the splash screen could not load it)
+employee_df, target_df = load_data() if load_error is None else (None, None)
 
-if employee_df is not None and target_df is not None and agent_perf_df is not None: # Check agent_perf_df
+if employee_df is not None and target_df is not None:
     # Custom CSS for metrics container
     st.markdown("""
         <style>
@@ -131,18 +132,17 @@ if employee_df is not None and target_df is not None and agent_perf_df is not No
     # Productivity Trends section
     st.markdown("<h2 style='text-align: center; margin-top: 2rem;'>Productivity Trends</h2>", unsafe_allow_html=True)
     
-    # Calculate sales by month
-    sales_by_month = employee_df.groupby('year_month').agg({
-        'new_policy_count': 'sum',
-        'ANBP_value': 'sum'
-    }).reset_index()
-    
-    # Convert year_month to datetime if it's not already
-    sales_by_month['year_month'] = pd.to_datetime(sales_by_month['year_month'])
+    # The KPI cards above are already on screen while the trends are computed
+    with st.spinner("Loading productivity trends..."), span("dashboard.monthly_trend"):
+        # Monthly totals from the precomputed aggregate cube (no scan of the raw rows)
+        sales_by_month = monthly_trend(store.aggregate_cube(), ['new_policy_count', 'ANBP_value'])
+
+        # Convert year_month to datetime if it's not already
+        sales_by_month['year_month'] = pd.to_datetime(sales_by_month['year_month'])
     
     left, right = st.columns(2)
     
-    with left:
+    with left, span("dashboard.policy_chart"):
         # Plot New Policy Count trend
         fig1, ax1 = plt.subplots(figsize=(10, 6))
         ax1.plot(sales_by_month['year_month'], sales_by_month['new_policy_count'], marker='o')
@@ -153,8 +153,9 @@ if employee_df is not None and target_df is not None and agent_perf_df is not No
         plt.xticks(rotation=45)
         plt.tight_layout()
         st.pyplot(fig1)
+        plt.close(fig1)
         
-    with right:
+    with right, span("dashboard.anbp_chart"):
         # Plot ANBP Value trend
         fig2, ax2 = plt.subplots(figsize=(10, 6))
         ax2.plot(sales_by_month['year_month'], sales_by_month['ANBP_value'], marker='o', color='orange')
@@ -165,27 +166,24 @@ if employee_df is not None and target_df is not None and agent_perf_df is not No
         plt.xticks(rotation=45)
         plt.tight_layout()
         st.pyplot(fig2)
+        plt.close(fig2)
 
     # Employee Classification section
     st.markdown("<h2 style='text-align: center; margin-top: 2rem;'>Agent Classification</h2>", unsafe_allow_html=True)
     
-    # Classify agents based on performance_group from agent_perf.csv
-    if 'performance_group' in agent_perf_df.columns:
-        performance_counts = agent_perf_df['performance_group'].value_counts()
-        high_performers = performance_counts.get('High', 0)
-        medium_performers = performance_counts.get('Mid', 0)
-        low_performers = performance_counts.get('Low', 0)
-    else:
-        st.warning("Column 'performance_group' not found in agent_perf.csv. Displaying zeros.")
-        high_performers = 0
-        medium_performers = 0
-        low_performers = 0    # Add spacing before the chart section
+    # Classify agents live from the employee data (one vectorized pass over all agents)
+    with st.spinner("Classifying agents..."), span("dashboard.classification"):
+        performance_counts = store.agent_classification()['performance_status'].value_counts()
+    high_performers = int(performance_counts.get('High', 0))
+    medium_performers = int(performance_counts.get('Medium', 0))
+    low_performers = int(performance_counts.get('Low', 0))
+    # Add spacing before the chart section
     st.markdown("<div style='height: 2rem;'></div>", unsafe_allow_html=True)
     
     # Create columns with equal width
     chart_col, spacer, legend_col = st.columns([1, 0.1, 1])
     
-    with chart_col:        # Modern Donut Chart with enhanced styling
+    with chart_col, span("dashboard.donut_chart"):        # Modern Donut Chart with enhanced styling
         fig, ax = plt.subplots(figsize=(2, 2), facecolor='none') # Reduced size
         fig.patch.set_alpha(0.0)
         ax.patch.set_alpha(0.0)
@@ -225,6 +223,7 @@ if employee_df is not None and target_df is not None and agent_perf_df is not No
         
         plt.axis('equal')
         st.pyplot(fig)
+        plt.close(fig)
     
     with legend_col:
         # Custom legend with colored squares
@@ -281,7 +280,9 @@ if employee_df is not None and target_df is not None and agent_perf_df is not No
     footer()
 
 else:
-    st.error("Unable to load data. Please check your file paths and ensure the files (employee_data.xlsx, target_data.xlsx, agent_perf.csv) are accessible in the 'data' directory.")
+    st.error("Unable to load data. Please check your file paths and ensure the files (employee_data.xlsx, target_data.xlsx) are accessible in the 'data' directory.")
     
     # Add footer at the end of the page even if data loading fails
     footer()
+
+dev_panel()
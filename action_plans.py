@@ -0,0 +1,211 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from classification import classify_all_agents
+from compact import month_ordinals
+from agent_index import AgentIndex
+from action_rules import ACTION_PLAN_RULES
+
+# Latest-month columns carried into the plan metrics, renamed where the rules expect it
+_LATEST_COLUMNS = {
+    'unique_proposals_last_7_days': 'unique_proposals_last_7_days',
+    'unique_customers_last_7_days': 'unique_customers_last_7_days',
+    'unique_proposals_last_21_days': 'unique_proposals_last_21_days',
+    'unique_customers_last_21_days': 'unique_customers_last_21_days',
+    'new_policy_count': 'new_policy_count_last_month',
+    'unique_proposal': 'unique_proposal_last_month',
+    'unique_customers': 'unique_customers_last_month',
+}
+
+
+def build_agent_metrics(employee_df, classification=None, index=None):
+    """One row of plan inputs per agent: latest-month activity plus classification KPIs.
+
+    index: an AgentIndex of employee_df (e.g. the data store's) to reuse instead of sorting again.
+    """
+    if classification is None:
+        classification = classify_all_agents(employee_df)
+    if index is None or not index.covers(employee_df):
+        index = AgentIndex(employee_df)
+    latest = index.latest_rows()
+    latest.index = pd.Index(latest['agent_code'].astype(str).to_numpy(), name='agent_code')
+
+    metrics = latest[list(_LATEST_COLUMNS)].rename(columns=_LATEST_COLUMNS)
+    metrics['tenure_months'] = month_ordinals(latest['year_month']) - month_ordinals(latest['agent_join_month'])
+    metrics['avg_proposal_to_quotation_ratio'] = classification['avg_proposal_to_quotation_ratio']
+    metrics['avg_quotation_to_policy_ratio'] = classification['avg_quotation_to_policy_ratio']
+    metrics['performance_category'] = classification['performance_category'].astype(str)
+    metrics['performance_status'] = classification['performance_status'].astype(str)
+    return metrics
+
+
+def _plan_from_rule(agent_code, performance_category, performance_status, profile, sub_profile, issue, action_codes):
+    insights = [f"Recent Performance Category: {performance_category}",
+                f"Performance Status: {performance_status}"]
+    if profile:
+        insights.append(f"Profile: {profile}")
+    if sub_profile:
+        insights.append(f"Sub-Profile: {sub_profile}")
+    if issue:
+        insights.append(f"Issue: {issue}")
+    return {
+        'agent_code': agent_code,
+        'at_nill_risk': True,
+        'performance_category': performance_category,
+        'performance_status': performance_status,
+        'title': f"Personalized Action Plan for Agent {agent_code} (Flagged for NILL Risk)",
+        'insights': insights,
+        'action_codes': list(action_codes),
+        'actions': ACTION_PLAN_RULES.action_texts(action_codes),
+    }
+
+
+def _not_flagged_plan(agent_code, performance_category, performance_status):
+    return {
+        'agent_code': agent_code,
+        'at_nill_risk': False,
+        'performance_category': performance_category,
+        'performance_status': performance_status,
+        'title': f"Personalized Action Plan for Agent {agent_code}",
+        'insights': [f"Agent {agent_code}: Not currently flagged for NILL risk. General performance advice can be provided if needed."],
+        'action_codes': [],
+        'actions': [],
+    }
+
+
+def plan_for_agent(agent_code, metrics, target_nill_risk_flag, performance_category=None, performance_status=None):
+    """
+    Build the action plan for one agent without touching the UI.
+
+    metrics: mapping with the agent's LATEST month activity ('tenure_months',
+             'unique_proposals_last_7_days', 'new_policy_count_last_month', ...)
+             and the averaged conversion ratios used by the Low performer rules.
+    performance_category / performance_status: High / Not High and
+             High / Medium / Low from classification.classify_all_agents
+             (default: the same keys of metrics, else 'No Data').
+    target_nill_risk_flag: 0 if at NILL risk, 1 if not (as in target_data.xlsx)
+
+    Returns a dict with the title, diagnostic insights and action codes/texts.
+    """
+    if performance_category is None:
+        performance_category = metrics.get('performance_category', 'No Data')
+    if performance_status is None:
+        performance_status = metrics.get('performance_status', 'No Data')
+    if target_nill_risk_flag != 0:
+        return _not_flagged_plan(agent_code, performance_category, performance_status)
+
+    row = {key: np.asarray([value]) for key, value in metrics.items()}
+    row['performance_category'] = np.asarray([performance_category], dtype=object)
+    row['performance_status'] = np.asarray([performance_status], dtype=object)
+    result = ACTION_PLAN_RULES.evaluate(row).iloc[0]
+    return _plan_from_rule(agent_code, performance_category, performance_status, result['profile'], result['sub_profile'],
+                           result['issue'], result['action_codes'])
+
+
+def evaluate_action_plans(metrics):
+    """Decision-table outputs (rule, profile, sub_profile, issue, action_codes) for every row of metrics."""
+    return metrics.join(ACTION_PLAN_RULES.evaluate(metrics))
+
+
+def format_plan(plan):
+    """Plain-text lines of a plan: title, then the numbered SMART actions."""
+    if not plan['at_nill_risk']:
+        return plan['insights'][:1]
+    lines = [plan['title']]
+    if plan['actions']:
+        lines.append("\nRecommended SMART Actions:")
+        for i, item in enumerate(plan['actions']):
+            lines.append(f"{i+1}. {item}")
+    else:
+        lines.append("No specific automated actions identified for this NILL risk profile. Manager to conduct immediate manual review and develop a tailored plan.")
+    return lines
+
+
+def _plan_chunk(chunk):
+    results = evaluate_action_plans(chunk)
+    plans = []
+    for code, row in zip(results.index, results.itertuples(index=False)):
+        if row.target != 0:
+            plans.append(_not_flagged_plan(code, row.performance_category, row.performance_status))
+        else:
+            plans.append(_plan_from_rule(code, row.performance_category, row.performance_status, row.profile, row.sub_profile,
+                                         row.issue, row.action_codes))
+    return plans
+
+
+def generate_action_plans(employee_df, target_df, agent_codes=None, workers=None, chunk_size=5000,
+                          classification=None, index=None):
+    """Build plans for many agents in one call.
+
+    agent_codes defaults to every agent flagged for NILL risk (target == 0) in
+    target_df. The decision table is evaluated over all agents at once; with
+    workers > 1 the agents are split into chunks evaluated in a process pool.
+    classification and index are passed on to build_agent_metrics.
+    """
+    flags = target_df.assign(agent_code=target_df['agent_code'].astype(str)).set_index('agent_code')['target']
+    if agent_codes is None:
+        agent_codes = flags.index[flags == 0].tolist()
+    agent_codes = [str(code) for code in agent_codes]
+
+    metrics = build_agent_metrics(employee_df, classification, index).reindex(agent_codes)
+    metrics['performance_category'] = metrics['performance_category'].fillna('No Data')
+    metrics['performance_status'] = metrics['performance_status'].fillna('No Data')
+    # Agents missing from target_data are treated as flagged, as a single-agent call would be
+    metrics['target'] = flags.reindex(agent_codes).fillna(0).to_numpy()
+
+    chunks = [metrics.iloc[i:i + chunk_size] for i in range(0, len(metrics), chunk_size)]
+    if workers and workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return [plan for chunk in pool.map(_plan_chunk, chunks) for plan in chunk]
+    return [plan for chunk in chunks for plan in _plan_chunk(chunk)]
+
+
+def plans_to_frame(plans):
+    """Flatten plans to one row per agent (insights and actions joined with ' | ')."""
+    return pd.DataFrame([{
+        'agent_code': plan['agent_code'],
+        'at_nill_risk': plan['at_nill_risk'],
+        'performance_category': plan['performance_category'],
+        'performance_status': plan['performance_status'],
+        'title': plan['title'],
+        'insights': " | ".join(plan['insights']),
+        'action_codes': " | ".join(plan['action_codes']),
+        'actions': " | ".join(plan['actions']),
+    } for plan in plans])
+
+
+def export_plans(plans, path):
+    """Write plans to .json (structured) or .csv (flattened), chosen by extension."""
+    if path.lower().endswith(".json"):
+        with open(path, "w") as f:
+            json.dump(plans, f, indent=2, default=str)
+    else:
+        plans_to_frame(plans).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    from data_store import get_store
+
+    parser = argparse.ArgumentParser(description="Generate action plans for every NILL-risk agent.")
+    parser.add_argument("--out", default="action_plans.csv", help="Output file (.csv or .json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes to plan with (1 = serial)")
+    parser.add_argument("--agents", nargs="*", help="Agent codes to plan for (default: all flagged agents)")
+    parser.add_argument("--min-streak", type=int, help="Only agents with at least this many months without a sale in a row")
+    parser.add_argument("--months-without-sale", type=int, help="Only agents without a sale in this many months")
+    args = parser.parse_args()
+
+    store = get_store()
+    flags = store.nill_flags()
+    agent_codes = args.agents
+    if args.min_streak is not None or args.months_without_sale is not None:
+        selected = set(store.streak_index().select(args.min_streak, args.months_without_sale))
+        candidates = agent_codes or flags.loc[flags['target'] == 0, 'agent_code'].astype(str)
+        agent_codes = [code for code in candidates if code in selected]
+    plans = generate_action_plans(store.employee(), flags, agent_codes=agent_codes, workers=args.workers,
+                                  classification=store.agent_classification(), index=store.agent_index())
+    export_plans(plans, args.out)
+    print(f"Wrote {len(plans)} action plans to {args.out}")
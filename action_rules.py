@@ -0,0 +1,294 @@
+import operator
+import numpy as np
+import pandas as pd
+from classification import STATUS_LABELS
+
+# These are for LATEST activity, not for overall classification
+THRESHOLDS = {
+    "low_tenure": 6, # months
+    "moderate_tenure": 12,
+    "proposals_7d_low": 2,
+    "proposals_7d_moderate": 5,
+    "customers_7d_low": 2,
+    "proposals_monthly_high_activity": 20, # Indicates high effort last month
+    "policies_last_month_low_conversion": 2, # if high proposal activity
+    "proposals_21d_very_low": 4,
+    "customers_21d_very_low": 4
+}
+
+# Action codes referenced by the decision table
+ACTIONS = {
+    "T1": "T1: Attend 2-day intensive prospecting & lead generation workshop. (Time: Next 7 days)",
+    "M1": "M1: Shadow a top-performing senior agent for 3 client meetings. (Time: Next 10 days)",
+    "AG1_5_5": "AG1(5, 5): Generate min. 5 unique proposals & 5 unique customer contacts weekly. (Time: Next 2 weeks)",
+    "MS1_WEEKLY": "MS1: Weekly check-ins with manager. (Time: Ongoing for 4 weeks)",
+    "T2": "T2: Attend 'Closing Techniques & Objection Handling' module. (Time: Next 7 days)",
+    "SP1": "SP1: Role-play 3 sales scenarios focusing on closing. (Time: Next 10 days)",
+    "M2": "M2: Weekly 30-min coaching with mentor. (Time: Next 4 weeks)",
+    "AG2_1": "AG2(1): Aim for at least 1 new policy this month. (Time: This month)",
+    "MS1_DAILY_NEW": "MS1: Intensive daily check-ins with manager for 1 week to diagnose specific hurdles for new agents.",
+    "ONBOARDING_REVIEW": "Review onboarding materials and identify knowledge gaps.",
+    "RA1_URGENT": "RA1: Urgent discussion with manager: Understand external factors or sudden changes impacting performance. (Time: Next 24h)",
+    "CLIENT_REVIEW": "Review recent client interactions for any negative feedback or lost deals.",
+    "MS1_SUPPORTIVE": "MS1: Supportive check-ins, focus on problem-solving not pressure. (Time: Ongoing)",
+    "RA1_JOINT_REVIEW": "RA1: Joint review with manager on recent performance trends & pipeline health. (Time: Next 3 days)",
+    "RA2": "RA2: Review top 20 dormant leads/past clients. (Time: Next 7 days)",
+    "AG1_7_7": "AG1(7, 7): Re-energize pipeline: min. 7 proposals & 7 customer contacts weekly. (Time: Next 2 weeks)",
+    "SKILL_GAP": "Skill Gap Analysis: Identify specific areas (prospecting, closing, product) needing a refresher with manager.",
+    "T3": "T3: Targeted refresher training based on gap analysis.",
+    "T_QUALIFY": "T_Qualify: Training on qualifying leads and transitioning conversations to proposals.",
+    "SP_PROPOSE": "SP_Propose: Role-play initial customer interactions to proposal stage.",
+    "MS2": "MS2: Manager to review 5 recent proposals for quality, targeting, and value proposition.",
+    "T_PROPOSAL_WRITE": "T_ProposalWrite: Workshop on effective proposal writing and customization.",
+    "SP1_QUOTES": "SP1: Role-play 3 sales scenarios focusing on closing quotes. (Time: Next 10 days)",
+    "PIP_CONSIDER": "PIP_Consider: Consider initiating a formal Performance Improvement Plan (PIP).",
+    "MS1_FUNDAMENTALS": "MS1: Intensive weekly coaching on fundamentals with manager.",
+    "AG2_1_CONFIDENCE": "AG2(1): Set a very small, achievable goal of 1 policy to build confidence. (Time: This month)",
+    "RA1_DEEP_DIVE": "RA1: Deep-dive review with manager. (Time: Next 2 days)",
+    "KEY_BARRIER": "Identify 1 key barrier and 1 small win to achieve in the next 3 days.",
+    "MS1_DAILY_WEEK": "MS1: Implement daily check-ins with manager for one week. (Time: Next 7 days)",
+    "RA_MANUAL": "RA_MANUAL: Agent is at NILL risk. Current metrics do not fit a predefined profile. Requires immediate manual review by manager to diagnose and plan.",
+}
+
+# Action-plan rules for agents flagged at NILL risk. Rows are checked top to
+# bottom and the first row whose conditions all hold wins. A condition is
+# "<column> <op> <value>", where value is a number, a THRESHOLDS key, a quoted
+# string or another column (optionally "* factor"); "or" joins alternatives.
+# Performance rules use the High / Medium / Low performance_status of
+# classification.classify_all_agents.
+DECISION_TABLE = [
+    # --- Scenario 1: New Agents at NILL Risk ---
+    {"rule": "new_low_activity",
+     "when": ["tenure_months < low_tenure",
+              "unique_proposals_last_7_days < proposals_7d_low or unique_customers_last_7_days < customers_7d_low"],
+     "profile": "New Agent at NILL Risk", "sub_profile": "Low Recent Activity",
+     "actions": ["T1", "M1", "AG1_5_5", "MS1_WEEKLY"]},
+    {"rule": "new_no_recent_sales",
+     "when": ["tenure_months < low_tenure", "new_policy_count_last_month == 0"],
+     "profile": "New Agent at NILL Risk", "sub_profile": "Active but No Recent Sales (Conversion Issue)",
+     "actions": ["T2", "SP1", "M2", "AG2_1"]},
+    {"rule": "new_general",
+     "when": ["tenure_months < low_tenure"],
+     "profile": "New Agent at NILL Risk",
+     "actions": ["MS1_DAILY_NEW", "ONBOARDING_REVIEW"]},
+
+    # --- Scenario 2: Experienced Agents at NILL Risk ---
+    {"rule": "experienced_high_anomaly",
+     "when": ["tenure_months >= low_tenure", "performance_status == 'High'"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "High Performer Anomaly",
+     "actions": ["RA1_URGENT", "CLIENT_REVIEW", "MS1_SUPPORTIVE"]},
+    {"rule": "experienced_medium_stalled",
+     "when": ["tenure_months >= low_tenure", "performance_status == 'Medium'", "new_policy_count_last_month == 0"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "Medium Performer Dip",
+     "actions": ["RA1_JOINT_REVIEW", "RA2", "AG1_7_7"]},
+    {"rule": "experienced_medium_general",
+     "when": ["tenure_months >= low_tenure", "performance_status == 'Medium'"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "Medium Performer Dip",
+     "actions": ["SKILL_GAP", "T3"]},
+    {"rule": "experienced_low_customer_to_proposal",
+     "when": ["tenure_months >= low_tenure", "performance_status == 'Low'",
+              "unique_proposal_last_month < unique_customers_last_month * 0.5", "unique_customers_last_month > 15"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "Consistent Low Performer (Critical)",
+     "issue": "Not converting customer interactions to proposals effectively.",
+     "actions": ["T_QUALIFY", "SP_PROPOSE"]},
+    {"rule": "experienced_low_proposal_to_quotation",
+     "when": ["tenure_months >= low_tenure", "performance_status == 'Low'", "avg_proposal_to_quotation_ratio > 1.5"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "Consistent Low Performer (Critical)",
+     "issue": "Proposals not converting to Quotations (poor proposal quality/fit).",
+     "actions": ["MS2", "T_PROPOSAL_WRITE"]},
+    {"rule": "experienced_low_quotation_to_policy",
+     "when": ["tenure_months >= low_tenure", "performance_status == 'Low'", "avg_quotation_to_policy_ratio < 1.0"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "Consistent Low Performer (Critical)",
+     "issue": "Quotations not converting to Policies (closing/objection handling).",
+     "actions": ["T2", "SP1_QUOTES"]},
+    {"rule": "experienced_low_general",
+     "when": ["tenure_months >= low_tenure", "performance_status == 'Low'"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "Consistent Low Performer (Critical)",
+     "actions": ["PIP_CONSIDER", "MS1_FUNDAMENTALS", "AG2_1_CONFIDENCE"]},
+    {"rule": "experienced_general",
+     "when": ["tenure_months >= low_tenure"],
+     "profile": "Experienced Agent at NILL Risk", "sub_profile": "General NILL Risk for Experienced Agent",
+     "actions": ["RA1_DEEP_DIVE", "KEY_BARRIER", "MS1_DAILY_WEEK"]},
+
+    # Fallback if no specific plan applies (e.g. unknown tenure)
+    {"rule": "manual_review",
+     "when": [],
+     "profile": "Undetermined NILL Risk (Requires Manual Review)",
+     "actions": ["RA_MANUAL"]},
+]
+
+# Values assumed for inputs that are missing altogether (anything else defaults to 0)
+MISSING_DEFAULTS = {
+    'avg_proposal_to_quotation_ratio': 2,
+    'avg_quotation_to_policy_ratio': 1,
+    'performance_status': 'No Data',
+}
+
+# Every value a text input column can take; rules comparing against any other value could never fire
+COLUMN_VALUES = {
+    'performance_status': STATUS_LABELS + ['No Data'],
+}
+
+_OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+              '==': operator.eq, '!=': operator.ne}
+
+
+def _parse_number(token):
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def _compile_operand(tokens, thresholds):
+    """Turn the right-hand side of a condition into a function of the column arrays."""
+    token = tokens[0]
+    if token[0] in "'\"":
+        value = token.strip("'\"")
+        return lambda cols: value, set()
+    number = _parse_number(token)
+    if number is None and token in thresholds:
+        number = float(thresholds[token])
+    if number is not None:
+        return lambda cols: number, set()
+    # Another column, optionally scaled: "<column> * <factor>"
+    factor = 1.0
+    if len(tokens) == 3 and tokens[1] == '*':
+        factor = _parse_number(tokens[2])
+        if factor is None:
+            raise ValueError(f"Bad factor in condition operand: {' '.join(tokens)}")
+    elif len(tokens) != 1:
+        raise ValueError(f"Cannot parse condition operand: {' '.join(tokens)}")
+    return lambda cols: cols[token] * factor, {token}
+
+
+def _compile_comparison(text, thresholds):
+    tokens = text.split()
+    if len(tokens) < 3 or tokens[1] not in _OPERATORS:
+        raise ValueError(f"Cannot parse condition: {text!r}")
+    column, compare = tokens[0], _OPERATORS[tokens[1]]
+    rhs, columns = _compile_operand(tokens[2:], thresholds)
+    return (lambda cols: compare(cols[column], rhs(cols))), columns | {column}
+
+
+def _string_comparisons(text):
+    """(column, value) for each "<column> == '<value>'" part of a condition."""
+    pairs = []
+    for part in text.split(" or "):
+        tokens = part.split()
+        if len(tokens) == 3 and tokens[1] == '==' and tokens[2][0] in "'\"":
+            pairs.append((tokens[0], tokens[2].strip("'\"")))
+    return pairs
+
+
+def check_reachable(rows, column_values=COLUMN_VALUES):
+    """Raise ValueError if any rule can never be the first match.
+
+    A rule is unreachable when it compares a text column against a value the
+    column never takes, or when an earlier rule's conditions are a subset of
+    its own (the earlier rule then always wins).
+    """
+    for i, row in enumerate(rows):
+        for text in row.get("when", []):
+            for column, value in _string_comparisons(text):
+                if column in column_values and value not in column_values[column]:
+                    raise ValueError(f"Rule {row['rule']!r} compares {column} with {value!r}, "
+                                     f"which only takes {column_values[column]}")
+        conditions = set(row.get("when", []))
+        for earlier in rows[:i]:
+            if set(earlier.get("when", [])) <= conditions:
+                raise ValueError(f"Rule {row['rule']!r} is unreachable: rule {earlier['rule']!r} "
+                                 f"comes first and matches whenever it does")
+
+
+def _compile_condition(text, thresholds):
+    """A condition with optional 'or' alternatives -> (predicate, columns used)."""
+    parts = [_compile_comparison(part.strip(), thresholds) for part in text.split(" or ")]
+    columns = set().union(*(used for _, used in parts))
+
+    def predicate(cols):
+        result = np.asarray(parts[0][0](cols), dtype=bool)
+        for compare, _ in parts[1:]:
+            result = result | compare(cols)
+        return result
+    return predicate, columns
+
+
+class DecisionTable:
+    """A decision table compiled once into vectorized predicates.
+
+    evaluate() takes a DataFrame (or mapping of equal-length arrays) with one
+    row per agent and returns the winning rule, profile, sub-profile, issue and
+    action codes for every row, without any per-row Python branching.
+    """
+
+    def __init__(self, rows=DECISION_TABLE, thresholds=THRESHOLDS, actions=ACTIONS, column_values=COLUMN_VALUES):
+        self.rows = list(rows)
+        check_reachable(self.rows, column_values)
+        self.actions = actions
+        self.columns = set()
+        self._predicates = []
+        for row in self.rows:
+            unknown = [code for code in row.get("actions", []) if code not in actions]
+            if unknown:
+                raise ValueError(f"Rule {row['rule']!r} references unknown actions {unknown}")
+            compiled = [_compile_condition(text, thresholds) for text in row.get("when", [])]
+            for _, used in compiled:
+                self.columns |= used
+            self._predicates.append([predicate for predicate, _ in compiled])
+
+        # Per-rule outputs, indexed by the winning rule number
+        self._rule = np.array([row["rule"] for row in self.rows], dtype=object)
+        self._profile = np.array([row.get("profile") for row in self.rows], dtype=object)
+        self._sub_profile = np.array([row.get("sub_profile") for row in self.rows], dtype=object)
+        self._issue = np.array([row.get("issue") for row in self.rows], dtype=object)
+        self._action_codes = np.empty(len(self.rows), dtype=object)
+        self._action_codes[:] = [tuple(row.get("actions", [])) for row in self.rows]
+
+    def _column_arrays(self, frame, n):
+        cols = {}
+        for column in self.columns:
+            if column in frame:
+                values = np.asarray(frame[column])
+            else:
+                # Missing inputs fall back to the same defaults the old if/elif tree used
+                values = np.full(n, MISSING_DEFAULTS.get(column, 0))
+            if values.dtype.kind in "iub":
+                values = values.astype(np.float64)
+            cols[column] = values
+        return cols
+
+    def match(self, frame):
+        """Index of the first matching rule for every row (-1 if none match)."""
+        n = len(frame) if isinstance(frame, pd.DataFrame) else len(next(iter(frame.values())))
+        cols = self._column_arrays(frame, n)
+        winner = np.full(n, -1, dtype=np.int64)
+        undecided = np.ones(n, dtype=bool)
+        for i, predicates in enumerate(self._predicates):
+            hit = undecided.copy()
+            for predicate in predicates:
+                hit &= predicate(cols)
+            winner[hit] = i
+            undecided &= ~hit
+            if not undecided.any():
+                break
+        return winner
+
+    def evaluate(self, frame):
+        winner = self.match(frame)
+        index = frame.index if isinstance(frame, pd.DataFrame) else None
+        take = np.where(winner >= 0, winner, len(self.rows) - 1)
+        return pd.DataFrame({
+            'rule': self._rule[take],
+            'profile': self._profile[take],
+            'sub_profile': self._sub_profile[take],
+            'issue': self._issue[take],
+            'action_codes': self._action_codes[take],
+        }, index=index)
+
+    def action_texts(self, codes):
+        return [self.actions[code] for code in codes]
+
+
+# Compiled once at import; shared by the single-agent and batch planners
+ACTION_PLAN_RULES = DecisionTable()
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from data_ingest import concat_employee_rows
+from compact import with_month_dates
+from instrumentation import cache_event
+
+# Agents whose month-decoded history is kept per index (least recently used evicted first)
+DATED_HISTORY_CACHE_SIZE = 4096
+
+
+def _buffer_address(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.array.codes
+    else:
+        values = series.to_numpy(copy=False)
+    return values.__array_interface__['data'][0]
+
+
+class AgentIndex:
+    """Employee rows sorted by (agent_code, year_month) with per-agent slice offsets.
+
+    Each agent's history is a contiguous block of `frame`, so looking it up is a
+    dictionary hit plus a positional slice instead of a boolean mask over every row.
+    """
+
+    def __init__(self, df, presorted=False):
+        if not presorted:
+            df = df.sort_values(['agent_code', 'year_month'], kind='stable', ignore_index=True)
+        self.frame = df
+        codes = self.frame['agent_code'].astype(str).to_numpy()
+
+        # Start of each agent's block = rows where the code differs from the previous row
+        if len(codes):
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        else:
+            starts = np.empty(0, dtype=np.int64)
+        self.codes = codes[starts]
+        self.starts = starts
+        self.stops = np.r_[starts[1:], len(codes)].astype(np.int64)
+        self._slices = {code: (int(start), int(stop)) for code, start, stop in zip(self.codes, self.starts, self.stops)}
+
+        # Buffer addresses identify views of `frame` handed out by the data store
+        self._signature = self._frame_signature(self.frame)
+        self._dated = OrderedDict()
+        self._dated_lock = threading.Lock()
+
+    @staticmethod
+    def _frame_signature(df):
+        if 'agent_code' not in df.columns or 'year_month' not in df.columns:
+            return None
+        return len(df), _buffer_address(df['agent_code']), _buffer_address(df['year_month'])
+
+    def __contains__(self, agent_code):
+        return agent_code in self._slices
+
+    def __len__(self):
+        return len(self.codes)
+
+    def covers(self, df):
+        """True when `df` is (a view of) the indexed frame, so its rows line up with the offsets."""
+        return df is self.frame or self._frame_signature(df) == self._signature
+
+    def slice(self, agent_code):
+        start, stop = self._slices.get(agent_code, (0, 0))
+        return slice(start, stop)
+
+    def history(self, agent_code):
+        """All rows for one agent ordered by month (empty frame if the agent is unknown)."""
+        return self.frame.iloc[self.slice(agent_code)]
+
+    def dated_history(self, agent_code):
+        """history() with ordinal month columns decoded to datetimes.
+
+        Each agent's slice is decoded once and cached on this index; the frame
+        is shared between callers, so copy it before modifying it.
+        """
+        with self._dated_lock:
+            dated = self._dated.get(agent_code)
+            if dated is not None:
+                self._dated.move_to_end(agent_code)
+        cache_event('agent_index.dated_history', dated is not None)
+        if dated is not None:
+            return dated
+        dated = with_month_dates(self.history(agent_code))
+        with self._dated_lock:
+            self._dated[agent_code] = dated
+            while len(self._dated) > DATED_HISTORY_CACHE_SIZE:
+                self._dated.popitem(last=False)
+        return dated
+
+    def latest_rows(self):
+        """One row per agent: the most recent month of each history."""
+        return self.frame.iloc[self.stops - 1].reset_index(drop=True)
+
+    def append(self, new_rows):
+        """Return a new index with new_rows merged in; this index and its frame stay untouched.
+
+        When every new row is later than its agent's latest indexed month (the
+        usual monthly append) the rows are spliced in at the end of each agent's
+        block; backfilled months fall back to a full re-sort.
+        """
+        new_rows = new_rows.sort_values(['agent_code', 'year_month'], kind='stable', ignore_index=True)
+        merged = concat_employee_rows([self.frame, new_rows])
+        if not len(self.codes):
+            return AgentIndex(merged)
+        new_codes = new_rows['agent_code'].astype(str).to_numpy()
+
+        positions = np.searchsorted(self.codes, new_codes)
+        known = (positions < len(self.codes)) & (self.codes[np.minimum(positions, len(self.codes) - 1)] == new_codes)
+        if known.any():
+            latest = self.frame['year_month'].to_numpy()[self.stops - 1]
+            if (new_rows['year_month'].to_numpy()[known] <= latest[positions[known]]).any():
+                return AgentIndex(merged)
+
+        # Known agents go after their last row, new agents before the next code's block
+        insert_at = np.where(known, self.stops[np.minimum(positions, len(self.codes) - 1)],
+                             np.r_[self.starts, len(self.frame)][positions])
+        order = np.insert(np.arange(len(self.frame)), insert_at, np.arange(len(self.frame), len(merged)))
+        return AgentIndex(merged.take(order).reset_index(drop=True), presorted=True)
@@ -0,0 +1,118 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from aggregates import AGE_BINS, AGE_LABELS, TENURE_BINS, TENURE_LABELS, PERFORMANCE_LABELS
+from compact import month_ordinals
+
+# Codes sent to the browser per page of search results
+PAGE_SIZE = 50
+NILL_LABELS = ["At risk", "Not at risk"]
+# Facet name -> its labels, in display order
+FACETS = {
+    'performance_group': PERFORMANCE_LABELS,
+    'nill': NILL_LABELS,
+    'tenure_band': TENURE_LABELS,
+    'age_group': AGE_LABELS,
+}
+
+
+def codes_digest(codes):
+    """Short hash of a sequence of agent codes, e.g. to tell whether a `within` restriction changed."""
+    hashes = pd.util.hash_pandas_object(pd.Index(codes).astype(str), index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+class AgentSearchIndex:
+    """Agent codes sorted for prefix search, with a facet column per filter.
+
+    The sorted (lower-cased) codes act as a flattened trie: the agents whose
+    code starts with a prefix are one contiguous range, found by two binary
+    searches. Facet filters are then applied to that range only, as integer
+    comparisons on categorical codes, and just the requested page of matches
+    is returned.
+    """
+
+    def __init__(self, codes, facets):
+        keys = pd.Series(codes, dtype=object).str.lower().to_numpy()
+        self._order = np.argsort(keys, kind='stable')
+        self._keys = keys[self._order]
+        self.codes = np.asarray(codes, dtype=object)[self._order]
+        self._lookup = pd.Index(self.codes)
+        self.facets = {name: pd.Categorical(values, categories=FACETS[name])[self._order]
+                       for name, values in facets.items()}
+
+    @classmethod
+    def build(cls, latest_rows, performance_status, nill_flags):
+        """Index every agent from their latest row (age, tenure), performance class and NILL flag.
+
+        nill_flags is a frame of agent_code and target (0 = at risk), as from AgentDataStore.nill_flags().
+        """
+        codes = latest_rows['agent_code'].astype(str).to_numpy()
+        tenure = month_ordinals(latest_rows['year_month']) - month_ordinals(latest_rows['agent_join_month'])
+        flags = nill_flags.assign(agent_code=nill_flags['agent_code'].astype(str)).drop_duplicates('agent_code', keep='last')
+        target = flags.set_index('agent_code')['target'].reindex(codes).to_numpy(dtype=np.float64, na_value=np.nan)
+        return cls(codes, {
+            'performance_group': performance_status.astype(str).reindex(codes).to_numpy(),
+            'nill': np.where(target == 0, NILL_LABELS[0], np.where(target == 1, NILL_LABELS[1], None)),
+            'tenure_band': pd.cut(tenure, bins=TENURE_BINS, labels=TENURE_LABELS, right=False),
+            'age_group': pd.cut(latest_rows['agent_age'].to_numpy(dtype=np.float64), bins=AGE_BINS,
+                                labels=AGE_LABELS, right=True),
+        })
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _prefix_range(self, prefix):
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return 0, len(self._keys)
+        start = np.searchsorted(self._keys, prefix, side='left')
+        stop = np.searchsorted(self._keys, prefix + '\U0010ffff', side='left')
+        return start, stop
+
+    def _keep(self, start, stop, within, filters):
+        """Mask over positions [start, stop) of the agents passing the facet filters and within."""
+        keep = np.ones(stop - start, dtype=bool)
+        for name, value in filters.items():
+            if value is None or (isinstance(value, (list, tuple)) and not value):
+                continue
+            labels = [value] if isinstance(value, str) else list(value)
+            facet = self.facets[name]
+            allowed = [facet.categories.get_loc(label) for label in labels]
+            keep &= np.isin(facet.codes[start:stop], allowed)
+        if within is not None:
+            positions = self._lookup.get_indexer(pd.Index(within).astype(str))
+            member = np.zeros(len(self.codes), dtype=bool)
+            member[positions[positions >= 0]] = True
+            keep &= member[start:stop]
+        return keep
+
+    def matches(self, agent_code, prefix="", within=None, **filters):
+        """True if agent_code is among the results of search() with the same arguments."""
+        if agent_code not in self._lookup:
+            return False
+        position = self._lookup.get_loc(agent_code)
+        if not self._keys[position].startswith(prefix.strip().lower()):
+            return False
+        return bool(self._keep(position, position + 1, within, filters)[0])
+
+    def search(self, prefix="", page=0, page_size=PAGE_SIZE, within=None, **filters):
+        """One page of agent codes matching a code prefix and facet filters.
+
+        filters map a facet name (see FACETS) to a label or a list of labels;
+        None or an empty list means no filter. within optionally restricts the
+        results to a collection of agent codes. Returns a dict with the page's
+        'codes', the 'total' number of matches, and the (clamped) 'page' and
+        number of 'pages'.
+        """
+        start, stop = self._prefix_range(prefix)
+        matches = np.flatnonzero(self._keep(start, stop, within, filters))
+        pages = max(1, -(-len(matches) // page_size))
+        page = min(max(int(page), 0), pages - 1)
+        rows = matches[page * page_size:(page + 1) * page_size] + start
+        return {
+            'codes': self.codes[rows].tolist(),
+            'total': int(len(matches)),
+            'page': page,
+            'pages': pages,
+        }
@@ -0,0 +1,165 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from compact import month_ordinals
+
+# Metrics laid out along the tensor's last axis
+TENSOR_METRICS = ['new_policy_count', 'ANBP_value', 'net_income', 'unique_proposal', 'unique_quotations',
+                  'unique_customers']
+
+_ARRAYS = ['values', 'mask', 'codes']
+_META_NAME = "meta.json"
+
+
+class AgentTensor:
+    """Dense agents x months x metrics float32 array of the employee data.
+
+    Row i is agent codes[i] (sorted, as in the agent index), column j is month
+    months[j] (every month between the first and last in the data), and
+    mask[i, j] is True where the agent has a row for that month. Cells
+    without a row hold 0. Per-agent series, rolling windows, lags, zero-sale
+    runs and population trends are array operations along the month axis.
+    """
+
+    def __init__(self, values, mask, codes, first_month, metrics=TENSOR_METRICS):
+        self.values = values
+        self.mask = mask
+        self.codes = codes
+        self.first_month = int(first_month)
+        self.metrics = list(metrics)
+        self.months = (np.arange(values.shape[1]) + self.first_month).astype('datetime64[M]')
+        self._positions = {code: i for i, code in enumerate(codes)}
+
+    @classmethod
+    def from_index(cls, index, metrics=TENSOR_METRICS):
+        """Scatter the rows of an AgentIndex into a dense tensor (one pass, no groupby)."""
+        frame = index.frame
+        ordinals = month_ordinals(frame['year_month'])
+        valid = ~np.isnan(ordinals)
+        first = int(ordinals[valid].min()) if valid.any() else 0
+        n_months = int(ordinals[valid].max()) - first + 1 if valid.any() else 0
+
+        # Rows are grouped by agent, so the agent of each row is its block number
+        agent = np.repeat(np.arange(len(index.codes)), index.stops - index.starts)[valid]
+        month = ordinals[valid].astype(np.int64) - first
+        values = np.zeros((len(index.codes), n_months, len(metrics)), dtype=np.float32)
+        for k, metric in enumerate(metrics):
+            values[agent, month, k] = frame[metric].to_numpy(dtype=np.float32, na_value=np.nan)[valid]
+        mask = np.zeros((len(index.codes), n_months), dtype=bool)
+        mask[agent, month] = True
+        return cls(values, mask, np.asarray(index.codes), first, metrics)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, agent_code):
+        return agent_code in self._positions
+
+    def position(self, agent_code):
+        """Row of an agent in the tensor (KeyError if unknown)."""
+        return self._positions[agent_code]
+
+    def metric(self, metric):
+        """(agents x months) view of one metric."""
+        return self.values[:, :, self.metrics.index(metric)]
+
+    def series(self, agent_code, metric):
+        """One agent's monthly values of a metric from their first to last month, indexed by month."""
+        i = self.position(agent_code)
+        months = np.flatnonzero(self.mask[i])
+        if not len(months):
+            return pd.Series(dtype=np.float32, name=metric)
+        span = slice(months[0], months[-1] + 1)
+        values = np.where(self.mask[i, span], self.metric(metric)[i, span], np.nan)
+        return pd.Series(values, index=pd.DatetimeIndex(self.months[span], name='year_month'), name=metric)
+
+    def rolling_sum(self, metric, window):
+        """(agents x months) sums over the last `window` months, each month included."""
+        totals = np.cumsum(self.metric(metric), axis=1, dtype=np.float64)
+        rolled = totals.copy()
+        rolled[:, window:] -= totals[:, :-window]
+        return rolled
+
+    def rolling_mean(self, metric, window):
+        """(agents x months) means over the months with rows in the last `window` months (NaN if none)."""
+        counts = np.cumsum(self.mask, axis=1)
+        rolled_counts = counts.copy()
+        rolled_counts[:, window:] -= counts[:, :-window]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.rolling_sum(metric, window) / np.where(rolled_counts > 0, rolled_counts, np.nan)
+
+    def lag(self, metric, periods=1):
+        """(agents x months) value of a metric `periods` months earlier (NaN where there is no row)."""
+        values = np.where(self.mask, self.metric(metric), np.nan)
+        lagged = np.full(values.shape, np.nan)
+        if 0 < periods < values.shape[1]:
+            lagged[:, periods:] = values[:, :-periods]
+        return lagged
+
+    def zero_runs(self, metric='new_policy_count'):
+        """(agents x months) length of the run of consecutive zero months ending at each month.
+
+        0 where the metric is non-zero or the agent has no row; months without
+        a row end a run.
+        """
+        zero = self.mask & (self.metric(metric) == 0)
+        columns = np.arange(zero.shape[1])
+        last_break = np.maximum.accumulate(np.where(zero, -1, columns), axis=1)
+        return np.where(zero, columns - last_break, 0)
+
+    def population_trend(self, metric, agents=None, how='sum'):
+        """Monthly total ('sum') or mean over agents with rows ('mean') of a metric.
+
+        agents is an optional boolean mask or array of rows (e.g. from position).
+        """
+        values = self.metric(metric)
+        mask = self.mask
+        if agents is not None:
+            values, mask = values[agents], mask[agents]
+        totals = values.sum(axis=0, dtype=np.float64)
+        if how == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                totals = totals / mask.sum(axis=0)
+        elif how != 'sum':
+            raise ValueError(f"Unknown aggregation: {how}")
+        return pd.Series(totals, index=pd.DatetimeIndex(self.months, name='year_month'), name=metric)
+
+    def to_frame(self, metric):
+        """Agents x months pivot of a metric (NaN where there is no row), like the notebooks' agent_monthly_sales."""
+        return pd.DataFrame(np.where(self.mask, self.metric(metric), np.nan),
+                            index=pd.Index(self.codes, name='agent_code'),
+                            columns=pd.DatetimeIndex(self.months, name='year_month'))
+
+    def save(self, directory, key=""):
+        """Write the arrays as .npy files (readable with mmap) plus the metadata, tagged with key."""
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, _META_NAME)
+        # The metadata goes last, so a half-written tensor is never loaded as current
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name in _ARRAYS:
+            tmp_path = os.path.join(directory, f"{name}.tmp.npy")
+            # Codes as fixed-width strings: object arrays cannot be memory-mapped
+            array = getattr(self, name)
+            np.save(tmp_path, array.astype(str) if name == 'codes' else array)
+            os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+        with open(meta_path, "w") as f:
+            json.dump({'key': key, 'first_month': self.first_month, 'metrics': self.metrics,
+                       'shape': list(self.values.shape)}, f)
+
+    @classmethod
+    def load(cls, directory, key=None, mmap=True):
+        """A saved tensor, memory-mapped read-only by default; None if missing or saved under another key."""
+        try:
+            with open(os.path.join(directory, _META_NAME)) as f:
+                meta = json.load(f)
+            if key is not None and meta.get('key') != key:
+                return None
+            mode = 'r' if mmap else None
+            arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in _ARRAYS}
+        except (OSError, ValueError, KeyError):
+            return None
+        if list(arrays['values'].shape) != meta['shape']:
+            return None
+        return cls(arrays['values'], arrays['mask'], np.asarray(arrays['codes']), meta['first_month'], meta['metrics'])
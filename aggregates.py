@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+from compact import month_ordinals, month_dates
+
+# Cube dimensions; performance_group is the agent's High/Medium/Low status
+DIMENSIONS = ['year_month', 'age_group', 'tenure_band', 'performance_group']
+MEASURES = ['new_policy_count', 'ANBP_value', 'net_income', 'unique_proposal', 'unique_quotations', 'unique_customers']
+
+AGE_BINS = [0, 19, 39, 59, np.inf]
+AGE_LABELS = ["Teen", "YoungAdult", "MiddleAge", "Senior"]
+TENURE_BINS = [-np.inf, 6, 12, 24, np.inf]
+TENURE_LABELS = ["<6m", "6-11m", "12-23m", "24m+"]
+PERFORMANCE_LABELS = ["High", "Medium", "Low"]
+
+
+def add_dimensions(df, performance_status):
+    """Attach the cube's dimension columns to employee rows.
+
+    performance_status: Series of High/Medium/Low indexed by agent_code
+    (the 'performance_status' column of classification.classify_all_agents).
+    """
+    rows = df[['agent_code', 'year_month', 'agent_age', 'agent_join_month'] + MEASURES].copy()
+    # Sum compact (int8 / float32) measures in 64 bits; the cube keeps datetime months
+    for column in MEASURES:
+        rows[column] = rows[column].astype(np.int64 if pd.api.types.is_integer_dtype(rows[column].dtype) else np.float64)
+    rows['age_group'] = pd.cut(rows['agent_age'], bins=AGE_BINS, labels=AGE_LABELS, right=True)
+    tenure = pd.Series(month_ordinals(rows['year_month']) - month_ordinals(rows['agent_join_month']), index=rows.index)
+    rows['tenure_band'] = pd.cut(tenure, bins=TENURE_BINS, labels=TENURE_LABELS, right=False)
+    rows['year_month'] = month_dates(rows['year_month'])
+    status = performance_status.astype(str).reindex(rows['agent_code'].astype(str).to_numpy()).to_numpy()
+    rows['performance_group'] = pd.Categorical(status, categories=PERFORMANCE_LABELS)
+    return rows
+
+
+def build_cube(df, performance_status):
+    """Sum the measures by month x age group x tenure band x performance group.
+
+    The result is long-format with one row per non-empty cell plus an
+    'agent_months' row count, so any drill-down is a filter + groupby on a
+    few hundred rows instead of a scan of the raw employee frame.
+    """
+    rows = add_dimensions(df, performance_status)
+    rows['agent_months'] = 1
+    cube = rows.groupby(DIMENSIONS, observed=True, dropna=False)[MEASURES + ['agent_months']].sum()
+    return cube.reset_index()
+
+
+def _merge(cube, delta, sign=1):
+    measures = MEASURES + ['agent_months']
+    delta = delta.copy()
+    delta[measures] = delta[measures] * sign
+    merged = pd.concat([cube, delta], ignore_index=True)
+    for column in DIMENSIONS[1:]:
+        merged[column] = merged[column].astype(cube[column].dtype)
+    merged = merged.groupby(DIMENSIONS, observed=True, dropna=False)[measures].sum().reset_index()
+    return merged[merged['agent_months'] != 0].reset_index(drop=True)
+
+
+def update_cube(cube, new_rows, performance_status, changed_rows=None, old_status=None):
+    """Fold new agent-month rows into an existing cube without re-scanning history.
+
+    new_rows are the appended months. If some agents changed performance group,
+    pass their previously counted rows as changed_rows together with the
+    old_status they were counted under; those rows are moved to their new cells.
+    """
+    cube = _merge(cube, build_cube(new_rows, performance_status))
+    if changed_rows is not None and len(changed_rows):
+        cube = _merge(cube, build_cube(changed_rows, old_status), sign=-1)
+        cube = _merge(cube, build_cube(changed_rows, performance_status))
+    return cube
+
+
+def monthly_trend(cube, measures=('new_policy_count', 'ANBP_value'), **filters):
+    """Monthly totals of the given measures, optionally filtered on cube dimensions.
+
+    e.g. monthly_trend(cube, age_group='Senior', performance_group=['High', 'Medium'])
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    for column, value in filters.items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        mask &= cube[column].isin(values).to_numpy()
+    trend = cube[mask].groupby('year_month')[list(measures)].sum().reset_index()
+    return trend.sort_values('year_month', ignore_index=True)
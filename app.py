@@ -4,44 +4,49 @@ import numpy as np
 import warnings
 import matplotlib.pyplot as plt
 import seaborn as sns
-from datetime import datetime
-import gdown
-import os
+from data_store import get_store
+from classification import classify_all_agents
+from action_plans import plan_for_agent, format_plan
+from chart_cache import chart_cache, render_chart
+from instrumentation import timed
+from compact import with_month_dates
+from agent_search import codes_digest
+from functools import partial
 
 warnings.filterwarnings("ignore")
 sns.set_style("whitegrid")
 
-@st.cache_data
 # --- Load Data ---
+@timed
 def load_data():
-    # Create a data directory if it doesn't exist
-    data_dir = "data"
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-
-    # Local file paths
-    employee_excel = os.path.join(data_dir, "employee_data.xlsx")
-    target_excel = os.path.join(data_dir, "target_data.xlsx")
-
-    # Read Excel files
+    # All pages share one process-wide store, so the frames are loaded once
+    # and handed out as read-only views rather than per-page copies
     try:
-        employee_df = pd.read_excel(employee_excel)
-        target_df = pd.read_excel(target_excel)
-
-        # Convert date columns
-        date_columns = ['agent_join_month', 'first_policy_sold_month', 'year_month']
-        for col in date_columns:
-            employee_df[col] = pd.to_datetime(employee_df[col], errors='coerce')
-            if col in target_df.columns:
-                target_df[col] = pd.to_datetime(target_df[col], errors='coerce')
-        return employee_df, target_df
+        store = get_store()
+        return store.employee(), store.nill_flags()
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None, None
 
-@st.cache_data
+@timed
+def agent_history(df, agent_code):
+    """Rows for one agent ordered by month, with month columns as datetimes.
+
+    When df is the shared employee frame this is an O(1) slice through the
+    store's agent index; any other frame falls back to a boolean mask. The
+    store keeps months as compact ordinals; the index decodes each agent's
+    rows once and caches them, so the result must not be modified in place.
+    """
+    store = get_store()
+    if store.is_loaded('employee'):
+        index = store.agent_index()
+        if index.covers(df):
+            return index.dated_history(agent_code)
+    return with_month_dates(df[df['agent_code'] == agent_code].sort_values('year_month'))
+
+@timed
 def display_agent_info(df, agent_code):
-    agent_data = df[df['agent_code'] == agent_code]
+    agent_data = agent_history(df, agent_code)
     if agent_data.empty:
         return f"No data found for agent {agent_code}", None
 
@@ -63,12 +68,12 @@ def display_agent_info(df, agent_code):
 
 
 
+@timed
 def plot_new_policy_count(agent_code, df):
-    agent_data = df[df['agent_code'] == agent_code]
+    agent_data = agent_history(df, agent_code)
     if agent_data.empty:
         return None, "No data found for plotting."
 
-    agent_data = agent_data.sort_values('year_month')
     fig, ax = plt.subplots(figsize=(6, 4))
     ax.plot(agent_data['year_month'], agent_data['new_policy_count'], marker='o', color='teal')
     ax.set_xlabel('Year-Month')
@@ -82,38 +87,26 @@ def plot_new_policy_count(agent_code, df):
 
     return fig, (min_count, max_count)
 
-@st.cache_data
-def classify_agent_performance(df, agent_code):
-    """Classifies agent performance as High or not based on multiple KPIs."""
-    agent_data_all = df[df['agent_code'] == agent_code]
-    if agent_data_all.empty:
-        return "No Data"
+@timed
+def classify_agent_performance(df, agent_code, column='performance_category'):
+    """Classifies agent performance as High or not based on multiple KPIs.
 
-    # Averages from all months
-    avg_new_policy_count = agent_data_all['new_policy_count'].mean()
-    avg_ANBP_value = agent_data_all['ANBP_value'].mean()
-    avg_unique_customers = agent_data_all['unique_customers'].mean()
-    avg_unique_proposal = agent_data_all['unique_proposal'].mean()
-    avg_proposal_to_quotation_ratio = agent_data_all['unique_quotations'].mean()/agent_data_all['unique_proposal'].replace(0, np.nan)
-    avg_quotation_to_policy_ratio = agent_data_all['unique_quotations'].mean()/ agent_data_all['new_policy_count'].mean()
-    # Get most recent month data for static features
-    latest_row = agent_data_all.iloc[-1]
-    agent_age = latest_row['agent_age']
-    agent_tenure_months = latest_row['year_month'].month - latest_row['agent_join_month'].month 
-
-    if (
-        avg_new_policy_count > 27.95 and
-        avg_ANBP_value > 1.544e6 and
-        avg_unique_customers <= 15.30 and
-        avg_unique_proposal > 22.54 and
-        avg_proposal_to_quotation_ratio <= 0.70 and
-        avg_quotation_to_policy_ratio > 2.01 and
-        agent_age >= 40.6 and
-        agent_tenure_months >= 29.38
-    ):
-        return 'High'
+    column='performance_status' gives the High / Medium / Low status tier instead.
+    """
+    # The whole population is classified in one vectorized pass and shared;
+    # frames other than the store's are classified on the agent's rows only
+    store = get_store()
+    if store.is_loaded('employee') and store.agent_index().covers(df):
+        table = store.agent_classification()
     else:
-        return 'Not High'
+        agent_data_all = agent_history(df, agent_code)
+        if agent_data_all.empty:
+            return "No Data"
+        table = classify_all_agents(agent_data_all)
+
+    if agent_code not in table.index:
+        return "No Data"
+    return str(table.at[agent_code, column])
 
 def get_personalized_action_plan_system_binary_risk(agent_code, agent_data, target_nill_risk_flag):
     """
@@ -122,142 +115,18 @@ def get_personalized_action_plan_system_binary_risk(agent_code, agent_data, targ
                 (e.g., 'avg_new_policy_count', 'avg_quotation_to_policy_ratio').
     target_nill_risk_flag: 0 if at NILL risk, 1 if not (as per your nill_agent['target'])
     """
-    plan_components = []
-    action_items = []
-    
-    # Correcting the NILL risk interpretation based on your file: target == 0 means NILL risk
-    is_at_nill_risk = (target_nill_risk_flag == 0)
-
-    plan_title = f"Personalized Action Plan for Agent {agent_code}"
-    if is_at_nill_risk:
-        plan_title += " (Flagged for NILL Risk)"
-    else:
-        # This function is primarily for at-risk agents.
-        # If called for a non-at-risk agent, provide a different type of message or just basic info.
-        return [f"Agent {agent_code}: Not currently flagged for NILL risk. General performance advice can be provided if needed."]
-
-    # Classify performance based on pre-calculated averages in agent_data
-    # These averages should be calculated from train_df over a recent period (e.g., 3-6 months)
-    # and passed into agent_data.
-    # For this example, let's assume agent_data contains:
-    # 'avg_new_policy_count', 'avg_quotation_to_policy_ratio'
-    performance_category = classify_agent_performance(train_df, selected_agent)
-    plan_components.append(f"Recent Performance Category: {performance_category}")
-
-    thresholds = { # These are for LATEST activity, not for overall classification
-        "low_tenure": 6, # months
-        "moderate_tenure": 12,
-        "proposals_7d_low": 2,
-        "proposals_7d_moderate": 5,
-        "customers_7d_low": 2,
-        "proposals_monthly_high_activity": 20, # Indicates high effort last month
-        "policies_last_month_low_conversion": 2, # if high proposal activity
-        "proposals_21d_very_low": 4,
-        "customers_21d_very_low": 4
-    }
-
-    def get_metric(key, default=0): # Gets LATEST month's metric
-        return agent_data.get(key, default)
-    
-    # --- ACTION PLAN LOGIC FOR AT-NILL-RISK AGENTS (is_at_nill_risk == True) ---
-    if is_at_nill_risk:
-        # --- Scenario 1: New Agents at NILL Risk ---
-        if get_metric('tenure_months') < thresholds['low_tenure']:
-            plan_components.append("Profile: New Agent at NILL Risk")
-            if get_metric('unique_proposals_last_7_days') < thresholds['proposals_7d_low'] or \
-               get_metric('unique_customers_last_7_days') < thresholds['customers_7d_low']:
-                plan_components.append("Sub-Profile: Low Recent Activity")
-                action_items.extend([
-                    "T1: Attend 2-day intensive prospecting & lead generation workshop. (Time: Next 7 days)",
-                    "M1: Shadow a top-performing senior agent for 3 client meetings. (Time: Next 10 days)",
-                    "AG1(5, 5): Generate min. 5 unique proposals & 5 unique customer contacts weekly. (Time: Next 2 weeks)",
-                    "MS1: Weekly check-ins with manager. (Time: Ongoing for 4 weeks)"
-                ])
-            elif get_metric('new_policy_count_last_month') == 0: # Active but no sales in latest reported month
-                plan_components.append("Sub-Profile: Active but No Recent Sales (Conversion Issue)")
-                action_items.extend([
-                    "T2: Attend 'Closing Techniques & Objection Handling' module. (Time: Next 7 days)",
-                    "SP1: Role-play 3 sales scenarios focusing on closing. (Time: Next 10 days)",
-                    "M2: Weekly 30-min coaching with mentor. (Time: Next 4 weeks)",
-                    "AG2(1): Aim for at least 1 new policy this month. (Time: This month)"
-                ])
-            else: # General support for new NILL risk agent
-                action_items.append("MS1: Intensive daily check-ins with manager for 1 week to diagnose specific hurdles for new agents.")
-                action_items.append("Review onboarding materials and identify knowledge gaps.")
-
-        # --- Scenario 2: Experienced Agents at NILL Risk ---
-        elif get_metric('tenure_months') >= thresholds['low_tenure']:
-            plan_components.append("Profile: Experienced Agent at NILL Risk")
-
-            # Sub-profile: High Performer anomoly (High performer suddenly at NILL risk)
-            if performance_category == "High":
-                plan_components.append("Sub-Profile: High Performer Anomaly")
-                action_items.extend([
-                    "RA1: Urgent discussion with manager: Understand external factors or sudden changes impacting performance. (Time: Next 24h)",
-                    "Review recent client interactions for any negative feedback or lost deals.",
-                    "MS1: Supportive check-ins, focus on problem-solving not pressure. (Time: Ongoing)"
-                ])
-            
-            # Sub-profile: Medium Performer at NILL Risk
-            elif performance_category == "Medium":
-                plan_components.append("Sub-Profile: Medium Performer Dip")
-                if get_metric('new_policy_count_last_month') == 0: # Stalled
-                     action_items.extend([
-                        "RA1: Joint review with manager on recent performance trends & pipeline health. (Time: Next 3 days)",
-                        "RA2: Review top 20 dormant leads/past clients. (Time: Next 7 days)",
-                        "AG1(7, 7): Re-energize pipeline: min. 7 proposals & 7 customer contacts weekly. (Time: Next 2 weeks)"
-                     ])
-                else: # General NILL risk for medium performer
-                    action_items.append("Skill Gap Analysis: Identify specific areas (prospecting, closing, product) needing a refresher with manager.")
-                    action_items.append("T3: Targeted refresher training based on gap analysis.")
-
-            # Sub-profile: Low Performer at NILL Risk (Chronic Issue)
-            elif performance_category == "Low":
-                plan_components.append("Sub-Profile: Consistent Low Performer (Critical)")
-                # Based on your EDA, Low performers have high unique_customers but low proposals & very bad conversion
-                if get_metric('unique_proposal_last_month') < (get_metric('unique_customers_last_month') * 0.5) and get_metric('unique_customers_last_month') > 15: # High customer contact, low proposal generation
-                    plan_components.append("Issue: Not converting customer interactions to proposals effectively.")
-                    action_items.append("T_Qualify: Training on qualifying leads and transitioning conversations to proposals.")
-                    action_items.append("SP_Propose: Role-play initial customer interactions to proposal stage.")
-                elif get_metric('avg_proposal_to_quotation_ratio', 2) > 1.5 : # Using avg_ from agent_data; high ratio = bad
-                    plan_components.append("Issue: Proposals not converting to Quotations (poor proposal quality/fit).")
-                    action_items.append("MS2: Manager to review 5 recent proposals for quality, targeting, and value proposition.")
-                    action_items.append("T_ProposalWrite: Workshop on effective proposal writing and customization.")
-                elif get_metric('avg_quotation_to_policy_ratio', 1) < 1.0: # Using avg_ from agent_data; low ratio = bad
-                     plan_components.append("Issue: Quotations not converting to Policies (closing/objection handling).")
-                     action_items.extend([
-                        "T2: Attend 'Closing Techniques & Objection Handling' module. (Time: Next 7 days)",
-                        "SP1: Role-play 3 sales scenarios focusing on closing quotes. (Time: Next 10 days)"
-                     ])
-                else: # General for Low Performer at NILL
-                    action_items.extend([
-                        "PIP_Consider: Consider initiating a formal Performance Improvement Plan (PIP).",
-                        "MS1: Intensive weekly coaching on fundamentals with manager.",
-                        "AG2(1): Set a very small, achievable goal of 1 policy to build confidence. (Time: This month)"
-                    ])
-            
-            # If experienced but no clear performance category or other flags for NILL risk
-            if not action_items and (performance_category != "High"): # Avoid generic for High performers already handled
-                plan_components.append("Sub-Profile: General NILL Risk for Experienced Agent")
-                action_items.extend([
-                    "RA1: Deep-dive review with manager. (Time: Next 2 days)",
-                    "Identify 1 key barrier and 1 small win to achieve in the next 3 days.",
-                    "MS1: Implement daily check-ins with manager for one week. (Time: Next 7 days)"
-                ])
-
-        # Fallback if no specific plan assigned yet for an at-NILL-risk agent
-        if not action_items:
-            action_items.append("RA_MANUAL: Agent is at NILL risk. Current metrics do not fit a predefined profile. Requires immediate manual review by manager to diagnose and plan.")
-            plan_components.append("Profile: Undetermined NILL Risk (Requires Manual Review)")
-
-    # --- Construct final plan ---
-    final_plan_output = [plan_title]
-    if plan_components:
-        unique_insights = list(set(plan_components))
-
+    # The rules live in action_plans.plan_for_agent (UI-free, also used by the
+    # batch generator); this wrapper only renders the diagnostic insights
+    employee_df, _ = load_data()
+    performance_category = classify_agent_performance(employee_df, agent_code) if employee_df is not None else "No Data"
+    performance_status = (classify_agent_performance(employee_df, agent_code, 'performance_status')
+                          if employee_df is not None else "No Data")
+    plan = plan_for_agent(agent_code, agent_data, target_nill_risk_flag, performance_category, performance_status)
+
+    if plan['at_nill_risk'] and plan['insights']:
         # Create HTML blocks for each insight
         insight_boxes = ""
-        for insight in unique_insights:
+        for insight in dict.fromkeys(plan['insights']):
             insight_boxes += f"""
                 <div style="
                     display: inline-block;
@@ -275,19 +144,11 @@ def get_personalized_action_plan_system_binary_risk(agent_code, agent_data, targ
         st.markdown(f"### Diagnostic Insights")
         st.markdown(insight_boxes, unsafe_allow_html=True)
 
-    if action_items:
-        final_plan_output.append("\nRecommended SMART Actions:")
-        for i, item in enumerate(action_items):
-            final_plan_output.append(f"{i+1}. {item}")
-    elif not is_at_nill_risk: # Should have been caught earlier
-        pass # Message already handled
-    else: # is_at_nill_risk is True, but no actions
-        final_plan_output.append("No specific automated actions identified for this NILL risk profile. Manager to conduct immediate manual review and develop a tailored plan.")
-
-    return final_plan_output
+    return format_plan(plan)
 
+@timed
 def generate_agent_performance_chart(agent_code, df):
-    agent_data = df[df['agent_code'] == agent_code].copy()
+    agent_data = agent_history(df, agent_code).copy()
     if agent_data.empty:
         return None, f"No data found for agent {agent_code}"
 
@@ -310,6 +171,90 @@ def generate_agent_performance_chart(agent_code, df):
 
     return fig, monthly_data
 
+# Plotting helpers that can be served as cached images, by chart type
+CHART_PLOTTERS = {
+    'new_policy_count': plot_new_policy_count,
+    'performance': generate_agent_performance_chart,
+}
+
+@timed
+def cached_agent_chart(agent_code, chart_type, df, fmt="png"):
+    """Rendered chart bytes plus the plotter's second return value, served from the chart cache."""
+    plotter = partial(CHART_PLOTTERS[chart_type], agent_code, df)
+    store = get_store()
+    if not (store.is_loaded('employee') and store.agent_index().covers(df)):
+        # Not the shared frame, so there is no data version to key the cache on
+        return render_chart(plotter, fmt)
+    return chart_cache.get_or_render((agent_code, chart_type, store.data_version, fmt), plotter, fmt)
+
+@timed
+def warm_up_agent_charts(agent_codes, background=True):
+    """Pre-render every chart type for the given agents into the chart cache."""
+    store = get_store()
+    df = store.employee()
+    jobs = [((code, chart_type, store.data_version, "png"), partial(plotter, code, df))
+            for code in agent_codes for chart_type, plotter in CHART_PLOTTERS.items()]
+    return chart_cache.warm_up(jobs, background=background)
+
+FACET_TITLES = {
+    'performance_group': "Performance group",
+    'nill': "NILL risk",
+    'tenure_band': "Tenure",
+    'age_group': "Age group",
+}
+
+@timed
+def agent_picker(label, key, facets=tuple(FACET_TITLES), within=None, fixed_filters=None, index=None,
+                 placeholder="Choose an agent..."):
+    """Agent select box fed by a server-side search, one page of codes at a time.
+
+    Shows a code-prefix search box and a filter per facet, then a select box
+    holding only the current page of matching codes (plus the current
+    selection). within and fixed_filters narrow the results without showing
+    a control. Returns the selected code (None once no agent matches) and
+    the codes on the page.
+    """
+    search = get_store().agent_search()
+    columns = st.columns([2] + [1] * len(facets))
+    query = columns[0].text_input("Search agent code", key=f"{key}_query", placeholder="Code prefix...")
+    filters = dict(fixed_filters or {})
+    for column, facet in zip(columns[1:], facets):
+        choice = column.selectbox(FACET_TITLES[facet], ["All"] + list(search.facets[facet].categories),
+                                  key=f"{key}_{facet}")
+        filters[facet] = None if choice == "All" else choice
+
+    page_key = f"{key}_page"
+    # A new search or filter starts again from the first page
+    signature = (query, tuple(sorted(filters.items())), None if within is None else codes_digest(within))
+    if st.session_state.get(f"{key}_signature") != signature:
+        st.session_state[f"{key}_signature"] = signature
+        st.session_state.pop(page_key, None)
+    result = search.search(query, page=st.session_state.get(page_key, 1) - 1, within=within, **filters)
+    if result['pages'] > 1:
+        # Clamped before the widget is drawn, since filters may have removed pages
+        st.session_state[page_key] = result['page'] + 1
+        st.number_input(f"Page (of {result['pages']})", min_value=1, max_value=result['pages'], step=1, key=page_key)
+    st.caption(f"{result['total']:,} matching agents")
+
+    # The select box's identity depends on its options, so Streamlit drops its
+    # value whenever the page changes. The selection is kept under its own key
+    # instead, and the box is left without one so no stale value is carried over.
+    selected_key = f"{key}_selected"
+    selected = st.session_state.get(selected_key)
+    if selected is not None and not search.matches(selected, query, within, **filters):
+        selected = None
+    options = result['codes']
+    if selected is not None and selected not in options:
+        # Keep the current agent selectable while paging through other results
+        options = [selected] + options
+    if selected is not None:
+        position = options.index(selected)
+    else:
+        position = index if options else None
+    selected = st.selectbox(label, options=options, index=position, placeholder=placeholder)
+    st.session_state[selected_key] = selected
+    return selected, result['codes']
+
 # Only run the UI if this file is run directly
 if __name__ == "__main__":
     print("This module contains helper functions. Please run Dashboard.py, Nill_Agents.py, or Employees.py instead.")
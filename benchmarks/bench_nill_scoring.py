@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+# Run from anywhere: the app modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_store import get_store
+
+
+def time_calls(fn, args, repeat=1):
+    """Wall time in milliseconds of fn(arg) for each arg."""
+    timings = []
+    for arg in args:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(arg)
+            timings.append((time.perf_counter() - start) * 1e3)
+    return np.asarray(timings)
+
+
+def summarize(name, timings):
+    print(f"{name:<28} n={len(timings):<5} p50={np.percentile(timings, 50):7.2f} ms  "
+          f"p95={np.percentile(timings, 95):7.2f} ms  max={timings.max():7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of live NILL scoring through the data store.")
+    parser.add_argument("--agents", type=int, default=500, help="Agents to score one at a time")
+    parser.add_argument("--repeat", type=int, default=3, help="Calls per agent")
+    args = parser.parse_args()
+
+    store = get_store()
+    store.employee()
+    if store.nill_model() is None:
+        sys.exit("No NILL model saved; run `python nill_model.py train` first")
+    codes = list(store.agent_index().codes[:args.agents])
+    store.score_agent(codes[0])  # warm-up
+
+    summarize("score_agent (single agent)", time_calls(store.score_agent, codes, args.repeat))
+    summarize("score_all_agents", time_calls(lambda _: store.score_all_agents(), range(args.repeat * 5)))
@@ -0,0 +1,239 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+from functools import partial
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+# Run from anywhere: the app modules live in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_ingest import load_cached
+from data_store import AgentDataStore, get_store, set_store
+from agent_index import AgentIndex
+from agent_tensor import AgentTensor
+from streak_index import StreakIndex
+from agent_search import AgentSearchIndex
+from risk_index import RiskIndex
+from classification import classify_all_agents
+from aggregates import build_cube, monthly_trend
+from chart_cache import render_chart
+from nill_scoring import score_agents
+from app import agent_history, classify_agent_performance, plot_new_policy_count, generate_agent_performance_chart
+from bench_nill_scoring import time_calls
+from synthetic_data import generate_employee_data
+from compact import expand_employee
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# A benchmark regresses when its median is this many times its baseline
+REGRESSION_RATIO = 1.5
+
+
+def bench_load(employee, tmp_dir, repeat):
+    """Cold CSV parse + cache build, a Parquet cache hit and the agent index build."""
+    source = os.path.join(tmp_dir, "employee_data.csv")
+    expand_employee(employee).to_csv(source, index=False)
+    cache_dir = os.path.join(tmp_dir, "cache")
+
+    def cold(_):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        load_cached(source, cache_dir)
+
+    return {
+        'load.csv_cold': time_calls(cold, range(repeat)),
+        'load.cache_hit': time_calls(lambda _: load_cached(source, cache_dir), range(repeat)),
+        'load.agent_index': time_calls(lambda _: AgentIndex(employee), range(repeat)),
+    }
+
+
+def bench_filters(df, codes, repeat):
+    """One agent's history by boolean mask (any frame) and through the agent index (store frame)."""
+    return {
+        'filter.mask': time_calls(lambda code: df[df['agent_code'] == code].sort_values('year_month'), codes, repeat),
+        'filter.agent_index': time_calls(lambda code: agent_history(df, code), codes, repeat),
+    }
+
+
+def bench_classification(df, codes, repeat):
+    get_store().agent_classification()  # the shared table is built once per data version
+    return {
+        'classify.all_agents': time_calls(lambda _: classify_all_agents(df), range(repeat)),
+        'classify.agent': time_calls(lambda code: classify_agent_performance(df, code), codes, repeat),
+        'classify.agent_uncached': time_calls(lambda code: classify_agent_performance(df.copy(), code), codes[:5], 1),
+    }
+
+
+def bench_plots(df, codes):
+    return {
+        'plot.new_policy_count': time_calls(lambda code: render_chart(partial(plot_new_policy_count, code, df)), codes),
+        'plot.performance_chart': time_calls(
+            lambda code: render_chart(partial(generate_agent_performance_chart, code, df)), codes),
+    }
+
+
+def bench_dashboard(df, repeat):
+    status = get_store().agent_classification()['performance_status']
+    cube = build_cube(df, status)
+    return {
+        'dashboard.build_cube': time_calls(lambda _: build_cube(df, status), range(repeat)),
+        'dashboard.monthly_trend': time_calls(
+            lambda _: monthly_trend(cube, age_group='MiddleAge', performance_group=['High', 'Medium']), range(repeat * 10)),
+    }
+
+
+def bench_tensor(df, codes, repeat):
+    """Dense tensor build and the time-series queries it serves, against their groupby equivalents."""
+    index = get_store().agent_index()
+    tensor = AgentTensor.from_index(index)
+    return {
+        'tensor.build': time_calls(lambda _: AgentTensor.from_index(index), range(repeat)),
+        'tensor.series': time_calls(lambda code: tensor.series(code, 'new_policy_count'), codes, repeat),
+        'tensor.rolling_sum': time_calls(lambda _: tensor.rolling_sum('unique_proposal', 3), range(repeat)),
+        'tensor.zero_runs': time_calls(lambda _: tensor.zero_runs(), range(repeat)),
+        'tensor.population_trend': time_calls(lambda _: tensor.population_trend('ANBP_value'), range(repeat)),
+        'groupby.rolling_sum': time_calls(
+            lambda _: df.groupby('agent_code', observed=True)['unique_proposal'].rolling(3, min_periods=1).sum(),
+            range(repeat)),
+        'groupby.population_trend': time_calls(lambda _: df.groupby('year_month')['ANBP_value'].sum(), range(repeat)),
+    }
+
+
+def bench_streaks(repeat):
+    """Streak index build from the tensor and its threshold queries."""
+    tensor = AgentTensor.from_index(get_store().agent_index())
+    streaks = StreakIndex.from_tensor(tensor)
+    return {
+        'streaks.build': time_calls(lambda _: StreakIndex.from_tensor(tensor), range(repeat)),
+        'streaks.with_streak': time_calls(lambda _: streaks.with_streak(3), range(repeat * 10)),
+        'streaks.without_sale': time_calls(lambda _: streaks.without_sale(3), range(repeat * 10)),
+        'streaks.select': time_calls(lambda _: streaks.select(min_streak=2, months_without_sale=3), range(repeat * 10)),
+    }
+
+
+def bench_search(codes, repeat):
+    """Agent picker search: index build, prefix, facet filters and a restriction to a code list."""
+    store = get_store()
+    latest, status, flags = store.agent_index().latest_rows(), store.agent_classification()['performance_status'], store.nill_flags()
+    search = AgentSearchIndex.build(latest, status, flags)
+    within = store.agent_index().codes[::2]
+    return {
+        'search.build': time_calls(lambda _: AgentSearchIndex.build(latest, status, flags), range(repeat)),
+        'search.prefix': time_calls(lambda code: search.search(code[:2]), codes, repeat),
+        'search.all_filtered': time_calls(
+            lambda _: search.search("", performance_group="Low", tenure_band=["<6m", "6-11m"]), range(repeat * 10)),
+        'search.within': time_calls(lambda _: search.search("", within=within), range(repeat)),
+    }
+
+
+def bench_risk(repeat):
+    """Risk leaderboard: index build, top-N, threshold and filtered / re-sorted pages."""
+    store = get_store()
+    latest = store.agent_index().latest_rows()
+    # Random probabilities stand in for a scored snapshot, which synthetic stores do not have
+    probability = np.random.default_rng(0).random(len(latest))
+    scores = pd.DataFrame({'nill_probability': probability, 'at_nill_risk': probability >= 0.65},
+                          index=latest['agent_code'].astype(str).to_numpy())
+    inputs = (latest, scores, store.streak_index().table(), store.agent_classification()['performance_status'])
+    risk = RiskIndex.build(*inputs)
+    return {
+        'risk.build': time_calls(lambda _: RiskIndex.build(*inputs), range(repeat)),
+        'risk.top': time_calls(lambda _: risk.top(100), range(repeat * 10)),
+        'risk.above': time_calls(lambda _: risk.above(0.9), range(repeat * 10)),
+        'risk.page': time_calls(lambda page: risk.page(page=page, min_probability=0.5), range(repeat * 10)),
+        'risk.page_filtered': time_calls(
+            lambda page: risk.page(page=page, sort_by='latest_ANBP_value', min_streak=1, performance_group='Medium'),
+            range(repeat * 10)),
+    }
+
+
+def bench_scoring(df, repeat):
+    model = get_store().nill_model()
+    if model is None:
+        return {}
+    return {'scoring.score_agents': time_calls(lambda _: score_agents(df, model), range(repeat))}
+
+
+def run_scale(n_agents, scale, agents, repeat):
+    """All benchmarks on synthetic data for `scale` times n_agents agents; {name: timings in ms}."""
+    employee, target = generate_employee_data(n_agents * scale, seed=scale)
+    previous = set_store(AgentDataStore.from_frames(employee, target))
+    try:
+        store = get_store()
+        df = store.employee()
+        rng = np.random.default_rng(0)
+        codes = list(rng.choice(store.agent_index().codes, size=min(agents, len(store.agent_index())), replace=False))
+        results = {}
+        tmp_dir = tempfile.mkdtemp(prefix="bench-")
+        try:
+            results.update(bench_load(df, tmp_dir, repeat))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        results.update(bench_filters(df, codes, repeat))
+        results.update(bench_classification(df, codes, repeat))
+        results.update(bench_plots(df, codes[:10]))
+        results.update(bench_dashboard(df, repeat))
+        results.update(bench_tensor(df, codes, repeat))
+        results.update(bench_streaks(repeat))
+        results.update(bench_search(codes, repeat))
+        results.update(bench_risk(repeat))
+        results.update(bench_scoring(df, repeat))
+        return len(df), results
+    finally:
+        set_store(previous)
+
+
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(medians, path=BASELINE_PATH):
+    baselines = load_baselines(path)
+    baselines.setdefault('results', {}).update(medians)
+    baselines['machine'] = f"{platform.machine()} / {os.cpu_count()} CPU / Python {platform.python_version()}"
+    baselines['recorded_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the data, scoring and rendering hot paths at growing data sizes.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10], help="Multiples of the current data size")
+    parser.add_argument("--agents", type=int, default=50, help="Agents sampled for per-agent benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="Calls per benchmark (per agent for per-agent ones)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Record the medians in {os.path.basename(BASELINE_PATH)}")
+    parser.add_argument("--compare", action="store_true", help="Fail if any median regressed against the baseline")
+    args = parser.parse_args()
+
+    # Sizes are multiples of the real agent count
+    n_agents = len(get_store().agent_index())
+    baselines = load_baselines().get('results', {})
+    medians, regressions = {}, []
+    for scale in args.scales:
+        rows, results = run_scale(n_agents, scale, args.agents, args.repeat)
+        print(f"\n== {scale}x ({rows:,} rows) ==")
+        for name, timings in results.items():
+            key = f"{name}@{scale}x"
+            medians[key] = round(float(np.median(timings)), 3)
+            line = f"{name:<28} p50={np.median(timings):9.2f} ms  p95={np.percentile(timings, 95):9.2f} ms"
+            if key in baselines:
+                ratio = medians[key] / baselines[key]
+                line += f"  baseline={baselines[key]:9.2f} ms  x{ratio:.2f}"
+                if ratio > REGRESSION_RATIO:
+                    regressions.append(key)
+                    line += "  REGRESSION"
+            print(line)
+
+    if args.save_baseline:
+        save_baselines(medians)
+        print(f"\nSaved {len(medians)} baselines to {BASELINE_PATH}")
+    if args.compare and regressions:
+        sys.exit(f"\n{len(regressions)} benchmark(s) slower than {REGRESSION_RATIO}x baseline: {', '.join(regressions)}")
@@ -0,0 +1,169 @@
+import io
+import sys
+import threading
+from collections import OrderedDict, deque
+import pandas as pd
+import matplotlib.pyplot as plt
+from instrumentation import cache_event
+
+# pyplot keeps global state, so figures are only ever built and rendered by
+# one thread at a time (the Streamlit script thread or a warm-up thread)
+_render_lock = threading.Lock()
+
+
+def render_figure(fig, fmt="png", dpi=100):
+    """Render a matplotlib figure to PNG/SVG bytes and close it."""
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format=fmt, dpi=dpi)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_chart(plot, fmt="png"):
+    """Call plot() -> (fig, extra) and return (image_bytes or None, extra)."""
+    with _render_lock:
+        fig, extra = plot()
+        if fig is None:
+            return None, extra
+        return render_figure(fig, fmt=fmt), extra
+
+
+def _extra_size(extra):
+    """Approximate bytes held by a plotter's extra return value."""
+    if isinstance(extra, pd.DataFrame):
+        return int(extra.memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(extra)
+
+
+class ChartCache:
+    """Size-bounded LRU of rendered charts.
+
+    Entries are keyed by (agent_code, chart_type, data_version, fmt) and hold
+    the image bytes plus whatever data the plotting function returned next to
+    its figure. Both count towards max_bytes, and the oldest entries are
+    evicted once it is exceeded.
+
+    Background warm-ups share one worker thread per cache; keys already queued
+    are not queued again, and the worker waits while a foreground render (the
+    chart a user is looking at) is in progress.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        # Warm-up queue, its keys, and the foreground renders it yields to
+        self._queue = deque()
+        self._pending = set()
+        self._worker = None
+        self._foreground = 0
+        self._idle = threading.Condition(self._lock)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                cache_event('chart_cache', False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            cache_event('chart_cache', True)
+            return entry
+
+    def put(self, key, image, extra=None):
+        size = len(image) + _extra_size(extra)
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+                self.current_bytes -= self._sizes.pop(key)
+            self._entries[key] = (image, extra)
+            self._sizes[key] = size
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, _ = self._entries.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def get_or_render(self, key, plot, fmt="png"):
+        """Return (image_bytes, extra) for key, calling plot() -> (fig, extra) on a miss.
+
+        If plot() returns no figure, (None, extra) is returned and nothing is cached.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            self._foreground += 1
+        try:
+            image, extra = render_chart(plot, fmt)
+        finally:
+            with self._lock:
+                self._foreground -= 1
+                self._idle.notify_all()
+        if image is not None:
+            self.put(key, image, extra)
+        return image, extra
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while self._foreground:
+                    self._idle.wait()
+                if not self._queue:
+                    self._worker = None
+                    return
+                key, plot, fmt = self._queue.popleft()
+                cached = key in self._entries
+            if not cached:
+                image, extra = render_chart(plot, fmt)
+                if image is not None:
+                    self.put(key, image, extra)
+            with self._lock:
+                self._pending.discard(key)
+
+    def warm_up(self, jobs, fmt="png", background=True):
+        """Pre-render charts for (key, plot) pairs that are neither cached nor already queued.
+
+        In the background the jobs join the cache's single warm-up thread,
+        which is started if it is not running; returns that thread (None if
+        nothing was queued or background is False).
+        """
+        if not background:
+            for key, plot in jobs:
+                if key not in self:
+                    image, extra = render_chart(plot, fmt)
+                    if image is not None:
+                        self.put(key, image, extra)
+            return None
+        with self._lock:
+            jobs = [(key, plot) for key, plot in jobs if key not in self._entries and key not in self._pending]
+            if not jobs:
+                return None
+            self._pending.update(key for key, _ in jobs)
+            self._queue.extend((key, plot, fmt) for key, plot in jobs)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="chart-warm-up", daemon=True)
+                self._worker.start()
+            return self._worker
+
+
+# Shared by every page in the process
+chart_cache = ChartCache()
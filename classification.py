@@ -0,0 +1,71 @@
+import operator
+import numpy as np
+import pandas as pd
+from compact import month_ordinals
+
+# Thresholds an agent must meet on every KPI to be classified as 'High'
+HIGH_PERFORMER_THRESHOLDS = {
+    'avg_new_policy_count': ('>', 27.95),
+    'avg_ANBP_value': ('>', 1.544e6),
+    'avg_unique_customers': ('<=', 15.30),
+    'avg_unique_proposal': ('>', 22.54),
+    'avg_proposal_to_quotation_ratio': ('<=', 0.70),
+    'avg_quotation_to_policy_ratio': ('>', 2.01),
+    'agent_age': ('>=', 40.6),
+    'agent_tenure_months': ('>=', 29.38),
+}
+
+# Average monthly new policies separating the High / Medium / Low status tiers
+STATUS_TIERS = {'High': 20, 'Medium': 10}
+STATUS_LABELS = ['High', 'Medium', 'Low']
+
+_OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+_AVERAGED_COLUMNS = ['new_policy_count', 'ANBP_value', 'unique_customers', 'unique_proposal', 'unique_quotations']
+
+
+def compute_agent_kpis(df):
+    """Per-agent KPI table computed in one grouped pass over the employee rows."""
+    ordered = df.sort_values(['agent_code', 'year_month'], kind='stable')
+    grouped = ordered.groupby('agent_code', observed=True, sort=True)
+    means = grouped[_AVERAGED_COLUMNS].mean()
+    latest = grouped[['agent_age', 'agent_join_month', 'year_month']].last()
+
+    kpis = pd.DataFrame(index=means.index)
+    kpis['avg_new_policy_count'] = means['new_policy_count']
+    kpis['avg_ANBP_value'] = means['ANBP_value']
+    kpis['avg_unique_customers'] = means['unique_customers']
+    kpis['avg_unique_proposal'] = means['unique_proposal']
+    kpis['avg_proposal_to_quotation_ratio'] = means['unique_quotations'] / means['unique_proposal'].replace(0, np.nan)
+    kpis['avg_quotation_to_policy_ratio'] = means['unique_quotations'] / means['new_policy_count'].replace(0, np.nan)
+    kpis['agent_age'] = latest['agent_age']
+    # Tenure at the agent's most recent month
+    kpis['agent_tenure_months'] = month_ordinals(latest['year_month']) - month_ordinals(latest['agent_join_month'])
+    kpis.index = kpis.index.astype(str)
+    return kpis.astype(np.float32)
+
+
+def apply_thresholds(kpis, thresholds=HIGH_PERFORMER_THRESHOLDS):
+    """Boolean array: True where an agent meets every threshold (NaN never passes)."""
+    passed = np.ones(len(kpis), dtype=bool)
+    for column, (op, value) in thresholds.items():
+        passed &= _OPERATORS[op](kpis[column].to_numpy(), value)
+    return passed
+
+
+def classify_all_agents(df):
+    """Classify every agent in df at once.
+
+    Returns one row per agent_code with the KPIs used by the rules, a
+    'performance_category' ('High' / 'Not High') from the KPI thresholds and a
+    'performance_status' ('High' / 'Medium' / 'Low') from average new policies.
+    """
+    table = compute_agent_kpis(df)
+    table['performance_category'] = pd.Categorical(
+        np.where(apply_thresholds(table), 'High', 'Not High'), categories=['High', 'Not High'])
+    avg_policies = table['avg_new_policy_count'].to_numpy()
+    table['performance_status'] = pd.Categorical(
+        np.select([avg_policies > STATUS_TIERS['High'], avg_policies > STATUS_TIERS['Medium']],
+                  STATUS_LABELS[:2], default=STATUS_LABELS[2]),
+        categories=STATUS_LABELS)
+    return table
@@ -0,0 +1,164 @@
+import os
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "clustering", "agent_clusters.joblib")
+
+# Per-agent aggregates the clusters are fitted on (the columns of agent_perf.csv)
+PROFILE_COLUMNS = ['total_policies', 'avg_policies', 'nill_rate', 'avg_ANBP', 'avg_income',
+                   'avg_customers', 'avg_proposals', 'active_months']
+N_CLUSTERS = 3
+# Clusters are named by their members' total policies, lowest first
+GROUP_LABELS = ['Low', 'Mid', 'High']
+RECOMMENDATIONS = {
+    'High': "Retention incentives, high-value leads",
+    'Mid': "Targeted training, quote-to-sale improvement",
+    'Low': "Mentoring, onboarding refreshers",
+}
+
+
+def agent_profiles(employee_df):
+    """One row of clustering aggregates per agent, indexed by agent_code."""
+    measures = ['new_policy_count', 'ANBP_value', 'net_income', 'unique_customers', 'unique_proposal']
+    # Aggregate compact (int8 / float32) columns in 64 bits
+    rows = employee_df[['agent_code']].assign(
+        **{column: employee_df[column].astype(np.int64 if pd.api.types.is_integer_dtype(employee_df[column].dtype)
+                                              else np.float64) for column in measures},
+        nill_month=(employee_df['new_policy_count'] == 0).astype(np.float64))
+    grouped = rows.groupby('agent_code', observed=True, sort=True)
+    means = grouped[['new_policy_count', 'nill_month', 'ANBP_value', 'net_income',
+                     'unique_customers', 'unique_proposal']].mean()
+    profiles = pd.DataFrame({
+        'total_policies': grouped['new_policy_count'].sum(),
+        'avg_policies': means['new_policy_count'],
+        'nill_rate': means['nill_month'],
+        'avg_ANBP': means['ANBP_value'],
+        'avg_income': means['net_income'],
+        'avg_customers': means['unique_customers'],
+        'avg_proposals': means['unique_proposal'],
+        'active_months': grouped.size(),
+    })
+    profiles.index = profiles.index.astype(str)
+    return profiles
+
+
+class AgentClusterModel:
+    """StandardScaler + KMeans + PCA fitted once on agent profiles, as in the clustering notebook.
+
+    New or updated agents are assigned to the nearest fitted centroid, so
+    refreshing groups never refits the clusters.
+    """
+
+    def __init__(self, scaler, kmeans, pca, group_names):
+        self.scaler = scaler
+        self.kmeans = kmeans
+        self.pca = pca
+        self.group_names = np.asarray(group_names, dtype=object)
+        self._centroids = kmeans.cluster_centers_
+
+    @classmethod
+    def fit(cls, profiles, mini_batch=False, batch_size=4096):
+        """Fit on a profile table; mini_batch uses MiniBatchKMeans for large populations."""
+        scaler = StandardScaler()
+        scaled = scaler.fit_transform(profiles[PROFILE_COLUMNS])
+        if mini_batch:
+            kmeans = MiniBatchKMeans(n_clusters=N_CLUSTERS, random_state=42, batch_size=batch_size, n_init=3)
+        else:
+            kmeans = KMeans(n_clusters=N_CLUSTERS, random_state=42, n_init=10)
+        clusters = kmeans.fit_predict(scaled)
+        pca = PCA(n_components=2).fit(scaled)
+        # Name clusters Low / Mid / High by their members' total policies
+        total_policies = pd.Series(profiles['total_policies'].to_numpy()).groupby(clusters).mean()
+        group_names = np.empty(N_CLUSTERS, dtype=object)
+        group_names[total_policies.sort_values().index.to_numpy()] = GROUP_LABELS
+        return cls(scaler, kmeans, pca, group_names)
+
+    def assign(self, profiles):
+        """Cluster, performance group, recommendation and PCA coordinates for each profile."""
+        scaled = self.scaler.transform(profiles[PROFILE_COLUMNS])
+        distances = ((scaled[:, None, :] - self._centroids[None, :, :]) ** 2).sum(axis=2)
+        clusters = distances.argmin(axis=1)
+        coords = self.pca.transform(scaled)
+        groups = self.group_names[clusters]
+        result = profiles[PROFILE_COLUMNS].copy()
+        result['cluster'] = clusters
+        result['performance_group'] = groups
+        result['recommendation'] = [RECOMMENDATIONS[group] for group in groups]
+        result['PCA1'] = coords[:, 0]
+        result['PCA2'] = coords[:, 1]
+        return result
+
+
+def build_agent_perf(employee_df, model, nill_flags=None):
+    """The agent_perf.csv table from live data: profiles, cluster assignment and is_nill.
+
+    nill_flags: frame with agent_code and target (0 = at NILL risk).
+    """
+    perf = model.assign(agent_profiles(employee_df))
+    if nill_flags is not None:
+        flags = nill_flags.assign(agent_code=nill_flags['agent_code'].astype(str)).set_index('agent_code')['target']
+        perf['is_nill'] = flags.reindex(perf.index).eq(0).to_numpy()
+    else:
+        perf['is_nill'] = False
+    perf.index.name = 'agent_code'
+    return perf.reset_index()
+
+
+def update_agent_perf(agent_perf, employee_df, agent_codes, model):
+    """Re-profile and reassign only the given agents (e.g. after a month is appended).
+
+    employee_df must hold the full history of those agents; is_nill is kept.
+    """
+    agent_codes = [str(code) for code in agent_codes]
+    rows = employee_df[employee_df['agent_code'].astype(str).isin(agent_codes)]
+    updated = model.assign(agent_profiles(rows))
+    previous = agent_perf.set_index('agent_code')
+    updated['is_nill'] = previous['is_nill'].reindex(updated.index, fill_value=False).astype(bool).to_numpy()
+    updated.index.name = 'agent_code'
+    merged = pd.concat([previous.drop(index=updated.index, errors='ignore'), updated[previous.columns]])
+    return merged.sort_index().reset_index()
+
+
+def save_cluster_model(model, path=MODEL_PATH):
+    # Only the fitted sklearn parts are pickled, so the file does not depend on
+    # the module AgentClusterModel was fitted from (e.g. __main__ for the CLI)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump({'scaler': model.scaler, 'kmeans': model.kmeans, 'pca': model.pca,
+                 'group_names': list(model.group_names)}, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_cluster_model(path=MODEL_PATH):
+    """The persisted cluster model. Raises FileNotFoundError if none was fitted."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No cluster model at {path}; run `python clustering.py fit`")
+    parts = joblib.load(path)
+    return AgentClusterModel(parts['scaler'], parts['kmeans'], parts['pca'], parts['group_names'])
+
+
+if __name__ == "__main__":
+    from data_store import get_store
+
+    parser = argparse.ArgumentParser(description="Fit the agent clusters and refresh agent_perf.csv.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit_parser = subparsers.add_parser("fit", help="Fit scaler, KMeans and PCA on the current agents and save them")
+    fit_parser.add_argument("--mini-batch", action="store_true", help="Use MiniBatchKMeans (large populations)")
+    export_parser = subparsers.add_parser("export", help="Write agent_perf.csv from the saved model and live data")
+    export_parser.add_argument("--out", default=os.path.join("data", "agent_perf.csv"))
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.command == "fit":
+        model = AgentClusterModel.fit(agent_profiles(store.employee()), mini_batch=args.mini_batch)
+        print(f"Saved cluster model to {save_cluster_model(model)}")
+    else:
+        perf = build_agent_perf(store.employee(), load_cluster_model(), store.nill_flags())
+        perf.to_csv(args.out, index=False)
+        print(f"Wrote {len(perf)} agents to {args.out}")
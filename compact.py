@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+# How each employee column is stored in memory:
+#   id / count - smallest signed integer type holding the column's range
+#   money      - float32 (exact for whole amounts up to 2**24)
+#   code       - categorical (int codes + one dictionary of agent codes)
+#   month      - int16 period ordinal: months since 1970-01, as pd.Period(..., 'M').ordinal
+EMPLOYEE_SCHEMA = {
+    'row_id': 'id',
+    'agent_code': 'code',
+    'agent_age': 'count',
+    'agent_join_month': 'month',
+    'first_policy_sold_month': 'month',
+    'year_month': 'month',
+    'unique_proposals_last_7_days': 'count',
+    'unique_proposals_last_15_days': 'count',
+    'unique_proposals_last_21_days': 'count',
+    'unique_proposal': 'count',
+    'unique_quotations_last_7_days': 'count',
+    'unique_quotations_last_15_days': 'count',
+    'unique_quotations_last_21_days': 'count',
+    'unique_quotations': 'count',
+    'unique_customers_last_7_days': 'count',
+    'unique_customers_last_15_days': 'count',
+    'unique_customers_last_21_days': 'count',
+    'unique_customers': 'count',
+    'new_policy_count': 'count',
+    'ANBP_value': 'money',
+    'net_income': 'money',
+    'number_of_policy_holders': 'count',
+    'number_of_cash_payment_policies': 'count',
+}
+MONTH_COLUMNS = [column for column, kind in EMPLOYEE_SCHEMA.items() if kind == 'month']
+
+# Stands in for a missing month in an int16 ordinal column
+MISSING_MONTH = np.iinfo(np.int16).min
+# Signed types only, so differences of counts never wrap around
+_INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def is_month_ordinal(values):
+    """True for month columns stored compactly as integer ordinals."""
+    return pd.api.types.is_integer_dtype(getattr(values, 'dtype', None))
+
+
+def month_ordinals(values):
+    """Months since 1970-01 as float64 (NaN where missing), from datetimes or ordinals."""
+    if is_month_ordinal(values):
+        ordinals = np.asarray(values, dtype=np.float64)
+        ordinals[ordinals == MISSING_MONTH] = np.nan
+        return ordinals
+    dates = pd.to_datetime(pd.Series(values) if not isinstance(values, pd.Series) else values,
+                           errors='coerce').to_numpy().astype('datetime64[M]')
+    ordinals = dates.view(np.int64).astype(np.float64)
+    ordinals[np.isnat(dates)] = np.nan
+    return ordinals
+
+
+def month_dates(values):
+    """datetime64[ns] month starts (NaT where missing) from ordinals; datetimes pass through."""
+    if not is_month_ordinal(values):
+        return values
+    ordinals = np.asarray(values, dtype=np.int64)
+    dates = ordinals.astype('datetime64[M]').astype('datetime64[ns]')
+    dates[ordinals == MISSING_MONTH] = np.datetime64('NaT')
+    if isinstance(values, pd.Series):
+        return pd.Series(dates, index=values.index, name=values.name)
+    return dates
+
+
+def with_month_dates(df):
+    """df with any ordinal month columns decoded to datetimes (df itself if there are none)."""
+    encoded = [column for column in MONTH_COLUMNS if column in df.columns and is_month_ordinal(df[column])]
+    if not encoded:
+        return df
+    decoded = df.copy(deep=False)
+    for column in encoded:
+        decoded[column] = month_dates(df[column].to_numpy())
+    return decoded
+
+
+def smallest_int_dtype(low, high):
+    """Smallest signed integer dtype holding every value in [low, high]."""
+    for dtype in _INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    raise OverflowError(f"No integer type holds [{low}, {high}]")
+
+
+def _compact_column(values, kind, like=None):
+    if kind == 'code':
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(str).astype('category')
+    if kind == 'money':
+        return values.astype(np.float32)
+    if kind == 'month':
+        if is_month_ordinal(values):
+            return values.astype(np.int16)
+        ordinals = month_ordinals(values)
+        return pd.Series(np.where(np.isnan(ordinals), MISSING_MONTH, ordinals).astype(np.int16),
+                         index=values.index, name=values.name)
+    # id / count: whole numbers only; anything else (e.g. NaNs) is left alone
+    if not pd.api.types.is_integer_dtype(values.dtype) or values.empty:
+        return values
+    dtype = smallest_int_dtype(int(values.min()), int(values.max()))
+    if like is not None and pd.api.types.is_integer_dtype(like) and np.dtype(like).itemsize >= dtype.itemsize:
+        dtype = np.dtype(like)
+    return values.astype(dtype)
+
+
+def compact_employee(df, schema=EMPLOYEE_SCHEMA, like=None):
+    """Employee rows in the compact in-memory representation described by schema.
+
+    Counts are downcast to the smallest signed integer type that holds their
+    range, money columns become float32, agent_code categorical and month
+    columns int16 period ordinals. Columns not in the schema are kept as they
+    are. Pass like= an already compact frame to reuse its column types where the
+    values fit (e.g. for rows that are about to be appended to it).
+    """
+    compact = df.copy(deep=False)
+    for column, kind in schema.items():
+        if column in compact.columns:
+            target = like[column].dtype if like is not None and column in like.columns else None
+            compact[column] = _compact_column(compact[column], kind, target)
+    return compact
+
+
+def expand_employee(df, schema=EMPLOYEE_SCHEMA):
+    """The loader representation back from a compact frame: int64 counts and money, datetime months."""
+    expanded = with_month_dates(df)
+    for column, kind in schema.items():
+        if column in expanded.columns and kind in ('id', 'count', 'money') \
+                and pd.api.types.is_numeric_dtype(expanded[column].dtype):
+            values = expanded[column]
+            whole = kind != 'money' or bool((values.dropna() % 1 == 0).all())
+            expanded[column] = values.astype(np.int64 if whole and not values.isna().any() else np.float64)
+    return expanded
+
+
+def memory_report(before, after):
+    """Per-column dtype and deep memory footprint of two representations of the same rows."""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.reindex(before.columns).astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'bytes_after': after.memory_usage(index=False, deep=True).reindex(before.columns),
+    })
+    report.loc['total'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['saved'] = 1 - report['bytes_after'] / report['bytes_before']
+    return report
+
+
+if __name__ == "__main__":
+    from data_ingest import load_employee_data
+
+    loaded = load_employee_data()
+    compact = compact_employee(loaded)
+    report = memory_report(loaded, compact)
+    with pd.option_context('display.width', 140, 'display.max_rows', 100, 'display.max_columns', 10):
+        print(report.assign(MB_before=report['bytes_before'] / 1024 ** 2, MB_after=report['bytes_after'] / 1024 ** 2)
+              [['dtype_before', 'dtype_after', 'MB_before', 'MB_after', 'saved']].round(3))
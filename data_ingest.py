@@ -0,0 +1,312 @@
+import os
+import json
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from compact import compact_employee
+
+# Source workbooks live in data/, the typed Parquet copies in data/.cache/
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+MANIFEST_NAME = "manifest.json"
+
+EMPLOYEE_FILE = "employee_data.xlsx"
+TARGET_FILE = "target_data.xlsx"
+
+DATE_COLUMNS = ['agent_join_month', 'first_policy_sold_month', 'year_month']
+CATEGORICAL_COLUMNS = ['agent_code']
+
+# Columns every employee (agent-month) file must provide, in workbook order
+EMPLOYEE_COLUMNS = [
+    'row_id', 'agent_code', 'agent_age', 'agent_join_month', 'first_policy_sold_month', 'year_month',
+    'unique_proposals_last_7_days', 'unique_proposals_last_15_days', 'unique_proposals_last_21_days', 'unique_proposal',
+    'unique_quotations_last_7_days', 'unique_quotations_last_15_days', 'unique_quotations_last_21_days', 'unique_quotations',
+    'unique_customers_last_7_days', 'unique_customers_last_15_days', 'unique_customers_last_21_days', 'unique_customers',
+    'new_policy_count', 'ANBP_value', 'net_income', 'number_of_policy_holders', 'number_of_cash_payment_policies',
+]
+
+
+def _file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _month_strings(year_month):
+    return sorted(pd.Series(year_month.dropna().unique()).dt.strftime('%Y-%m').tolist())
+
+
+def _cache_path(cache_dir, source_path):
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(cache_dir, f"{name}.parquet")
+
+
+def decode_columns(df):
+    """Apply the typed decoding shared by every loader (dates and categorical codes)."""
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(str).astype('category')
+    return df
+
+
+def read_source(source_path):
+    """Read and decode a source workbook (or CSV) directly, bypassing the cache."""
+    if source_path.lower().endswith(".csv"):
+        df = pd.read_csv(source_path)
+    else:
+        df = pd.read_excel(source_path)
+    return decode_columns(df)
+
+
+def _cache_is_fresh(entry, source_path, stat, cache_dir):
+    """Check a manifest entry against the source file's mtime, falling back to its hash."""
+    if not entry or not os.path.exists(os.path.join(cache_dir, entry.get("cache_file", ""))):
+        return False, None
+    if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        return True, None
+    # mtime changed (e.g. a fresh checkout) -- only rebuild if the content changed too
+    digest = _file_hash(source_path)
+    return entry.get("sha256") == digest, digest
+
+
+def _write_cache(df, source_path, cache_dir, digest=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = _cache_path(cache_dir, source_path)
+    tmp_path = cache_path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+    os.replace(tmp_path, cache_path)
+
+    stat = os.stat(source_path)
+    manifest = _read_manifest(cache_dir)
+    name = os.path.basename(source_path)
+    entry = {
+        "cache_file": os.path.basename(cache_path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": digest or _file_hash(source_path),
+        "rows": len(df),
+    }
+    if 'year_month' in df.columns:
+        entry["months"] = _month_strings(df['year_month'])
+        # Appended months survive a rebuild unless the new workbook already contains them
+        base_months = set(entry["months"])
+        entry["segments"] = [segment for segment in manifest.get(name, {}).get("segments", [])
+                             if not base_months.intersection(segment["months"])]
+    manifest[name] = entry
+    _write_manifest(cache_dir, manifest)
+
+
+def rebuild_cache(source_path, cache_dir=CACHE_DIR):
+    """Convert a source workbook into its typed Parquet cache and record it in the manifest."""
+    df = read_source(source_path)
+    _write_cache(df, source_path, cache_dir)
+    return df
+
+
+def load_cached(source_path, cache_dir=CACHE_DIR):
+    """Load a source workbook through its Parquet cache.
+
+    The cache is keyed on the source file's mtime and SHA-256 hash; it is rebuilt
+    from the workbook only when the source has changed or the cache is missing.
+    If the cache directory is not writable the workbook is simply read directly.
+    """
+    stat = os.stat(source_path)
+    name = os.path.basename(source_path)
+    entry = _read_manifest(cache_dir).get(name)
+    fresh, digest = _cache_is_fresh(entry, source_path, stat, cache_dir)
+
+    if fresh:
+        try:
+            df = pq.read_table(os.path.join(cache_dir, entry["cache_file"]), memory_map=True).to_pandas()
+        except (OSError, pa.ArrowException):
+            df = None  # Corrupt or unreadable cache -- fall through to a rebuild
+        if df is not None:
+            if digest is not None:
+                # Content unchanged, only the mtime moved: refresh the key in place
+                manifest = _read_manifest(cache_dir)
+                manifest[name] = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                try:
+                    _write_manifest(cache_dir, manifest)
+                except OSError:
+                    pass
+            return df
+
+    # Excel fallback: decode the workbook once and try to leave a cache behind
+    df = read_source(source_path)
+    try:
+        _write_cache(df, source_path, cache_dir, digest=digest)
+    except OSError:
+        pass
+    return df
+
+
+def source_key(source_name, cache_dir=CACHE_DIR):
+    """Content hash of a cached source file and its appended months ('' if not cached yet)."""
+    entry = _read_manifest(cache_dir).get(source_name, {})
+    if not entry.get("segments"):
+        return entry.get("sha256", "")
+    digest = hashlib.sha256(entry.get("sha256", "").encode())
+    for segment in entry["segments"]:
+        digest.update(segment["sha256"].encode())
+    return digest.hexdigest()
+
+
+def save_derived(name, df, key, cache_dir=CACHE_DIR):
+    """Persist a table derived from the sources (aggregates, features...) tagged with the key it was built from."""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        cache_file = f"{name}.parquet"
+        tmp_path = os.path.join(cache_dir, cache_file + ".tmp")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+        os.replace(tmp_path, os.path.join(cache_dir, cache_file))
+        manifest = _read_manifest(cache_dir)
+        manifest.setdefault("_derived", {})[name] = {"cache_file": cache_file, "key": key, "rows": len(df)}
+        _write_manifest(cache_dir, manifest)
+    except OSError:
+        pass  # Derived tables are an optimisation; a read-only cache just means recomputing
+
+
+def load_derived(name, key, cache_dir=CACHE_DIR):
+    """Load a derived table if it was built from the same key, otherwise None."""
+    entry = _read_manifest(cache_dir).get("_derived", {}).get(name)
+    if not entry or not key or entry.get("key") != key:
+        return None
+    try:
+        return pq.read_table(os.path.join(cache_dir, entry["cache_file"]), memory_map=True).to_pandas()
+    except (OSError, pa.ArrowException):
+        return None
+
+
+def concat_employee_rows(frames):
+    """Concatenate agent-month frames, keeping agent_code categorical over the union of codes."""
+    codes = pd.api.types.union_categoricals(
+        [pd.Categorical(frame['agent_code'].astype(str)) for frame in frames], sort_categories=True)
+    dtype = pd.CategoricalDtype(codes.categories)
+    return pd.concat([frame.assign(agent_code=frame['agent_code'].astype(str).astype(dtype)) for frame in frames],
+                     ignore_index=True)
+
+
+def validate_employee_rows(df, existing_months=()):
+    """Check a batch of agent-month rows against the employee schema.
+
+    Raises ValueError on missing columns, non-numeric measures, unparseable
+    months, duplicate agent-months, or months that are already loaded.
+    Returns the rows restricted to EMPLOYEE_COLUMNS.
+    """
+    missing = [col for col in EMPLOYEE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    numeric = [col for col in EMPLOYEE_COLUMNS if col not in DATE_COLUMNS + CATEGORICAL_COLUMNS]
+    not_numeric = [col for col in numeric if not pd.api.types.is_numeric_dtype(df[col])]
+    if not_numeric:
+        raise ValueError(f"Non-numeric values in columns: {not_numeric}")
+    if df['year_month'].isna().any() or df['agent_code'].isna().any():
+        raise ValueError("Every row needs an agent_code and a valid year_month")
+    duplicated = df.duplicated(['agent_code', 'year_month'])
+    if duplicated.any():
+        raise ValueError(f"{int(duplicated.sum())} duplicate agent_code/year_month rows")
+    overlap = set(_month_strings(df['year_month'])).intersection(existing_months)
+    if overlap:
+        raise ValueError(f"Months already loaded: {sorted(overlap)}")
+    return df[EMPLOYEE_COLUMNS]
+
+
+def append_employee_month(source_path, data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    """Ingest a new month's agent rows without touching the existing history.
+
+    The file is validated, written as its own Parquet segment and registered in
+    the manifest; load_employee_data picks it up from then on. Returns the new
+    rows (decoded) so in-memory stores can merge them directly.
+    """
+    base = os.path.join(data_dir, EMPLOYEE_FILE)
+    entry = _read_manifest(cache_dir).get(EMPLOYEE_FILE)
+    if not entry or not _cache_is_fresh(entry, base, os.stat(base), cache_dir)[0]:
+        load_cached(base, cache_dir)  # one-off: the base workbook has to be cached first
+    entry = _read_manifest(cache_dir)[EMPLOYEE_FILE]
+
+    known_months = set(entry.get("months", []))
+    for segment in entry.get("segments", []):
+        known_months.update(segment["months"])
+    rows = validate_employee_rows(read_source(source_path), known_months)
+
+    digest = _file_hash(source_path)
+    cache_file = f"{os.path.splitext(EMPLOYEE_FILE)[0]}.append-{digest[:12]}.parquet"
+    tmp_path = os.path.join(cache_dir, cache_file + ".tmp")
+    pq.write_table(pa.Table.from_pandas(rows, preserve_index=False), tmp_path)
+    os.replace(tmp_path, os.path.join(cache_dir, cache_file))
+
+    manifest = _read_manifest(cache_dir)
+    manifest[EMPLOYEE_FILE].setdefault("segments", []).append({
+        "cache_file": cache_file,
+        "source": os.path.basename(source_path),
+        "sha256": digest,
+        "rows": len(rows),
+        "months": _month_strings(rows['year_month']),
+    })
+    _write_manifest(cache_dir, manifest)
+    return rows
+
+
+def load_employee_data(data_dir=DATA_DIR, cache_dir=CACHE_DIR, compact=False):
+    """Employee rows from the workbook cache plus any appended monthly segments.
+
+    compact=True returns compact.EMPLOYEE_SCHEMA's in-memory representation
+    (downcast counts, float32 money, int16 month ordinals).
+    """
+    df = load_cached(os.path.join(data_dir, EMPLOYEE_FILE), cache_dir)
+    segments = _read_manifest(cache_dir).get(EMPLOYEE_FILE, {}).get("segments", [])
+    if segments:
+        frames = [df] + [pq.read_table(os.path.join(cache_dir, segment["cache_file"]), memory_map=True).to_pandas()
+                         for segment in segments]
+        df = concat_employee_rows(frames)
+    return compact_employee(df) if compact else df
+
+
+def load_target_data(data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    return load_cached(os.path.join(data_dir, TARGET_FILE), cache_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the Parquet cache or append a month of agent data.")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("build", help="(Re)build the cache from the Excel workbooks (default)")
+    append_parser = subparsers.add_parser("append", help="Append a new month's agent rows (.xlsx or .csv)")
+    append_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "append":
+        rows = append_employee_month(args.path)
+        print(f"Appended {len(rows)} rows for {', '.join(_month_strings(rows['year_month']))}")
+    else:
+        # Pre-build the cache (e.g. as a deploy step) so the first page load skips openpyxl
+        for name in [EMPLOYEE_FILE, TARGET_FILE]:
+            source = os.path.join(DATA_DIR, name)
+            df = rebuild_cache(source)
+            print(f"Cached {name}: {len(df)} rows -> {_cache_path(CACHE_DIR, source)}")
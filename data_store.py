@@ -0,0 +1,476 @@
+import os
+import threading
+import pandas as pd
+import numpy as np
+from data_ingest import (DATA_DIR, CACHE_DIR, EMPLOYEE_FILE, load_employee_data, load_target_data, source_key,
+                         load_derived, save_derived, append_employee_month)
+from agent_index import AgentIndex
+from agent_tensor import AgentTensor
+from streak_index import StreakIndex
+from agent_search import AgentSearchIndex
+from risk_index import RiskIndex
+from classification import classify_all_agents
+from aggregates import build_cube, update_cube
+from features import compute_features
+from nill_model import load_model, load_metadata, is_trusted
+from nill_scoring import latest_snapshot_name, load_latest_snapshot, load_explanations
+from clustering import load_cluster_model, build_agent_perf, update_agent_perf
+from instrumentation import cache_event
+from compact import compact_employee
+
+# Saved AgentTensor arrays, memory-mapped by later processes
+TENSOR_DIR = os.path.join(CACHE_DIR, "agent_tensor")
+
+
+def read_agent_perf(data_dir=DATA_DIR):
+    """Read agent_perf.csv (clusters, performance groups and NILL flags per agent)."""
+    df = pd.read_csv(os.path.join(data_dir, "agent_perf.csv"))
+    df['agent_code'] = df['agent_code'].astype(str)
+    # is_nill may be stored as a string
+    if 'is_nill' in df.columns:
+        df['is_nill'] = df['is_nill'].astype(str).str.lower() == 'true'
+    return df
+
+
+class AgentDataStore:
+    """Process-wide holder of the app's datasets.
+
+    Every page reads through the same store, so each dataset is loaded exactly
+    once per process no matter how many pages are open. Accessors return
+    shallow views that share memory with the shared frames, so callers must
+    not modify them in place (assigning whole columns is fine). The Streamlit
+    pages turn on pandas copy-on-write, which makes any change a page makes
+    land in a private copy.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self._frames = {}
+        self._index = None
+        self._classification = None
+        self._cube = None
+        self._tensor = None
+        self._streaks = None
+        self._search = None
+        self._search_key = None
+        self._risk = None
+        self._risk_key = None
+        self._nill_model = None
+        self._cluster_model = None
+        self._snapshot_name = None
+        self._explanations = None
+        self._score_positions = None
+        self._snapshot_trusted = False
+        # Set when rows were merged in memory only, so derived caches on disk no longer match
+        self._unpersisted = False
+        # Stores over in-memory frames ignore the scored snapshots of the real data
+        self._read_snapshots = True
+        # Bumped whenever the employee data changes; keys derived caches (e.g. charts)
+        self.data_version = 0
+        self._lock = threading.RLock()
+        self._loaders = {
+            'employee': self._load_employee,
+            'target': lambda: load_target_data(self.data_dir),
+            'agent_perf': self._load_agent_perf,
+        }
+
+    @classmethod
+    def from_frames(cls, employee, target=None, data_dir=DATA_DIR):
+        """A store over in-memory frames instead of the data directory (e.g. synthetic data).
+
+        Derived results are computed on demand and never read from or written
+        to the on-disk caches.
+        """
+        store = cls(data_dir)
+        store._index = AgentIndex(compact_employee(employee))
+        store._frames['employee'] = store._index.frame
+        if target is not None:
+            store._frames['target'] = target
+        store._unpersisted = True
+        store._read_snapshots = False
+        store.data_version += 1
+        return store
+
+    def _load_employee(self):
+        # The employee frame is kept compact (see compact.EMPLOYEE_SCHEMA) and in
+        # agent-index order so that per-agent lookups on it are positional slices
+        self._index = AgentIndex(load_employee_data(self.data_dir, compact=True))
+        self.data_version += 1
+        return self._index.frame
+
+    def _load_agent_perf(self):
+        # Live cluster assignments when a fitted cluster model is saved,
+        # otherwise the one-off export in agent_perf.csv
+        model = self.cluster_model()
+        if model is None:
+            return read_agent_perf(self.data_dir)
+        return build_agent_perf(self._get('employee'), model, self.nill_flags())
+
+    def _get(self, name):
+        frame = self._frames.get(name)
+        cache_event(f'store.{name}', frame is not None)
+        if frame is None:
+            with self._lock:
+                frame = self._frames.get(name)
+                if frame is None:
+                    frame = self._loaders[name]()
+                    self._frames[name] = frame
+        return frame.copy(deep=False)
+
+    def employee(self):
+        return self._get('employee')
+
+    def target(self):
+        return self._get('target')
+
+    def agent_perf(self):
+        return self._get('agent_perf')
+
+    def agent_index(self):
+        """Per-agent slice index over the employee frame (built once at load time)."""
+        index = self._index
+        if index is None:
+            self._get('employee')
+            index = self._index
+        return index
+
+    def agent_classification(self):
+        """Per-agent KPIs and performance classes for the whole population."""
+        cache_event('store.agent_classification', self._classification is not None)
+        if self._classification is None:
+            employee = self._get('employee')
+            with self._lock:
+                if self._classification is None:
+                    self._classification = classify_all_agents(employee)
+        return self._classification.copy(deep=False)
+
+    def aggregate_cube(self):
+        """Monthly measures by age group, tenure band and performance group.
+
+        Materialised once per version of the employee data and persisted next to
+        the Parquet cache, so later processes load it instead of re-aggregating.
+        """
+        cache_event('store.aggregate_cube', self._cube is not None)
+        if self._cube is None:
+            classification = self.agent_classification()
+            with self._lock:
+                if self._cube is None:
+                    key = self._cube_key()
+                    cube = load_derived('agent_cube', key) if key else None
+                    if cube is None:
+                        cube = build_cube(self._get('employee'), classification['performance_status'])
+                        if key:
+                            save_derived('agent_cube', cube, key)
+                    self._cube = cube
+        return self._cube.copy(deep=False)
+
+    def agent_tensor(self):
+        """Dense agents x months x metrics array of the employee data (see agent_tensor.py).
+
+        Built once per version of the employee data and saved as .npy files
+        next to the Parquet cache, which later processes memory-map instead of
+        rebuilding.
+        """
+        cache_event('store.agent_tensor', self._tensor is not None)
+        if self._tensor is None:
+            self._get('employee')
+            with self._lock:
+                if self._tensor is None:
+                    key = self._tensor_key()
+                    tensor = AgentTensor.load(TENSOR_DIR, key) if key else None
+                    if tensor is None:
+                        tensor = AgentTensor.from_index(self._index)
+                        if key:
+                            try:
+                                tensor.save(TENSOR_DIR, key)
+                            except OSError:
+                                pass  # Like the derived tables, a read-only cache just means rebuilding
+                    self._tensor = tensor
+        return self._tensor
+
+    def streak_index(self):
+        """Per-agent zero-sales streaks and months since last sale (see streak_index.py).
+
+        Built from the agent tensor once and updated in place of a rebuild when
+        months are appended.
+        """
+        cache_event('store.streak_index', self._streaks is not None)
+        if self._streaks is None:
+            tensor = self.agent_tensor()
+            with self._lock:
+                if self._streaks is None:
+                    self._streaks = StreakIndex.from_tensor(tensor)
+        return self._streaks
+
+    def agent_search(self):
+        """Prefix search over agent codes with performance, NILL, tenure and age filters (see agent_search.py).
+
+        Rebuilt when the employee data or the NILL snapshot changes.
+        """
+        flags = self.nill_flags()
+        key = (self.data_version, self._snapshot_name)
+        cache_event('store.agent_search', self._search is not None and self._search_key == key)
+        if self._search is None or self._search_key != key:
+            status = self.agent_classification()['performance_status']
+            with self._lock:
+                if self._search is None or self._search_key != key:
+                    self._search = AgentSearchIndex.build(self.agent_index().latest_rows(), status, flags)
+                    self._search_key = key
+        return self._search
+
+    def risk_index(self):
+        """Every agent's NILL risk, zero-sales streak, performance group and latest sales, sorted riskiest first.
+
+        Probabilities come from the latest scored snapshot, or are scored live
+        when only a model exists; the at-risk flags are those of nill_flags.
+        Rebuilt when the employee data or the snapshot changes.
+        """
+        snapshot = self.nill_scores()
+        key = (self.data_version, self._snapshot_name)
+        cache_event('store.risk_index', self._risk is not None and self._risk_key == key)
+        if self._risk is None or self._risk_key != key:
+            if snapshot is not None:
+                scores = snapshot.assign(agent_code=snapshot['agent_code'].astype(str)).set_index('agent_code')
+            else:
+                scores = self.score_all_agents()
+            if scores is not None:
+                flags = self.nill_flags()
+                target = (flags.assign(agent_code=flags['agent_code'].astype(str))
+                          .drop_duplicates('agent_code', keep='last').set_index('agent_code')['target']
+                          .reindex(scores.index))
+                scores = scores[['nill_probability']].assign(
+                    at_nill_risk=target.eq(0).astype('boolean').mask(target.isna()))
+            status = self.agent_classification()['performance_status']
+            streaks = self.streak_index().table()
+            with self._lock:
+                if self._risk is None or self._risk_key != key:
+                    self._risk = RiskIndex.build(self.agent_index().latest_rows(), scores, streaks, status)
+                    self._risk_key = key
+        return self._risk
+
+    def nill_model(self):
+        """The latest saved NILL model, loaded once per process (None if none is trained)."""
+        if self._nill_model is None:
+            with self._lock:
+                if self._nill_model is None:
+                    try:
+                        self._nill_model = load_model()
+                    except FileNotFoundError:
+                        return None
+        return self._nill_model
+
+    def cluster_model(self):
+        """The saved agent cluster model (see clustering.py), or None if none was fitted."""
+        if self._cluster_model is None:
+            with self._lock:
+                if self._cluster_model is None:
+                    try:
+                        self._cluster_model = load_cluster_model()
+                    except FileNotFoundError:
+                        return None
+        return self._cluster_model
+
+    def nill_scores(self):
+        """The latest batch-scored NILL snapshot (see nill_scoring.py), or None if none exists.
+
+        A newer snapshot written by the nightly job replaces the loaded one on the next call.
+        """
+        name = latest_snapshot_name() if self._read_snapshots else None
+        if name is None:
+            return None
+        if name != self._snapshot_name:
+            with self._lock:
+                if name != self._snapshot_name:
+                    self._frames['nill_scores'] = load_latest_snapshot()
+                    self._score_positions = pd.Index(self._frames['nill_scores']['agent_code'].astype(str))
+                    self._snapshot_trusted = self._model_trusted(self._frames['nill_scores'])
+                    self._explanations = load_explanations(name)
+                    self._snapshot_name = name
+        return self._frames['nill_scores'].copy(deep=False)
+
+    @staticmethod
+    def _model_trusted(snapshot):
+        versions = snapshot['model_version'].astype(str).unique()
+        try:
+            return len(versions) == 1 and is_trusted(load_metadata(versions[0]))
+        except FileNotFoundError:
+            return False
+
+    def nill_explanation(self, agent_code):
+        """SHAP explanation of an agent's latest snapshot score, strongest feature first.
+
+        A hash lookup into the explanation table stored with the snapshot;
+        returns a frame of feature, value and shap (log-odds of selling, so
+        negative = towards NILL), or None if the snapshot has no explanations.
+        """
+        self.nill_scores()
+        explanations = self._explanations
+        if explanations is None or agent_code not in explanations.index:
+            return None
+        row = explanations.iloc[explanations.index.get_loc(agent_code)]
+        k = sum(column.startswith('feature_') for column in explanations.columns)
+        return pd.DataFrame({
+            'feature': [row[f'feature_{i}'] for i in range(1, k + 1)],
+            'value': [float(row[f'value_{i}']) for i in range(1, k + 1)],
+            'shap': [float(row[f'shap_{i}']) for i in range(1, k + 1)],
+        })
+
+    def nill_score(self, agent_code):
+        """An agent's row of the latest snapshot as a Series, or None if there is no snapshot or it lacks the agent."""
+        scores = self.nill_scores()
+        if scores is None or agent_code not in self._score_positions:
+            return None
+        # A snapshot has one row per agent, so this is a single hash lookup
+        return scores.iloc[self._score_positions.get_loc(agent_code)]
+
+    def nill_flags(self):
+        """Per-agent NILL flags ('agent_code', 'target' with 0 = at risk).
+
+        Read from the latest scored snapshot, falling back to the hand-exported
+        target_data.xlsx until one has been written by a model whose mean fold
+        AUC reaches nill_model.MIN_MEAN_AUC.
+        """
+        scores = self.nill_scores()
+        return scores if scores is not None and self._snapshot_trusted else self.target()
+
+    def score_agent(self, agent_code):
+        """Live NILL score of one agent's latest month: dict with nill_probability,
+        at_nill_risk, model_version and trusted (see nill_model.MIN_MEAN_AUC), or
+        None without a model or history."""
+        model = self.nill_model()
+        history = self.agent_index().history(agent_code)
+        if model is None or history.empty:
+            return None
+        score = model.score_features(compute_features(history.iloc[-1:])).iloc[0]
+        return {
+            'nill_probability': float(score['nill_probability']),
+            'at_nill_risk': bool(score['at_nill_risk']),
+            'model_version': model.version,
+            'trusted': model.trusted,
+        }
+
+    def score_all_agents(self):
+        """Live NILL scores of every agent's latest month, indexed by agent_code (None without a model)."""
+        model = self.nill_model()
+        if model is None:
+            return None
+        return model.score_latest(self.employee(), index=self.agent_index())
+
+    def _cube_key(self):
+        if self._unpersisted:
+            return None
+        return f"{source_key(EMPLOYEE_FILE)}:cube-v1"
+
+    def _tensor_key(self):
+        if self._unpersisted:
+            return None
+        return f"{source_key(EMPLOYEE_FILE)}:tensor-v1"
+
+    def _agent_rows(self, index, agent_codes):
+        positions = [np.arange(index.slice(code).start, index.slice(code).stop) for code in agent_codes]
+        return index.frame.take(np.concatenate(positions) if positions else np.empty(0, dtype=np.int64))
+
+    def append_rows(self, new_rows):
+        """Merge new agent-month rows into the loaded data without reloading it.
+
+        The agent index gets the rows spliced in, and only the agents that
+        appear in new_rows are reclassified (and re-clustered); the aggregate
+        cube (if built) has the new rows added and the reclassified agents'
+        history moved to their new performance group. Rows are assumed to be validated already
+        (see data_ingest.validate_employee_rows).
+        """
+        with self._lock:
+            self._get('employee')
+            old_index = self._index
+            new_rows = compact_employee(new_rows, like=old_index.frame)
+            new_index = old_index.append(new_rows)
+            affected = sorted(new_rows['agent_code'].astype(str).unique())
+
+            if self._classification is not None:
+                old_table = self._classification
+                updated = classify_all_agents(self._agent_rows(new_index, affected))
+                table = pd.concat([old_table.drop(index=affected, errors='ignore'), updated]).sort_index()
+                for column in ['performance_category', 'performance_status']:
+                    table[column] = table[column].astype(old_table[column].dtype)
+
+                if self._cube is not None:
+                    known = [code for code in affected if code in old_table.index]
+                    moved = [code for code in known
+                             if old_table.at[code, 'performance_status'] != table.at[code, 'performance_status']]
+                    self._cube = update_cube(self._cube, new_rows, table['performance_status'],
+                                             changed_rows=self._agent_rows(old_index, moved),
+                                             old_status=old_table['performance_status'])
+                self._classification = table
+            else:
+                self._cube = None
+
+            if 'agent_perf' in self._frames and self._cluster_model is not None:
+                # Nearest-centroid reassignment of the agents with new rows only
+                self._frames['agent_perf'] = update_agent_perf(
+                    self._frames['agent_perf'], self._agent_rows(new_index, affected), affected, self._cluster_model)
+
+            if self._streaks is not None:
+                self._streaks = self._streaks.append(new_rows, new_index)
+            # Rebuilt from the new index on next use
+            self._tensor = None
+            self._index = new_index
+            self._frames['employee'] = new_index.frame
+            self._unpersisted = True
+            self.data_version += 1
+
+    def ingest_month(self, path):
+        """Persist a new month's file to the cache and merge it into the loaded data.
+
+        Returns the number of rows appended.
+        """
+        with self._lock:
+            rows = append_employee_month(path, self.data_dir)
+            if 'employee' in self._frames:
+                unpersisted = self._unpersisted
+                self.append_rows(rows)
+                self._unpersisted = unpersisted
+                key = self._cube_key()
+                if self._cube is not None and key:
+                    save_derived('agent_cube', self._cube, key)
+        return len(rows)
+
+    def is_loaded(self, name=None):
+        if name is not None:
+            return name in self._frames
+        return all(key in self._frames for key in self._loaders)
+
+    def memory_report(self):
+        """Rows, columns and deep memory footprint (bytes) of each loaded dataset."""
+        rows = []
+        for name, frame in self._frames.items():
+            rows.append({
+                'dataset': name,
+                'rows': len(frame),
+                'columns': frame.shape[1],
+                'bytes': int(frame.memory_usage(index=True, deep=True).sum()),
+            })
+        report = pd.DataFrame(rows, columns=['dataset', 'rows', 'columns', 'bytes'])
+        report['MB'] = report['bytes'] / 1024 ** 2
+        return report
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the shared AgentDataStore, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AgentDataStore()
+    return _store
+
+
+def set_store(store):
+    """Replace the shared store (e.g. with AgentDataStore.from_frames) and return the previous one."""
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from compact import is_month_ordinal, month_dates
+
+# Raw agent-month columns the features are computed from (input contract)
+REQUIRED_COLUMNS = [
+    'agent_age', 'agent_join_month', 'first_policy_sold_month', 'year_month',
+    'unique_proposals_last_7_days', 'unique_proposals_last_15_days', 'unique_proposals_last_21_days', 'unique_proposal',
+    'unique_quotations',
+    'unique_customers_last_7_days', 'unique_customers_last_15_days', 'unique_customers_last_21_days', 'unique_customers',
+    'net_income',
+]
+
+# Features the NILL model is trained on, in model order (output contract)
+FEATURE_COLUMNS = [
+    'log_net_income', 'first_policy_delay_month', 'quotation_to_customer_ratio', 'months_since_join',
+    'proposal_to_customer_ratio', 'recent_customer_ratio', 'recent_proposal_ratio', 'activity_last_21_days',
+    'quotation_to_proposal_ratio', 'agent_age_group_encoded',
+]
+
+# Every feature compute_features can produce; the extras are kept from the notebook for analysis
+ALL_FEATURE_COLUMNS = FEATURE_COLUMNS + ['activity_week_2', 'activity_last_15_days', 'month']
+
+# Upper edges of the Teen / YoungAdult / MiddleAge / Senior age groups (encoded 0-3, right-inclusive)
+AGE_GROUP_EDGES = [19, 39, 59]
+AGE_GROUP_LABELS = ["Teen", "YoungAdult", "MiddleAge", "Senior"]
+
+# Added to ratio denominators so agents with no activity get 0 rather than inf
+RATIO_EPSILON = 1e-3
+
+_NS_PER_DAY = 86_400 * 10 ** 9
+
+
+def check_columns(df, columns=REQUIRED_COLUMNS):
+    """Raise ValueError if df lacks any of the given columns."""
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns for feature computation: {missing}")
+
+
+def _values(df, column):
+    return df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _datetimes(df, column):
+    values = df[column]
+    if is_month_ordinal(values):
+        return month_dates(values.to_numpy())
+    if not pd.api.types.is_datetime64_ns_dtype(values.dtype):
+        values = pd.to_datetime(values, errors='coerce').astype('datetime64[ns]')
+    return values.to_numpy()
+
+
+def _days(df, column):
+    # Whole days since the epoch (NaN for missing dates), matching Timedelta.days
+    values = _datetimes(df, column)
+    days = np.floor_divide(values.view(np.int64), _NS_PER_DAY).astype(np.float64)
+    days[np.isnat(values)] = np.nan
+    return days
+
+
+def _month(df, column):
+    values = _datetimes(df, column)
+    month = (values.astype('datetime64[M]').view(np.int64) % 12 + 1).astype(np.float64)
+    month[np.isnat(values)] = np.nan
+    return month
+
+
+def _age_group_code(age):
+    codes = np.searchsorted(AGE_GROUP_EDGES, age, side='left').astype(np.float64)
+    # pd.cut with bins [0, 19, 39, 59, inf] leaves ages <= 0 and missing ages unbinned
+    codes[~(age > 0)] = np.nan
+    return codes
+
+
+def compute_features(df, columns=FEATURE_COLUMNS, keep=()):
+    """NILL model features for each agent-month row of df.
+
+    Same definitions as add_engineered_features / add_age_group_feature in the
+    NILL notebook, computed on whole columns without modifying df. Returns a
+    new float32 frame aligned with df's index, holding `columns` in order,
+    preceded by any `keep` columns copied from df (e.g. agent_code, year_month).
+    """
+    check_columns(df)
+    unknown = [col for col in columns if col not in ALL_FEATURE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown feature columns: {unknown}")
+
+    proposals = _values(df, 'unique_proposal')
+    quotations = _values(df, 'unique_quotations')
+    customers = _values(df, 'unique_customers')
+    proposals_7 = _values(df, 'unique_proposals_last_7_days')
+    customers_7 = _values(df, 'unique_customers_last_7_days')
+    week_1 = proposals_7 + customers_7
+    week_2 = _values(df, 'unique_proposals_last_15_days') + _values(df, 'unique_customers_last_15_days')
+    week_3 = _values(df, 'unique_proposals_last_21_days') + _values(df, 'unique_customers_last_21_days')
+    join_days = _days(df, 'agent_join_month')
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        computed = {
+            'proposal_to_customer_ratio': lambda: proposals / (customers + RATIO_EPSILON),
+            'quotation_to_customer_ratio': lambda: quotations / (customers + RATIO_EPSILON),
+            'quotation_to_proposal_ratio': lambda: quotations / (proposals + RATIO_EPSILON),
+            'activity_week_2': lambda: week_2,
+            'activity_last_15_days': lambda: week_1 + week_2,
+            'activity_last_21_days': lambda: week_1 + week_2 + week_3,
+            'recent_proposal_ratio': lambda: proposals_7 / (proposals + RATIO_EPSILON),
+            'recent_customer_ratio': lambda: customers_7 / (customers + RATIO_EPSILON),
+            'months_since_join': lambda: np.abs(np.floor_divide(_days(df, 'year_month') - join_days, 30)),
+            'first_policy_delay_month': lambda: np.floor_divide(_days(df, 'first_policy_sold_month') - join_days, 30),
+            'month': lambda: _month(df, 'year_month'),
+            'log_net_income': lambda: np.log1p(_values(df, 'net_income')),
+            'agent_age_group_encoded': lambda: _age_group_code(_values(df, 'agent_age')),
+        }
+        data = {col: computed[col]().astype(np.float32) for col in columns}
+
+    features = pd.DataFrame(data, index=df.index, columns=list(columns))
+    if keep:
+        features = pd.concat([df[list(keep)], features], axis=1)
+    return features
+
+
+def iter_feature_chunks(source, chunk_size=250_000, columns=FEATURE_COLUMNS, keep=('agent_code', 'year_month')):
+    """Compute features chunk by chunk so large histories never sit in memory at once.
+
+    source is a Parquet file path (read in record batches) or an iterable of
+    DataFrames. Every feature depends only on its own row, so chunks need no
+    overlap. Yields one float32 feature frame (plus `keep` columns) per chunk.
+    """
+    if isinstance(source, str):
+        needed = list(dict.fromkeys(list(keep) + REQUIRED_COLUMNS))
+        batches = pq.ParquetFile(source).iter_batches(batch_size=chunk_size, columns=needed)
+        source = (batch.to_pandas() for batch in batches)
+    for chunk in source:
+        yield compute_features(chunk, columns=columns, keep=keep)
+
+
+def compute_features_chunked(source, chunk_size=250_000, columns=FEATURE_COLUMNS, keep=('agent_code', 'year_month')):
+    """iter_feature_chunks collected into one frame with a fresh RangeIndex."""
+    chunks = list(iter_feature_chunks(source, chunk_size, columns, keep))
+    if not chunks:
+        return pd.DataFrame(columns=list(keep) + list(columns))
+    return pd.concat(chunks, ignore_index=True)
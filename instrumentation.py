@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager, nullcontext
+
+# Off unless APP_PROFILE is set; when off, @timed returns functions unchanged
+# and span / cache_event do nothing, so instrumented code pays next to nothing
+ENABLED = os.environ.get("APP_PROFILE", "").lower() not in ("", "0", "false", "no")
+# Where each rerun is reported: *.prom for Prometheus text (cumulative), anything else as JSON lines
+OUTPUT_PATH = os.environ.get("APP_PROFILE_OUT")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_NULL_SPAN = nullcontext()
+
+_lock = threading.Lock()
+# Process-wide totals since start-up: name -> [calls, seconds, max seconds]
+_timings = {}
+# cache name -> [hits, misses]
+_cache_totals = {}
+# page -> [reruns, seconds]
+_rerun_totals = {}
+# The rerun being recorded on this script thread, if any
+_local = threading.local()
+
+
+def rss_bytes():
+    """Current resident set size of the process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _record(name, seconds):
+    with _lock:
+        entry = _timings.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None:
+        entry = rerun['timings'].setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+
+
+def timed(fn=None, name=None):
+    """Decorator timing every call of fn under `name` (default module.qualname).
+
+    Usable bare (@timed) or with a name (@timed(name="...")).
+    """
+    if fn is None:
+        return functools.partial(timed, name=name)
+    if not ENABLED:
+        return fn
+    label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(label, time.perf_counter() - start)
+    return wrapper
+
+
+@contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+
+def span(name):
+    """Context manager timing a block of page code, e.g. `with span("nill.charts"):`."""
+    return _span(name) if ENABLED else _NULL_SPAN
+
+
+def cache_event(cache, hit):
+    """Count a hit or miss of a named cache."""
+    if not ENABLED:
+        return
+    with _lock:
+        entry = _cache_totals.setdefault(cache, [0, 0])
+        entry[0 if hit else 1] += 1
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None:
+        entry = rerun['cache'].setdefault(cache, [0, 0])
+        entry[0 if hit else 1] += 1
+
+
+def start_rerun(page):
+    """Begin recording a script run of `page` on the current thread (call at the top of the page)."""
+    if not ENABLED:
+        return
+    _local.rerun = {'page': page, 'start': time.perf_counter(), 'rss_start': rss_bytes(),
+                    'timings': {}, 'cache': {}}
+
+
+def finish_rerun():
+    """Stop recording the current rerun, report it to OUTPUT_PATH and return its summary (or None)."""
+    rerun = getattr(_local, "rerun", None)
+    if not ENABLED or rerun is None:
+        return None
+    _local.rerun = None
+    seconds = time.perf_counter() - rerun['start']
+    rss = rss_bytes()
+    summary = {
+        'page': rerun['page'],
+        'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': round(seconds, 6),
+        'rss_bytes': rss,
+        'rss_delta_bytes': rss - rerun['rss_start'],
+        'timings': {name: {'calls': calls, 'seconds': round(total, 6), 'max_seconds': round(peak, 6)}
+                    for name, (calls, total, peak) in rerun['timings'].items()},
+        'cache': {name: {'hits': hits, 'misses': misses} for name, (hits, misses) in rerun['cache'].items()},
+    }
+    with _lock:
+        entry = _rerun_totals.setdefault(rerun['page'], [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+    if OUTPUT_PATH:
+        try:
+            if OUTPUT_PATH.endswith(".prom"):
+                write_prometheus(OUTPUT_PATH)
+            else:
+                with _lock, open(OUTPUT_PATH, "a") as f:
+                    f.write(json.dumps(summary) + "\n")
+        except OSError:
+            pass  # Reporting must never break the page
+    return summary
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text():
+    """Process-wide totals in the Prometheus text exposition format."""
+    with _lock:
+        timings = {name: list(entry) for name, entry in _timings.items()}
+        caches = {name: list(entry) for name, entry in _cache_totals.items()}
+        reruns = {page: list(entry) for page, entry in _rerun_totals.items()}
+    lines = ["# TYPE app_function_calls_total counter"]
+    lines += [f'app_function_calls_total{{name="{_label(name)}"}} {calls}' for name, (calls, _, _) in timings.items()]
+    lines.append("# TYPE app_function_seconds_total counter")
+    lines += [f'app_function_seconds_total{{name="{_label(name)}"}} {total:.6f}' for name, (_, total, _) in timings.items()]
+    lines.append("# TYPE app_function_max_seconds gauge")
+    lines += [f'app_function_max_seconds{{name="{_label(name)}"}} {peak:.6f}' for name, (_, _, peak) in timings.items()]
+    lines.append("# TYPE app_cache_hits_total counter")
+    lines += [f'app_cache_hits_total{{cache="{_label(name)}"}} {hits}' for name, (hits, _) in caches.items()]
+    lines.append("# TYPE app_cache_misses_total counter")
+    lines += [f'app_cache_misses_total{{cache="{_label(name)}"}} {misses}' for name, (_, misses) in caches.items()]
+    lines.append("# TYPE app_reruns_total counter")
+    lines += [f'app_reruns_total{{page="{_label(page)}"}} {count}' for page, (count, _) in reruns.items()]
+    lines.append("# TYPE app_rerun_seconds_total counter")
+    lines += [f'app_rerun_seconds_total{{page="{_label(page)}"}} {total:.6f}' for page, (_, total) in reruns.items()]
+    lines.append("# TYPE app_process_resident_memory_bytes gauge")
+    lines.append(f"app_process_resident_memory_bytes {rss_bytes()}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    # Replaced atomically so a scraper never reads half a file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def dev_panel():
+    """Finish the current rerun and show its timings, cache hits and memory in a collapsed expander.
+
+    Call once at the end of a page; does nothing unless APP_PROFILE is set.
+    """
+    summary = finish_rerun()
+    if summary is None:
+        return
+    import streamlit as st
+    import pandas as pd
+
+    with st.expander("Developer: performance of this run", expanded=False):
+        mb = 1024 ** 2
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rerun time", f"{summary['seconds'] * 1e3:,.0f} ms")
+        col2.metric("Resident memory", f"{summary['rss_bytes'] / mb:,.0f} MB")
+        col3.metric("Memory change", f"{summary['rss_delta_bytes'] / mb:+,.1f} MB")
+        if summary['timings']:
+            timings = pd.DataFrame([
+                {'Function': name, 'Calls': entry['calls'], 'Total (ms)': entry['seconds'] * 1e3,
+                 'Max (ms)': entry['max_seconds'] * 1e3}
+                for name, entry in summary['timings'].items()
+            ]).sort_values('Total (ms)', ascending=False)
+            st.dataframe(timings.round(2), hide_index=True, use_container_width=True)
+        if summary['cache']:
+            st.dataframe(pd.DataFrame([
+                {'Cache': name, 'Hits': entry['hits'], 'Misses': entry['misses']}
+                for name, entry in summary['cache'].items()
+            ]), hide_index=True, use_container_width=True)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from compact import month_ordinals
+
+# How an agent-month is labelled when the agent's next recorded month is not the following calendar month
+GAP_POLICIES = ('drop', 'next', 'nill')
+# How an agent's final recorded month is labelled
+FINAL_POLICIES = ('drop', 'nill')
+
+
+def _month_number(values):
+    # Works on datetime and compact ordinal month columns alike
+    months = month_ordinals(values)
+    return np.where(np.isnan(months), np.iinfo(np.int64).min, months).astype(np.int64)
+
+
+def build_next_month_labels(df, gap='drop', final='drop', label='next_month_nill'):
+    """Label each agent-month with whether the agent sells nothing the month after.
+
+    Vectorized replacement for the per-agent iloc loop in the clustering
+    notebook: rows are sorted by (agent_code, year_month) and the next month's
+    new_policy_count comes from one shift within each agent's block.
+
+    gap decides what happens when the next recorded month is not the next
+    calendar month:
+      'drop' - leave the row out, its next month is unknown (default)
+      'next' - label from the next recorded month, as the notebook does
+      'nill' - count the missing month as a NILL month
+
+    final decides the agent's last recorded month, which has no next month:
+      'drop' - leave it out (default)
+      'nill' - label it NILL, as the NILL notebook's shift(-1) > 0 target does
+
+    Returns a new frame with a RangeIndex holding df's columns plus `label`
+    (int8, 1 = NILL next month) and 'months_to_next' (months until the next
+    recorded row, 0 for a final month).
+    """
+    if gap not in GAP_POLICIES:
+        raise ValueError(f"gap must be one of {GAP_POLICIES}, got {gap!r}")
+    if final not in FINAL_POLICIES:
+        raise ValueError(f"final must be one of {FINAL_POLICIES}, got {final!r}")
+    # Sort on integer agent codes and month numbers rather than the raw columns
+    agent_codes = df['agent_code']
+    if isinstance(agent_codes.dtype, pd.CategoricalDtype):
+        codes = agent_codes.array.codes
+    else:
+        codes = pd.factorize(agent_codes, sort=True)[0]
+    months = _month_number(df['year_month'])
+    order = np.lexsort((months, codes))
+    codes, months = codes[order], months[order]
+    policies = df['new_policy_count'].to_numpy()[order]
+
+    # Rows whose successor belongs to the same agent
+    has_next = np.zeros(len(order), dtype=bool)
+    has_next[:-1] = codes[1:] == codes[:-1]
+    next_index = np.minimum(np.arange(len(order)) + 1, max(len(order) - 1, 0))
+    months_to_next = months[next_index] - months
+    next_is_nill = policies[next_index] == 0
+
+    consecutive = months_to_next == 1
+    if gap == 'drop':
+        keep = has_next & consecutive
+    else:
+        keep = has_next
+        if gap == 'nill':
+            next_is_nill = next_is_nill | ~consecutive
+    if final == 'nill':
+        keep = keep | ~has_next
+        next_is_nill = next_is_nill | ~has_next
+        months_to_next = np.where(has_next, months_to_next, 0)
+
+    # A single take of the source rows, straight into label order
+    rows = np.flatnonzero(keep)
+    labelled = df.take(order[rows])
+    labelled.index = pd.RangeIndex(len(rows))
+    labelled[label] = next_is_nill[rows].astype(np.int8)
+    labelled['months_to_next'] = months_to_next[rows].astype(np.int16)
+    return labelled
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from sklearn.model_selection import StratifiedKFold
+from sklearn.isotonic import IsotonicRegression
+from sklearn.metrics import roc_auc_score, balanced_accuracy_score
+from features import FEATURE_COLUMNS, compute_features
+from labels import build_next_month_labels
+from compact import month_ordinals
+from agent_index import AgentIndex
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "nill")
+LATEST_FILE = "LATEST"
+
+# Agents whose probability of selling next month is below this are flagged for NILL risk.
+# Each trained version stores its own threshold (see tune_threshold); this default is
+# the one tuned on the current data with honest labels.
+NILL_THRESHOLD = 0.73
+# tune_threshold only considers flagging between these multiples of the NILL base rate
+FLAG_RATE_FACTORS = (0.5, 1.5)
+# Versions below this mean fold AUC are saved but not trusted: their flags are not
+# used in place of target_data.xlsx (see AgentDataStore.nill_flags)
+MIN_MEAN_AUC = 0.6
+# Percentiles of the ensemble's training predictions kept for calibration
+CALIBRATION_POINTS = 101
+
+# Best parameters from the Optuna search in the NILL notebook
+LGB_PARAMS = {
+    "objective": "binary",
+    "metric": "auc",
+    "boosting_type": "gbdt",
+    "learning_rate": 0.02339,
+    "num_leaves": 101,
+    "max_depth": 4,
+    "feature_fraction": 0.87,
+    "bagging_fraction": 0.814,
+    "bagging_freq": 2,
+    "min_data_in_leaf": 28,
+    "lambda_l1": 1.04,
+    "lambda_l2": 3.40,
+    "is_unbalance": True,
+    "verbosity": -1,
+    "random_state": 42,
+}
+N_FOLDS = 5
+NUM_BOOST_ROUND = 1000
+EARLY_STOPPING_ROUNDS = 50
+
+
+def build_training_set(employee_df):
+    """Features and target (1 = sells next month) for every labelled agent-month.
+
+    Rows where the first policy predates joining are dropped, and so is each
+    agent's final month: its next month is unknown, and labelling it as not
+    selling (as the notebook did) leaks the end of the data into the target.
+    """
+    consistent = employee_df[month_ordinals(employee_df['agent_join_month'])
+                             <= month_ordinals(employee_df['first_policy_sold_month'])]
+    labelled = build_next_month_labels(consistent, gap='next', final='drop')
+    X = compute_features(labelled)
+    y = (1 - labelled['next_month_nill']).astype(np.int8).rename('target')
+    return X, y
+
+
+class NillModel:
+    """Fold ensemble of LightGBM boosters scoring the probability an agent sells next month.
+
+    An agent is at NILL risk when that probability is below `threshold`.
+    """
+
+    def __init__(self, boosters, feature_columns=FEATURE_COLUMNS, threshold=NILL_THRESHOLD, version=None, metadata=None):
+        self.boosters = list(boosters)
+        self.feature_columns = list(feature_columns)
+        self.threshold = threshold
+        self.version = version
+        self.metadata = metadata or {}
+
+    @property
+    def trusted(self):
+        """True if the version's mean fold AUC reaches MIN_MEAN_AUC."""
+        return is_trusted(self.metadata)
+
+    def nill_probability(self, p_sell):
+        """Calibrated probability of a NILL month for ensemble predictions p_sell.
+
+        Uses the version's isotonic calibration (see calibrate); versions saved
+        without one fall back to the uncalibrated 1 - p_sell.
+        """
+        calibration = self.metadata.get('calibration')
+        if calibration is None:
+            return 1 - p_sell
+        percentile = np.interp(p_sell, calibration['p_sell'], calibration['percentile'])
+        return np.interp(percentile, calibration['percentile'], calibration['nill_probability'])
+
+    def _matrix(self, X):
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_columns].to_numpy(dtype=np.float64)
+        return np.atleast_2d(X)
+
+    def predict_proba(self, X, num_threads=None):
+        """Mean probability of selling next month over the fold models (X: features or ndarray)."""
+        X = self._matrix(X)
+        if num_threads is None:
+            # For a handful of rows, spinning up the OpenMP pool costs more than the trees
+            num_threads = 1 if len(X) < 1000 else 0
+        return np.mean([booster.predict(X, num_threads=num_threads) for booster in self.boosters], axis=0)
+
+    def contributions(self, X, num_threads=None, with_bias=False):
+        """Mean per-feature contributions (TreeSHAP values, log-odds of selling) over the fold models.
+
+        Returns an (n_rows, n_features) array in feature_columns order, plus
+        LightGBM's trailing bias (expected value) column when with_bias is set.
+        """
+        X = self._matrix(X)
+        if num_threads is None:
+            num_threads = 1 if len(X) < 1000 else 0
+        contrib = np.mean([booster.predict(X, pred_contrib=True, num_threads=num_threads)
+                           for booster in self.boosters], axis=0)
+        return contrib if with_bias else contrib[:, :-1]
+
+    def score_features(self, features):
+        """NILL probability and flag for rows of precomputed features."""
+        p_sell = self.predict_proba(features)
+        return pd.DataFrame({
+            'nill_probability': self.nill_probability(p_sell).astype(np.float32),
+            'at_nill_risk': p_sell < self.threshold,
+        }, index=features.index)
+
+    def score_latest(self, employee_df, index=None):
+        """Score every agent's most recent month; one row per agent_code.
+
+        index: an AgentIndex of employee_df (e.g. the data store's) to reuse instead of sorting again.
+        """
+        if index is None or not index.covers(employee_df):
+            index = AgentIndex(employee_df)
+        latest = index.latest_rows()
+        scores = self.score_features(compute_features(latest))
+        scores.index = pd.Index(latest['agent_code'].astype(str).to_numpy(), name='agent_code')
+        return scores
+
+
+def is_trusted(metadata):
+    """True if a version's metadata shows a mean fold AUC of at least MIN_MEAN_AUC."""
+    return metadata.get('mean_auc', 0.0) >= MIN_MEAN_AUC
+
+
+def tune_threshold(y, oof_rank, p_sell, factors=FLAG_RATE_FACTORS):
+    """Ensemble threshold flagging the share of rows with the best out-of-fold balanced accuracy.
+
+    The fold models stop early at different rounds, so their probabilities are
+    on different scales; oof_rank is each held-out prediction's percentile
+    within its fold. Only shares between factors x the NILL base rate are
+    considered, so a weak ranking cannot flag most agents. The best share is
+    then mapped onto p_sell, the ensemble's probabilities for the same rows.
+    """
+    nill = np.asarray(y) == 0
+    grid = np.linspace(factors[0], factors[1], 11) * nill.mean()
+    scores = [balanced_accuracy_score(nill, oof_rank <= rate) for rate in grid]
+    return float(np.quantile(p_sell, grid[int(np.argmax(scores))]))
+
+
+def calibrate(y, oof_rank, p_sell, points=CALIBRATION_POINTS):
+    """Isotonic map from the ensemble's p_sell to the observed NILL rate, as JSON-ready lists.
+
+    The NILL rate is fitted against the out-of-fold percentiles (non-increasing:
+    a higher chance of selling never means more NILL), and percentiles are
+    tied to p_sell through the ensemble's predictions on the training rows.
+    """
+    percentile = np.linspace(0, 1, points)
+    isotonic = IsotonicRegression(increasing=False, y_min=0, y_max=1, out_of_bounds='clip')
+    isotonic.fit(oof_rank, (np.asarray(y) == 0).astype(np.float64))
+    return {
+        'percentile': percentile.tolist(),
+        'p_sell': np.quantile(p_sell, percentile).tolist(),
+        'nill_probability': isotonic.predict(percentile).tolist(),
+    }
+
+
+def train_nill_model(employee_df, params=LGB_PARAMS, n_folds=N_FOLDS, num_boost_round=NUM_BOOST_ROUND):
+    """Train the notebook's stratified K-fold LightGBM ensemble on the employee history."""
+    X, y = build_training_set(employee_df)
+    skf = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    boosters, aucs = [], []
+    oof_rank = np.zeros(len(y))
+    for train_idx, val_idx in skf.split(X, y):
+        train_data = lgb.Dataset(X.iloc[train_idx], label=y.iloc[train_idx])
+        val_data = lgb.Dataset(X.iloc[val_idx], label=y.iloc[val_idx], reference=train_data)
+        booster = lgb.train(
+            params,
+            train_data,
+            valid_sets=[val_data],
+            num_boost_round=num_boost_round,
+            callbacks=[lgb.early_stopping(stopping_rounds=EARLY_STOPPING_ROUNDS, verbose=False)],
+        )
+        p_val = booster.predict(X.iloc[val_idx])
+        oof_rank[val_idx] = pd.Series(p_val).rank(pct=True).to_numpy()
+        aucs.append(float(roc_auc_score(y.iloc[val_idx], p_val)))
+        boosters.append(booster)
+    model = NillModel(boosters, list(X.columns))
+    p_sell = model.predict_proba(X)
+    model.threshold = tune_threshold(y, oof_rank, p_sell)
+    model.metadata = {
+        'params': params,
+        'fold_auc': aucs,
+        'mean_auc': float(np.mean(aucs)),
+        'nill_rate': float((y == 0).mean()),
+        'calibration': calibrate(y, oof_rank, p_sell),
+        'training_rows': int(len(X)),
+        'trained_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return model
+
+
+def save_model(model, model_dir=MODEL_DIR):
+    """Write the ensemble as a new registry version and mark it as the latest.
+
+    Layout: <model_dir>/<version>/fold_<i>.txt plus meta.json; the version is
+    the save time plus a short hash of the boosters.
+    """
+    texts = [booster.model_to_string() for booster in model.boosters]
+    digest = hashlib.sha256("".join(texts).encode()).hexdigest()[:8]
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{digest}"
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    for i, text in enumerate(texts):
+        with open(os.path.join(version_dir, f"fold_{i}.txt"), "w") as f:
+            f.write(text)
+    meta = dict(model.metadata, version=version, features=model.feature_columns,
+                threshold=model.threshold, folds=len(texts))
+    with open(os.path.join(version_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    tmp_path = os.path.join(model_dir, LATEST_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(model_dir, LATEST_FILE))
+    model.version = version
+    return version
+
+
+def list_versions(model_dir=MODEL_DIR):
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(name for name in os.listdir(model_dir) if os.path.exists(os.path.join(model_dir, name, "meta.json")))
+
+
+def load_metadata(version, model_dir=MODEL_DIR):
+    """meta.json of a registry version. Raises FileNotFoundError if it is not saved."""
+    with open(os.path.join(model_dir, version, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_model(version=None, model_dir=MODEL_DIR):
+    """Load a registry version (default: the latest). Raises FileNotFoundError if none is saved."""
+    if version is None:
+        latest_path = os.path.join(model_dir, LATEST_FILE)
+        if not os.path.exists(latest_path):
+            raise FileNotFoundError(f"No NILL model saved in {model_dir}; run `python nill_model.py train`")
+        with open(latest_path) as f:
+            version = f.read().strip()
+    version_dir = os.path.join(model_dir, version)
+    meta = load_metadata(version, model_dir)
+    boosters = [lgb.Booster(model_file=os.path.join(version_dir, f"fold_{i}.txt")) for i in range(meta['folds'])]
+    return NillModel(boosters, meta['features'], meta['threshold'], version, meta)
+
+
+if __name__ == "__main__":
+    from data_store import get_store
+
+    parser = argparse.ArgumentParser(description="Train and register the NILL risk model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("train", help="Train the fold ensemble on the employee data and save it")
+    subparsers.add_parser("list", help="List saved model versions")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        model = train_nill_model(get_store().employee())
+        version = save_model(model)
+        print(f"Saved NILL model {version} (mean fold AUC {model.metadata['mean_auc']:.4f}, "
+              f"threshold {model.threshold:.3f})")
+        if not model.trusted:
+            print(f"Mean fold AUC is below {MIN_MEAN_AUC}: the app keeps the target_data.xlsx NILL flags "
+                  f"instead of this model's")
+    else:
+        latest = load_model().version if os.path.exists(os.path.join(MODEL_DIR, LATEST_FILE)) else None
+        for name in list_versions():
+            print(f"{name}{'  (latest)' if name == latest else ''}")
@@ -0,0 +1,171 @@
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_ingest import DATA_DIR, EMPLOYEE_FILE, source_key
+from features import compute_features
+from nill_model import load_model
+from compact import month_dates
+from agent_index import AgentIndex
+
+SCORES_DIR = os.path.join(DATA_DIR, "scores")
+LATEST_FILE = "LATEST"
+
+# Features reported per agent as the main drivers of its NILL risk
+TOP_K = 3
+# Features kept per agent in the explanation store, by absolute SHAP value
+EXPLAIN_K = 5
+
+
+def _score_batch(model, X):
+    # One thread per batch; the batches themselves run in parallel (LightGBM releases the GIL)
+    return model.predict_proba(X, num_threads=1), model.contributions(X, num_threads=1, with_bias=True)
+
+
+def build_explanations(agent_codes, X, contrib, feature_columns, explain_k=EXPLAIN_K):
+    """Compact per-agent SHAP explanations: the explain_k features with the largest
+    absolute contribution, their SHAP values (float16, log-odds of selling, so
+    negative = towards NILL) and feature values, plus the model's base value.
+    """
+    shap_values = contrib[:, :-1]
+    top = np.argsort(-np.abs(shap_values), axis=1, kind='stable')[:, :explain_k]
+    explanations = pd.DataFrame({
+        'agent_code': agent_codes,
+        'base_value': contrib[:, -1].astype(np.float32),
+    })
+    features = pd.CategoricalDtype(feature_columns)
+    for k in range(top.shape[1]):
+        explanations[f'feature_{k + 1}'] = pd.Categorical.from_codes(top[:, k], dtype=features)
+        explanations[f'shap_{k + 1}'] = np.take_along_axis(shap_values, top[:, k:k + 1], axis=1)[:, 0].astype(np.float16)
+        explanations[f'value_{k + 1}'] = np.take_along_axis(X, top[:, k:k + 1], axis=1)[:, 0].astype(np.float32)
+    return explanations
+
+
+def score_and_explain(employee_df, model, top_k=TOP_K, explain_k=EXPLAIN_K, batch_size=10_000, workers=None,
+                      index=None):
+    """Score every agent's latest month with the fold ensemble and explain each score.
+
+    index: an AgentIndex of employee_df (e.g. the data store's) to reuse instead of sorting again.
+
+    Returns (scores, explanations). scores has one row per agent:
+    nill_probability, at_nill_risk, target (0 = at NILL risk, the
+    target_data.xlsx convention), the top_k features pushing the agent towards
+    NILL with their log-odds impact, and model_version. explanations is the
+    build_explanations table, from the same SHAP values.
+    """
+    if index is None or not index.covers(employee_df):
+        index = AgentIndex(employee_df)
+    latest = index.latest_rows()
+    X = compute_features(latest)[model.feature_columns].to_numpy(dtype=np.float64)
+    batches = [X[i:i + batch_size] for i in range(0, len(X), batch_size)] or [X]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda batch: _score_batch(model, batch), batches))
+    p_sell = np.concatenate([result[0] for result in results])
+    contrib = np.concatenate([result[1] for result in results])
+
+    # Most negative contributions lower the odds of selling the most, i.e. push towards NILL
+    top = np.argsort(contrib[:, :-1], axis=1, kind='stable')[:, :top_k]
+    impact = -np.take_along_axis(contrib[:, :-1], top, axis=1)
+    agent_codes = latest['agent_code'].astype(str).to_numpy()
+
+    at_risk = p_sell < model.threshold
+    scores = pd.DataFrame({
+        'agent_code': agent_codes,
+        'year_month': month_dates(latest['year_month'].to_numpy()),
+        'nill_probability': model.nill_probability(p_sell).astype(np.float32),
+        'at_nill_risk': at_risk,
+        'target': np.where(at_risk, 0, 1).astype(np.int8),
+    })
+    features = pd.CategoricalDtype(model.feature_columns)
+    for k in range(top.shape[1]):
+        scores[f'top_feature_{k + 1}'] = pd.Categorical.from_codes(top[:, k], dtype=features)
+        scores[f'top_impact_{k + 1}'] = impact[:, k].astype(np.float16)
+    scores['model_version'] = pd.Categorical([model.version] * len(scores))
+    return scores, build_explanations(agent_codes, X, contrib, model.feature_columns, explain_k)
+
+
+def score_agents(employee_df, model, top_k=TOP_K, batch_size=10_000, workers=None, index=None):
+    """score_and_explain without the explanation table."""
+    return score_and_explain(employee_df, model, top_k, 0, batch_size, workers, index)[0]
+
+
+def explanations_name(snapshot_name):
+    """File name of the explanation table written next to a score snapshot."""
+    return snapshot_name.replace("nill_scores-", "nill_explanations-", 1)
+
+
+def write_snapshot(scores, model_version, data_key, scores_dir=SCORES_DIR, explanations=None):
+    """Write a scored snapshot (and its explanations) as new versioned Parquet files and point LATEST at it."""
+    os.makedirs(scores_dir, exist_ok=True)
+    name = f"nill_scores-{time.strftime('%Y%m%d-%H%M%S')}-{model_version}.parquet"
+    if explanations is not None:
+        tmp_path = os.path.join(scores_dir, explanations_name(name) + ".tmp")
+        pq.write_table(pa.Table.from_pandas(explanations, preserve_index=False), tmp_path)
+        os.replace(tmp_path, os.path.join(scores_dir, explanations_name(name)))
+    table = pa.Table.from_pandas(scores, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'model_version': str(model_version).encode(),
+        b'data_key': data_key.encode(),
+        b'scored_at': time.strftime('%Y-%m-%d %H:%M:%S').encode(),
+    })
+    tmp_path = os.path.join(scores_dir, name + ".tmp")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, os.path.join(scores_dir, name))
+
+    tmp_path = os.path.join(scores_dir, LATEST_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(scores_dir, LATEST_FILE))
+    return os.path.join(scores_dir, name)
+
+
+def latest_snapshot_name(scores_dir=SCORES_DIR):
+    """File name of the most recent snapshot, or None if none was written."""
+    try:
+        with open(os.path.join(scores_dir, LATEST_FILE)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def load_latest_snapshot(scores_dir=SCORES_DIR):
+    """The most recent scored snapshot. Raises FileNotFoundError if none was written."""
+    name = latest_snapshot_name(scores_dir)
+    if name is None:
+        raise FileNotFoundError(f"No NILL score snapshot in {scores_dir}; run `python nill_scoring.py`")
+    return pq.read_table(os.path.join(scores_dir, name), memory_map=True).to_pandas()
+
+
+def load_explanations(snapshot_name, scores_dir=SCORES_DIR):
+    """Explanations written with a snapshot, indexed by agent_code (None if it has none)."""
+    path = os.path.join(scores_dir, explanations_name(snapshot_name))
+    if not os.path.exists(path):
+        return None
+    return pq.read_table(path, memory_map=True).to_pandas().set_index('agent_code')
+
+
+if __name__ == "__main__":
+    from data_store import get_store
+
+    parser = argparse.ArgumentParser(description="Score every agent's latest month for NILL risk.")
+    parser.add_argument("--model-version", help="Registry version to score with (default: latest)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Scoring threads")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Agents per scoring call")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="Top NILL drivers to keep per agent")
+    parser.add_argument("--explain-k", type=int, default=EXPLAIN_K, help="SHAP features to store per agent (0 = none)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = load_model(args.model_version)
+    store = get_store()
+    scores, explanations = score_and_explain(store.employee(), model, args.top_k, args.explain_k,
+                                             args.batch_size, args.workers, index=store.agent_index())
+    path = write_snapshot(scores, model.version, source_key(EMPLOYEE_FILE),
+                          explanations=explanations if args.explain_k else None)
+    print(f"Scored {len(scores)} agents ({int(scores['at_nill_risk'].sum())} at NILL risk) "
+          f"in {time.perf_counter() - start:.2f}s -> {path}")
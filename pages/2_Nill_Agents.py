@@ -5,10 +5,16 @@ import os
 # Add parent directory to path so we can import from root utils.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import navbar, footer
-from app import load_data, plot_new_policy_count, generate_agent_performance_chart, display_agent_info
-import matplotlib.pyplot as plt
+from app import load_data, cached_agent_chart, display_agent_info, agent_history, warm_up_agent_charts, agent_picker
+from agent_search import NILL_LABELS
+from data_store import get_store
+from instrumentation import span, start_rerun, dev_panel
+
+# Pages get shallow views of the shared frames; see Dashboard.py
+pd.set_option("mode.copy_on_write", True)
 
 st.set_page_config(page_title="Nill Agents", layout="wide")
+start_rerun("Nill Agents")
 navbar()
 
 # Load data
@@ -28,11 +34,21 @@ if employee_df is not None and target_df is not None:
             f'</div>',
             unsafe_allow_html=True
         )    # Get list of nill agents
-    nill_agent_codes = target_df[target_df['target'] == 0]['agent_code'].tolist()
-    
-    # Set default index to 0 to show the first agent by default
-    default_index = 0 if nill_agent_codes else None
-    selected_agent = st.selectbox("Select Nill Agent", options=nill_agent_codes, index=default_index, placeholder="Choose a nill agent...")
+    # Narrow the list down to agents on a run of months without sales
+    streaks = get_store().streak_index()
+    filter_col1, filter_col2 = st.columns(2)
+    with filter_col1:
+        min_streak = st.number_input("Months in a row without a sale (at least)", min_value=0, value=0, step=1)
+    with filter_col2:
+        months_without_sale = st.number_input("No sale in the last N months", min_value=0, value=0, step=1)
+    within = streaks.select(min_streak or None, months_without_sale or None) if min_streak or months_without_sale else None
+
+    # Searched and paged on the server; only the current page of codes reaches the browser
+    selected_agent, page_codes = agent_picker(
+        "Select Nill Agent", key="nill_agent", facets=('performance_group', 'tenure_band', 'age_group'),
+        within=within, fixed_filters={'nill': NILL_LABELS[0]}, index=0, placeholder="Choose a nill agent...")
+    # Pre-render the charts of the agents on this page in the background
+    warm_up_agent_charts(page_codes)
 
     if selected_agent:
         # Display agent basic information
@@ -42,7 +58,7 @@ if employee_df is not None and target_df is not None:
         else:
             st.subheader("Agent Information")
             # Get the agent data
-            agent_data = employee_df[employee_df['agent_code'] == selected_agent].iloc[0]
+            agent_data = agent_history(employee_df, selected_agent).iloc[0]
             tenure_months = int((agent_data['year_month'] - agent_data['agent_join_month']).days / 30)
             
             # Display agent details in a more structured way
@@ -79,10 +95,21 @@ if employee_df is not None and target_df is not None:
                     </div>
                 """, unsafe_allow_html=True)
 
+            streak = streaks.agent(selected_agent)
+            if streak is not None:
+                streak_col1, streak_col2, streak_col3 = st.columns(3)
+                with streak_col1:
+                    st.metric("Current months without a sale", int(streak['current_zero_streak']))
+                with streak_col2:
+                    st.metric("Longest run without a sale", f"{int(streak['longest_zero_streak'])} months")
+                with streak_col3:
+                    since = streak['months_since_last_sale']
+                    st.metric("Months since last sale", "Never sold" if pd.isna(since) else int(since))
+
             st.markdown("<hr>", unsafe_allow_html=True) # Add a horizontal rule for separation
 
         # Display metrics
-        agent_data = employee_df[employee_df['agent_code'] == selected_agent]
+        agent_data = agent_history(employee_df, selected_agent)
         if not agent_data.empty:
             latest_data = agent_data.iloc[-1]
             average_anbp = agent_data['ANBP_value'].mean()
@@ -95,28 +122,51 @@ if employee_df is not None and target_df is not None:
             with col3:
                 st.metric("Latest Policy Count", str(latest_data['new_policy_count']))
 
+        # Model score and main NILL drivers when the flags come from a scored snapshot
+        if 'nill_probability' in target_df.columns:
+            score = get_store().nill_score(selected_agent)
+            if score is None:
+                st.info(f"Agent {selected_agent} is not in the latest NILL score snapshot; "
+                        "re-run `python nill_scoring.py` to score them.")
+            else:
+                drivers = [str(score[col]) for col in target_df.columns
+                           if col.startswith('top_feature_') and pd.notna(score[col])]
+                st.markdown(f"**NILL probability:** {score['nill_probability']:.1%} "
+                            f"(model {score['model_version']})")
+                explanation = get_store().nill_explanation(selected_agent)
+                if explanation is not None:
+                    with st.expander("Why is this agent flagged?", expanded=True), span("nill_agents.explanation"):
+                        st.dataframe(pd.DataFrame({
+                            'Feature': explanation['feature'],
+                            'Agent value': explanation['value'].round(3),
+                            # SHAP values are log-odds of selling; flip them to read as NILL risk
+                            'Effect on NILL risk': (-explanation['shap']).round(3),
+                        }), hide_index=True, use_container_width=True)
+                elif drivers:
+                    st.markdown(f"**Main risk drivers:** {', '.join(drivers)}")
+
         # Display performance charts
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, span("nill_agents.policy_chart"):
             st.subheader("New Policy Count Trend")
-            fig1, policy_stats = plot_new_policy_count(selected_agent, employee_df)
-            if fig1:
-                st.pyplot(fig1)
+            chart1, policy_stats = cached_agent_chart(selected_agent, 'new_policy_count', employee_df)
+            if chart1:
+                st.image(chart1, use_container_width=True)
             else:
                 st.warning(policy_stats)
 
-        with col2:
+        with col2, span("nill_agents.performance_chart"):
             st.subheader("Monthly Performance Overview")
-            fig2, monthly_data = generate_agent_performance_chart(selected_agent, employee_df)
-            if fig2:
-                st.pyplot(fig2)
+            chart2, monthly_data = cached_agent_chart(selected_agent, 'performance', employee_df)
+            if chart2:
+                st.image(chart2, use_container_width=True)
             else:
                 st.warning(monthly_data)
 
         # Show monthly performance data in expandable section
         if monthly_data is not None and not isinstance(monthly_data, str):
-            with st.expander("View Monthly Performance Data"):
+            with st.expander("View Monthly Performance Data"), span("nill_agents.monthly_table"):
                 st.dataframe(monthly_data, use_container_width=True)
 
         # Smart Plan Recommendations
@@ -143,3 +193,5 @@ else:
 
 # Add footer at the end of the page
 footer()
+
+dev_panel()
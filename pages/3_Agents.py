@@ -5,20 +5,23 @@ import os
 # Add parent directory to path so we can import from root utils.py
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import navbar, footer
-from app import load_data, plot_new_policy_count, generate_agent_performance_chart
+from app import load_data, cached_agent_chart, agent_history, agent_picker
+from data_store import get_store
+from instrumentation import timed, span, start_rerun, dev_panel
+
+# Pages get shallow views of the shared frames; see Dashboard.py
+pd.set_option("mode.copy_on_write", True)
 
 # Load agent performance data including nill predictions
+@timed(name="agents.load_agent_perf_data")
 def load_agent_perf_data():
-    agent_perf_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "agent_perf.csv")
-    if os.path.exists(agent_perf_path):
-        df = pd.read_csv(agent_perf_path)
-        # Convert is_nill to proper boolean if it's stored as string
-        if 'is_nill' in df.columns:
-            df['is_nill'] = df['is_nill'].apply(lambda x: True if str(x).lower() == 'true' else False)
-        return df
-    return None
+    try:
+        return get_store().agent_perf()
+    except FileNotFoundError:
+        return None
 
 st.set_page_config(page_title="Agent", layout="wide")
+start_rerun("Agents")
 navbar()
 
 st.title("Agent Details")
@@ -28,32 +31,31 @@ employee_df, target_df = load_data()
 agent_perf_df = load_agent_perf_data()
 
 if employee_df is not None and target_df is not None:
-    # Get unique employee codes
-    employee_codes = employee_df['agent_code'].unique().tolist()
-    
-    # Filter to only agents that exist in both datasets if agent_perf_df is available
-    if agent_perf_df is not None:
-        common_codes = set(employee_codes).intersection(set(agent_perf_df['agent_code'].unique().tolist()))
-        employee_codes = sorted(list(common_codes))    # Only show the select box for employees with a placeholder
-    selected_code = st.selectbox("Select Agent", options=employee_codes, index=None, placeholder="Choose an agent...")
+    # Only agents that also have performance data, when agent_perf_df is available;
+    # searched and paged on the server so only one page of codes reaches the browser
+    within = agent_perf_df['agent_code'] if agent_perf_df is not None else None
+    selected_code, _ = agent_picker("Select Agent", key="agent", within=within)
     
     if selected_code:
-        agent_data = employee_df[employee_df['agent_code'] == selected_code].iloc[0]
-        # Determine performance status
-        avg_policies = employee_df[employee_df['agent_code'] == selected_code]['new_policy_count'].mean()
-        status = "High" if avg_policies > 20 else "Medium" if avg_policies > 10 else "Low"
+        agent_rows = agent_history(employee_df, selected_code)
+        agent_data = agent_rows.iloc[0]
+        # Determine performance status from the shared classification table
+        status = get_store().agent_classification().at[selected_code, 'performance_status']
         st.markdown(f"#### Performance Status: **{status}**")
-        # Display nill prediction from agent_perf.csv if available
+        # Score the agent's latest month with the saved NILL model, falling back
+        # to the precomputed is_nill in agent_perf.csv when no model is trained
         st.markdown("##### Next Month Prediction")
         col1, col2 = st.columns(2)
+        with span("agents.score_agent"):
+            live_score = get_store().score_agent(selected_code)
         
         if agent_perf_df is not None and selected_code in agent_perf_df['agent_code'].values:
             agent_perf = agent_perf_df[agent_perf_df['agent_code'] == selected_code].iloc[0]
-            is_nill = agent_perf['is_nill']
+            # Models below the AUC bar (see nill_model.MIN_MEAN_AUC) only show their probability
+            is_nill = live_score['at_nill_risk'] if live_score and live_score['trusted'] else agent_perf['is_nill']
             nill_rate = agent_perf['nill_rate']
             
             with col1:
-                # Direct prediction from is_nill column
                 if is_nill == True or (isinstance(is_nill, str) and is_nill.lower() == 'true'):
                     prediction = "RISK: No policies next month"
                     prediction_color = "🔴"
@@ -61,6 +63,12 @@ if employee_df is not None and target_df is not None:
                     prediction = "SAFE: Will sell policies" 
                     prediction_color = "🟢"
                 st.markdown(f"### {prediction_color} {prediction}")
+                if live_score:
+                    st.markdown(f"NILL probability: **{live_score['nill_probability']:.1%}** "
+                                f"(model {live_score['model_version']})")
+                    if not live_score['trusted']:
+                        st.caption("This model does not yet separate NILL agents well enough to flag them; "
+                                   "the risk flag above comes from the hand-exported NILL list.")
                 st.markdown(f"Historical nill rate: **{nill_rate:.1%}**")
             with col2:
                 performance_group = agent_perf['performance_group']
@@ -122,28 +130,30 @@ if employee_df is not None and target_df is not None:
         # Performance charts
         col1, col2 = st.columns(2)
         
-        with col1:
+        with col1, span("agents.policy_chart"):
             st.subheader("New Policy Count Trend")
-            fig1, policy_stats = plot_new_policy_count(selected_code, employee_df)
-            if fig1:
-                st.pyplot(fig1)
+            chart1, policy_stats = cached_agent_chart(selected_code, 'new_policy_count', employee_df)
+            if chart1:
+                st.image(chart1, use_container_width=True)
             else:
                 st.warning(policy_stats)
 
-        with col2:
+        with col2, span("agents.performance_chart"):
             st.subheader("Monthly Performance Overview")
-            fig2, monthly_data = generate_agent_performance_chart(selected_code, employee_df)
-            if fig2:
-                st.pyplot(fig2)
+            chart2, monthly_data = cached_agent_chart(selected_code, 'performance', employee_df)
+            if chart2:
+                st.image(chart2, use_container_width=True)
             else:
                 st.warning(monthly_data)
 
         # Show monthly performance data in expandable section
         if monthly_data is not None and not isinstance(monthly_data, str):
-            with st.expander("View Monthly Performance Data"):
+            with st.expander("View Monthly Performance Data"), span("agents.monthly_table"):
                 st.dataframe(monthly_data, use_container_width=True)
 else:
     st.error("Unable to load data. Please check your Google Drive file IDs and ensure the files are accessible.")
 
 # Add footer at the end of the page
 footer()
+
+dev_panel()
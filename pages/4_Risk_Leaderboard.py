@@ -0,0 +1,121 @@
+import streamlit as st
+import pandas as pd
+import sys
+import os
+# Add parent directory to path so we can import from root utils.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import navbar, footer
+from data_store import get_store
+from risk_index import SORTABLE_COLUMNS
+from instrumentation import timed, span, start_rerun, dev_panel
+
+# Pages get shallow views of the shared frames; see Dashboard.py
+pd.set_option("mode.copy_on_write", True)
+
+# Rows per page of the table; only this many are sent to the browser at a time
+PAGE_SIZES = [25, 50, 100, 250]
+SORT_TITLES = {
+    'nill_probability': "NILL probability",
+    'current_zero_streak': "Months without a sale",
+    'latest_ANBP_value': "Latest ANBP",
+    'latest_new_policy_count': "Latest policy count",
+}
+
+@timed(name="risk_leaderboard.load_risk_index")
+def load_risk_index():
+    try:
+        return get_store().risk_index()
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        return None
+
+st.set_page_config(page_title="Risk Leaderboard", layout="wide")
+start_rerun("Risk Leaderboard")
+navbar()
+
+st.title("NILL Risk Leaderboard")
+
+risk = load_risk_index()
+
+if risk is not None:
+    scored = risk.table['nill_probability'].notna().any()
+    if not scored:
+        st.warning("No NILL scores yet: train a model (python nill_model.py train) or score the book "
+                   "(python nill_scoring.py). Agents are listed without probabilities.")
+
+    # Filters
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        threshold = st.slider("NILL probability at least", min_value=0.0, max_value=1.0, value=0.0, step=0.05,
+                              disabled=not scored)
+    with col2:
+        top_n = st.number_input("Only the top N riskiest (0 = all)", min_value=0, value=0, step=10)
+    with col3:
+        min_streak = st.number_input("Months in a row without a sale (at least)", min_value=0, value=0, step=1)
+    with col4:
+        groups = st.multiselect("Performance group", ["High", "Medium", "Low"])
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_by = st.selectbox("Sort by", SORTABLE_COLUMNS, format_func=SORT_TITLES.get)
+    with col2:
+        ascending = st.toggle("Ascending", value=False)
+    with col3:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+    filters = dict(min_probability=threshold or None, min_streak=min_streak or None,
+                   performance_group=groups or None, top_n=top_n or None)
+    # A new filter or order starts again from the first page
+    signature = (tuple(sorted(filters.items(), key=str)), sort_by, ascending, page_size)
+    if st.session_state.get("risk_signature") != signature:
+        st.session_state["risk_signature"] = signature
+        st.session_state.pop("risk_page", None)
+
+    with span("risk_leaderboard.page"):
+        rows, total, page = risk.page(page=st.session_state.get("risk_page", 1) - 1, page_size=page_size,
+                                      sort_by=sort_by, ascending=ascending, **filters)
+    pages = max(1, -(-total // page_size))
+
+    metric_col1, metric_col2, metric_col3 = st.columns(3)
+    with metric_col1:
+        st.metric("Agents", f"{len(risk):,}")
+    with metric_col2:
+        st.metric("Matching agents", f"{total:,}")
+    with metric_col3:
+        st.metric("Flagged for NILL risk", f"{int(risk.table['at_nill_risk'].fillna(False).sum()):,}")
+
+    with span("risk_leaderboard.table"):
+        st.dataframe(
+            rows.assign(last_month=rows['last_month'].dt.strftime('%Y-%m')),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                'rank': st.column_config.NumberColumn("Risk rank"),
+                'agent_code': "Agent",
+                'nill_probability': st.column_config.ProgressColumn("NILL probability", format="%.2f",
+                                                                    min_value=0.0, max_value=1.0),
+                'at_nill_risk': "At risk",
+                'current_zero_streak': "Months without a sale",
+                'performance_group': "Performance group",
+                'latest_ANBP_value': st.column_config.NumberColumn("Latest ANBP", format="$%.2f"),
+                'latest_new_policy_count': st.column_config.NumberColumn("Latest policy count", format="%d"),
+                'last_month': "Latest month",
+            },
+        )
+
+    if pages > 1:
+        # Clamped before the widget is drawn, since filters may have removed pages
+        st.session_state["risk_page"] = page + 1
+        st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key="risk_page")
+    st.caption(f"Showing {len(rows):,} of {total:,} matching agents")
+
+    if not rows.empty:
+        st.download_button("Download this page as CSV", rows.to_csv(index=False), file_name="nill_risk_page.csv",
+                           mime="text/csv")
+else:
+    st.error("Unable to load data. Please check your Google Drive file IDs and ensure the files are accessible.")
+
+# Add footer at the end of the page
+footer()
+
+dev_panel()
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Leaderboard columns, in display order
+RISK_COLUMNS = ['agent_code', 'nill_probability', 'at_nill_risk', 'current_zero_streak', 'performance_group',
+                'latest_ANBP_value', 'latest_new_policy_count', 'last_month']
+# Columns the leaderboard can be sorted by
+SORTABLE_COLUMNS = ['nill_probability', 'current_zero_streak', 'latest_ANBP_value', 'latest_new_policy_count']
+
+
+class RiskIndex:
+    """Every agent's NILL risk with their streak, performance group and latest sales, sorted riskiest first.
+
+    The table is sorted once by probability (descending; unscored agents
+    last), so top-N and threshold queries are a slice and a binary search.
+    The orders for the other sortable columns are computed on first use and
+    kept, and pages of any order are positional slices.
+    """
+
+    def __init__(self, table):
+        probability = table['nill_probability'].to_numpy(dtype=np.float64, na_value=np.nan)
+        # Unscored agents (NaN) sort after every scored one
+        order = np.argsort(np.where(np.isnan(probability), np.inf, -probability), kind='stable')
+        self.table = table.iloc[order].reset_index(drop=True)
+        self._descending = -np.where(np.isnan(probability), -np.inf, probability)[order]
+        self._orders = {('nill_probability', False): np.arange(len(self.table))}
+
+    @classmethod
+    def build(cls, latest_rows, scores, streaks, performance_status):
+        """Join the per-agent inputs on agent_code.
+
+        latest_rows: one employee row per agent (AgentIndex.latest_rows); scores:
+        nill_probability and at_nill_risk indexed by agent_code (None if there is
+        no model or snapshot); streaks: StreakIndex.table(); performance_status:
+        High/Medium/Low indexed by agent_code.
+        """
+        codes = latest_rows['agent_code'].astype(str).to_numpy()
+        table = pd.DataFrame({'agent_code': codes})
+        if scores is not None:
+            scores = scores[~scores.index.duplicated(keep='last')].reindex(codes)
+            table['nill_probability'] = scores['nill_probability'].to_numpy(dtype=np.float64, na_value=np.nan)
+            table['at_nill_risk'] = scores['at_nill_risk'].astype('boolean').array
+        else:
+            table['nill_probability'] = np.nan
+            table['at_nill_risk'] = pd.array([pd.NA] * len(codes), dtype='boolean')
+        table['current_zero_streak'] = streaks['current_zero_streak'].reindex(codes).to_numpy()
+        table['performance_group'] = pd.Categorical(performance_status.astype(str).reindex(codes).to_numpy(),
+                                                    categories=['High', 'Medium', 'Low'])
+        table['latest_ANBP_value'] = latest_rows['ANBP_value'].to_numpy(dtype=np.float64, na_value=np.nan)
+        table['latest_new_policy_count'] = latest_rows['new_policy_count'].to_numpy(dtype=np.float64, na_value=np.nan)
+        table['last_month'] = streaks['last_month'].reindex(codes).to_numpy()
+        return cls(table[RISK_COLUMNS])
+
+    def __len__(self):
+        return len(self.table)
+
+    def top(self, n):
+        """The n riskiest agents."""
+        return self.table.iloc[:n]
+
+    def count_above(self, threshold):
+        """Number of agents with a NILL probability of at least threshold."""
+        return int(np.searchsorted(self._descending, -threshold, side='right'))
+
+    def above(self, threshold):
+        """Agents with a NILL probability of at least threshold, riskiest first."""
+        return self.table.iloc[:self.count_above(threshold)]
+
+    def _order(self, sort_by, ascending):
+        key = (sort_by, ascending)
+        if key not in self._orders:
+            values = self.table[sort_by].to_numpy(dtype=np.float64, na_value=np.nan)
+            # Missing values last in either direction
+            keys = np.where(np.isnan(values), np.inf, values if ascending else -values)
+            self._orders[key] = np.argsort(keys, kind='stable')
+        return self._orders[key]
+
+    def page(self, page=0, page_size=50, sort_by='nill_probability', ascending=False, min_probability=None,
+             min_streak=None, performance_group=None, top_n=None):
+        """One page of the leaderboard.
+
+        Filters: min_probability, min_streak, performance_group (label or list)
+        and top_n (only the n riskiest agents). Returns the page's rows with a
+        'rank' column (position by risk), the number of matching agents and the
+        clamped page number.
+        """
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort_by}; choose from {SORTABLE_COLUMNS}")
+        # Rows are in risk order, so the probability and top-N filters are a prefix of them
+        stop = len(self.table)
+        if min_probability is not None:
+            stop = min(stop, self.count_above(min_probability))
+        if top_n is not None:
+            stop = min(stop, int(top_n))
+        keep = np.zeros(len(self.table), dtype=bool)
+        keep[:stop] = True
+        if min_streak:
+            keep &= self.table['current_zero_streak'].to_numpy() >= min_streak
+        if performance_group:
+            groups = [performance_group] if isinstance(performance_group, str) else list(performance_group)
+            keep &= self.table['performance_group'].isin(groups).to_numpy()
+
+        order = self._order(sort_by, ascending)
+        matches = order[keep[order]]
+        pages = max(1, -(-len(matches) // page_size))
+        page = min(max(int(page), 0), pages - 1)
+        rows = matches[page * page_size:(page + 1) * page_size]
+        result = self.table.iloc[rows]
+        result.insert(0, 'rank', rows + 1)
+        return result, int(len(matches)), page
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from agent_index import AgentIndex
+from agent_tensor import AgentTensor
+from compact import month_ordinals, month_dates
+
+# A month counts as a sale when the agent sold at least one new policy
+SALES_METRIC = 'new_policy_count'
+
+_STATE = ['last_month', 'current_streak', 'longest_streak', 'first_sale', 'last_sale']
+
+
+def _tensor_state(tensor):
+    """Per-agent state arrays (aligned with tensor.codes) computed from a dense tensor."""
+    sales = tensor.metric(SALES_METRIC)
+    runs = tensor.zero_runs(SALES_METRIC)
+    n_months = tensor.mask.shape[1]
+    # First / last True along the month axis (argmax finds the first one)
+    last = n_months - 1 - tensor.mask[:, ::-1].argmax(axis=1)
+    sold = tensor.mask & (sales > 0)
+    ever_sold = sold.any(axis=1)
+    first_sale = sold.argmax(axis=1)
+    last_sale = n_months - 1 - sold[:, ::-1].argmax(axis=1)
+    rows = np.arange(len(tensor))
+    return {
+        'last_month': (last + tensor.first_month).astype(np.int64),
+        'current_streak': runs[rows, last].astype(np.int32),
+        'longest_streak': runs.max(axis=1, initial=0).astype(np.int32),
+        'first_sale': np.where(ever_sold, first_sale + tensor.first_month, np.nan),
+        'last_sale': np.where(ever_sold, last_sale + tensor.first_month, np.nan),
+    }
+
+
+class StreakIndex:
+    """Per-agent zero-sales run lengths, kept sorted for threshold queries.
+
+    For each agent: the current run of consecutive months without a sale
+    (up to their latest month; a month without a row ends a run, as in
+    AgentTensor.zero_runs), the longest such run, and the months from their
+    last and first sale to their latest month (NaN if they never sold).
+    Agents are kept sorted by current streak and by months since last sale,
+    so "streak >= k" and "no sale in n months" are a binary search and a slice.
+    """
+
+    def __init__(self, codes, state):
+        # Object strings, so codes of any length compare against the memory-mapped fixed-width ones
+        self.codes = np.asarray(codes).astype(object)
+        self.state = state
+        self._positions = {code: i for i, code in enumerate(self.codes)}
+        self._streak_order = np.argsort(state['current_streak'], kind='stable')
+        self._sorted_streaks = state['current_streak'][self._streak_order]
+        # Agents who never sold sort last, as if their last sale were infinitely long ago
+        since_sale = np.where(np.isnan(state['last_sale']), np.inf, state['last_month'] - state['last_sale'])
+        self._since_sale_order = np.argsort(since_sale, kind='stable')
+        self._sorted_since_sale = since_sale[self._since_sale_order]
+
+    @classmethod
+    def from_tensor(cls, tensor):
+        return cls(tensor.codes, _tensor_state(tensor))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, agent_code):
+        return agent_code in self._positions
+
+    def with_streak(self, k):
+        """Codes of agents whose current zero-sales streak is at least k months."""
+        start = np.searchsorted(self._sorted_streaks, k, side='left')
+        return self.codes[self._streak_order[start:]]
+
+    def without_sale(self, n):
+        """Codes of agents without a sale in their last n months (including agents who never sold)."""
+        start = np.searchsorted(self._sorted_since_sale, n, side='left')
+        return self.codes[self._since_sale_order[start:]]
+
+    def select(self, min_streak=None, months_without_sale=None):
+        """Codes of agents meeting every given threshold, in agent_code order."""
+        keep = np.ones(len(self.codes), dtype=bool)
+        if min_streak is not None:
+            keep &= self.state['current_streak'] >= min_streak
+        if months_without_sale is not None:
+            with np.errstate(invalid='ignore'):
+                keep &= ~(self.state['last_month'] - self.state['last_sale'] < months_without_sale)
+        return self.codes[keep]
+
+    def agent(self, agent_code):
+        """Streak figures of one agent as a dict (None if unknown)."""
+        if agent_code not in self._positions:
+            return None
+        return self.table([agent_code]).iloc[0].to_dict()
+
+    def table(self, agent_codes=None):
+        """Streak figures per agent, indexed by agent_code.
+
+        Columns: current_zero_streak, longest_zero_streak, months_since_last_sale,
+        months_since_first_sale (NaN if never sold) and last_month.
+        """
+        state = self.state
+        rows = slice(None) if agent_codes is None else [self._positions[code] for code in agent_codes]
+        return pd.DataFrame({
+            'current_zero_streak': state['current_streak'][rows],
+            'longest_zero_streak': state['longest_streak'][rows],
+            'months_since_last_sale': (state['last_month'] - state['last_sale'])[rows],
+            'months_since_first_sale': (state['last_month'] - state['first_sale'])[rows],
+            'last_month': month_dates(state['last_month'][rows]),
+        }, index=pd.Index(self.codes[rows], name='agent_code'))
+
+    def append(self, new_rows, index):
+        """Return a new index with new_rows folded in; this one stays untouched.
+
+        index is the agent index that already includes new_rows. Months later
+        than an agent's latest indexed month (the usual monthly append) are
+        folded into the running state; agents with backfilled months, or not
+        indexed yet, are recomputed from their full history in index.
+        """
+        codes = new_rows['agent_code'].astype(str).to_numpy()
+        months = month_ordinals(new_rows['year_month'])
+        sales = new_rows[SALES_METRIC].to_numpy(dtype=np.float64, na_value=np.nan)
+        order = np.lexsort((months, codes))
+        codes, months, sales = codes[order], months[order], sales[order]
+
+        positions = np.searchsorted(self.codes, codes)
+        known = (positions < len(self.codes)) & (self.codes[np.minimum(positions, len(self.codes) - 1)] == codes)
+        positions = np.where(known, positions, -1)
+        later = known & (months > self.state['last_month'][np.maximum(positions, 0)])
+        # An agent is folded only if every one of their new rows is later than their history
+        redo = np.unique(codes[~later])
+        fold = ~np.isin(codes, redo)
+
+        state = {name: values.copy() for name, values in self.state.items()}
+        # Each pass folds in the next month of every agent that still has one
+        rank = np.arange(len(codes)) - np.searchsorted(codes, codes, side='left')
+        for step in range(int(rank[fold].max()) + 1 if fold.any() else 0):
+            rows = fold & (rank == step)
+            p, month, sale = positions[rows], months[rows], sales[rows]
+            contiguous = month == state['last_month'][p] + 1
+            streak = np.where(sale == 0, np.where(contiguous, state['current_streak'][p] + 1, 1), 0)
+            state['current_streak'][p] = streak
+            state['longest_streak'][p] = np.maximum(state['longest_streak'][p], streak)
+            sold = sale > 0
+            state['last_sale'][p[sold]] = month[sold]
+            never = sold & np.isnan(state['first_sale'][p])
+            state['first_sale'][p[never]] = month[never]
+            state['last_month'][p] = month
+
+        if not len(redo):
+            return StreakIndex(self.codes, state)
+        # Recompute the remaining agents from their whole history and merge them in
+        positions = [np.arange(index.slice(code).start, index.slice(code).stop) for code in redo]
+        sub_index = AgentIndex(index.frame.take(np.concatenate(positions)).reset_index(drop=True), presorted=True)
+        redone = _tensor_state(AgentTensor.from_index(sub_index, metrics=[SALES_METRIC]))
+        keep = ~np.isin(self.codes, sub_index.codes)
+        merged_codes = np.concatenate([self.codes[keep], sub_index.codes.astype(object)])
+        merged_order = np.argsort(merged_codes, kind='stable')
+        merged = {name: np.concatenate([state[name][keep], redone[name].astype(state[name].dtype)])[merged_order]
+                  for name in _STATE}
+        return StreakIndex(merged_codes[merged_order], merged)
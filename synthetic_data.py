@@ -0,0 +1,242 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_ingest import EMPLOYEE_COLUMNS, EMPLOYEE_FILE, TARGET_FILE
+
+START_MONTH = "2023-01"
+N_MONTHS = 21
+# Agent-month rows generated per chunk; bounds memory whatever the total size
+CHUNK_ROWS = 500_000
+# Rows per sheet allowed by Excel, less the header
+EXCEL_MAX_ROWS = 1_048_575
+
+# Share of agents joining during the window (the rest joined up to JOIN_HISTORY months before it)
+LATE_JOIN_RATE = 0.3
+JOIN_HISTORY = 48
+# Share of agents leaving before the window ends
+CHURN_RATE = 0.2
+# Mean months from joining to the first policy sold; earlier months sell nothing
+FIRST_SALE_GAP_MEAN = 3.0
+# NILL months come in streaks: a selling agent falls into a NILL month with a
+# per-agent probability (Beta-distributed, mean ~5%) and stays in it with NILL_STAY
+NILL_ENTER_BETA = (1.2, 24.0)
+NILL_STAY = 0.55
+# Month-to-month persistence of an agent's activity (AR(1) on log effort)
+EFFORT_AR = 0.6
+EFFORT_NOISE = 0.25
+
+# The workbook's int64 measures, in EMPLOYEE_COLUMNS order
+MEASURE_COLUMNS = EMPLOYEE_COLUMNS[6:]
+
+
+def agent_codes(agent_ids, seed=0):
+    """8-hex-digit codes for global agent numbers; unique for up to 2**32 agents.
+
+    Multiplying by an odd constant modulo 2**32 is a bijection, so codes never
+    collide across chunks without any bookkeeping.
+    """
+    ids = np.asarray(agent_ids, dtype=np.uint64)
+    mixed = (ids * np.uint64(0x9E3779B1) + np.uint64(seed * 0x7F4A7C15 + 0x5BD1E995)) & np.uint64(0xFFFFFFFF)
+    return np.char.zfill(np.char.mod('%x', mixed), 8)
+
+
+def _windows(total, rng):
+    # Nested 21 / 15 / 7-day counts drawn out of the monthly total
+    last_21 = rng.binomial(total, 0.6)
+    last_15 = rng.binomial(last_21, 0.65)
+    last_7 = rng.binomial(last_15, 0.5)
+    return last_7, last_15, last_21
+
+
+def _generate_block(first_agent, n_agents, n_months, start, rng, seed):
+    """(employee rows, target rows) for agents first_agent .. first_agent + n_agents - 1."""
+    # --- agent attributes ---
+    late = rng.random(n_agents) < LATE_JOIN_RATE
+    join = np.where(late, rng.integers(0, max(n_months - 1, 1), n_agents), -rng.integers(1, JOIN_HISTORY + 1, n_agents))
+    first_sale = join + rng.geometric(1 / (FIRST_SALE_GAP_MEAN + 1), n_agents) - 1
+    first_row = np.maximum(join, 0)
+    last_row = np.where(rng.random(n_agents) < CHURN_RATE, rng.integers(first_row, n_months), n_months - 1)
+    age = rng.integers(20, 61, n_agents)
+    level = rng.lognormal(0.0, 0.3, n_agents)        # overall activity
+    conversion = rng.lognormal(0.0, 0.2, n_agents)   # policies per proposal
+    premium = rng.lognormal(np.log(45_000), 0.35, n_agents)
+    nill_enter = rng.beta(*NILL_ENTER_BETA, n_agents)
+
+    # --- monthly latent state, (agents, months + 1); the extra month is the target ---
+    steps = n_months + 1
+    log_effort = np.empty((n_agents, steps))
+    log_effort[:, 0] = rng.normal(0.0, EFFORT_NOISE, n_agents)
+    nill = np.empty((n_agents, steps), dtype=bool)
+    nill[:, 0] = rng.random(n_agents) < nill_enter
+    draws = rng.random((n_agents, steps))
+    noise = rng.normal(0.0, EFFORT_NOISE, (n_agents, steps))
+    for t in range(1, steps):
+        log_effort[:, t] = EFFORT_AR * log_effort[:, t - 1] + noise[:, t]
+        nill[:, t] = np.where(nill[:, t - 1], draws[:, t] < NILL_STAY, draws[:, t] < nill_enter)
+    month = np.arange(steps)
+    nill |= month[None, :] < first_sale[:, None]
+
+    # target_data convention: 1 if the agent sells in the month after its last row, 0 = NILL
+    target = (~nill[np.arange(n_agents), last_row + 1]).astype(np.int64)
+
+    # --- agent-month rows, agent-major and month-ordered ---
+    valid = (month[None, :n_months] >= first_row[:, None]) & (month[None, :n_months] <= last_row[:, None])
+    agent_pos, month_idx = np.nonzero(valid)
+    effort = level[agent_pos] * np.exp(log_effort[agent_pos, month_idx])
+    is_nill = nill[agent_pos, month_idx]
+
+    proposals = np.maximum(rng.poisson(17.0 * effort), 1)
+    quotations = np.maximum(rng.binomial(proposals, 0.55) + rng.poisson(4.0, len(proposals)), 1)
+    customers = np.maximum(rng.binomial(quotations, 0.6) + rng.poisson(7.0 * level[agent_pos]), 1)
+    policies = np.where(is_nill, 0, rng.poisson(1.15 * proposals * conversion[agent_pos]))
+    anbp = np.rint(policies * premium[agent_pos] * rng.lognormal(0.0, 0.3, len(policies))).astype(np.int64)
+    income = np.rint(0.15 * anbp + rng.lognormal(np.log(80_000), 0.6, len(policies))).astype(np.int64)
+    holders = rng.poisson(2.0 * customers)
+    cash = rng.poisson(3.3 * holders)
+
+    codes = agent_codes(np.arange(first_agent, first_agent + n_agents), seed)
+    months = start + month_idx.astype('timedelta64[M]')
+    rows = {
+        'row_id': np.arange(len(agent_pos), dtype=np.int64),
+        'agent_code': codes[agent_pos],
+        'agent_age': age[agent_pos],
+        'agent_join_month': (start + join[agent_pos].astype('timedelta64[M]')).astype('datetime64[ns]'),
+        'first_policy_sold_month': (start + first_sale[agent_pos].astype('timedelta64[M]')).astype('datetime64[ns]'),
+        'year_month': months.astype('datetime64[ns]'),
+    }
+    for window_prefix, total_column, total in [('unique_proposals', 'unique_proposal', proposals),
+                                               ('unique_quotations', 'unique_quotations', quotations),
+                                               ('unique_customers', 'unique_customers', customers)]:
+        last_7, last_15, last_21 = _windows(total, rng)
+        rows[f'{window_prefix}_last_7_days'] = last_7
+        rows[f'{window_prefix}_last_15_days'] = last_15
+        rows[f'{window_prefix}_last_21_days'] = last_21
+        rows[total_column] = total
+    rows.update({
+        'new_policy_count': policies,
+        'ANBP_value': anbp,
+        'net_income': income,
+        'number_of_policy_holders': holders,
+        'number_of_cash_payment_policies': cash,
+    })
+    employee = pd.DataFrame(rows)[EMPLOYEE_COLUMNS]
+    employee[MEASURE_COLUMNS] = employee[MEASURE_COLUMNS].astype(np.int64)
+    return employee, pd.DataFrame({'target': target, 'agent_code': codes})
+
+
+def iter_synthetic_chunks(n_agents, n_months=N_MONTHS, start_month=START_MONTH, seed=0, chunk_rows=CHUNK_ROWS):
+    """Yield (employee, target) frames for n_agents synthetic agents, a block of agents at a time.
+
+    Frames have the workbooks' columns and dtypes (agent_code as plain strings).
+    Each block is generated from its own seeded stream, so the output depends
+    only on the arguments, and row_id runs on across blocks.
+    """
+    start = np.datetime64(start_month, 'M')
+    block_agents = max(1, chunk_rows // n_months)
+    next_row_id = 1
+    for block, first_agent in enumerate(range(0, n_agents, block_agents)):
+        rng = np.random.default_rng([seed, block])
+        employee, target = _generate_block(first_agent, min(block_agents, n_agents - first_agent), n_months,
+                                           start, rng, seed)
+        employee['row_id'] += next_row_id
+        next_row_id += len(employee)
+        yield employee, target
+
+
+def generate_employee_data(n_agents, n_months=N_MONTHS, start_month=START_MONTH, seed=0):
+    """Synthetic (employee, target) frames in memory, decoded like the loaded workbooks."""
+    chunks = list(iter_synthetic_chunks(n_agents, n_months, start_month, seed))
+    employee = pd.concat([chunk[0] for chunk in chunks], ignore_index=True)
+    target = pd.concat([chunk[1] for chunk in chunks], ignore_index=True)
+    employee['agent_code'] = employee['agent_code'].astype('category')
+    target['agent_code'] = target['agent_code'].astype('category')
+    return employee, target
+
+
+class _ParquetSink:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path + ".tmp", table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.path + ".tmp", self.path)
+
+
+class _ExcelSink:
+    # openpyxl's write-only mode streams rows to disk instead of holding the sheet
+    def __init__(self, path):
+        from openpyxl import Workbook
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.rows = 0
+
+    def write(self, df):
+        if self.rows == 0:
+            self.sheet.append(list(df.columns))
+        self.rows += len(df)
+        if self.rows > EXCEL_MAX_ROWS:
+            raise ValueError(f"{os.path.basename(self.path)} would exceed Excel's {EXCEL_MAX_ROWS:,} rows; use Parquet")
+        for row in df.itertuples(index=False):
+            self.sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+
+    def close(self):
+        self.workbook.save(self.path + ".tmp")
+        os.replace(self.path + ".tmp", self.path)
+
+
+def write_synthetic_data(out_dir, n_agents, n_months=N_MONTHS, start_month=START_MONTH, seed=0,
+                         fmt="parquet", chunk_rows=CHUNK_ROWS):
+    """Stream synthetic employee and target data to out_dir as Parquet or Excel.
+
+    Files are named like the originals (employee_data / target_data) with the
+    format's extension. Only one chunk is held in memory at a time, so the row
+    count is limited by disk (and, for Excel, by the sheet size). Returns
+    (employee_path, target_path, rows written).
+    """
+    if fmt not in ("parquet", "xlsx"):
+        raise ValueError(f"Unknown format {fmt!r}; expected 'parquet' or 'xlsx'")
+    os.makedirs(out_dir, exist_ok=True)
+    sink = _ParquetSink if fmt == "parquet" else _ExcelSink
+    paths = [os.path.join(out_dir, os.path.splitext(name)[0] + "." + fmt) for name in (EMPLOYEE_FILE, TARGET_FILE)]
+    employee_sink, target_sink = sink(paths[0]), sink(paths[1])
+    rows = 0
+    try:
+        for employee, target in iter_synthetic_chunks(n_agents, n_months, start_month, seed, chunk_rows):
+            employee_sink.write(employee)
+            target_sink.write(target)
+            rows += len(employee)
+    finally:
+        employee_sink.close()
+        target_sink.close()
+    return paths[0], paths[1], rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic agent-month data for load testing.")
+    parser.add_argument("--agents", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=N_MONTHS)
+    parser.add_argument("--start-month", default=START_MONTH, help="First month, YYYY-MM")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=["parquet", "xlsx"], default="parquet")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Agent-month rows per generated chunk")
+    parser.add_argument("--out", default=os.path.join("data", "synthetic"))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    employee_path, target_path, rows = write_synthetic_data(args.out, args.agents, args.months, args.start_month,
+                                                            args.seed, args.format, args.chunk_rows)
+    print(f"Wrote {rows:,} agent-months for {args.agents:,} agents in {time.perf_counter() - start:.1f}s "
+          f"-> {employee_path}, {target_path}")
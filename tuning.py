@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import lightgbm as lgb
+import optuna
+from optuna.storages import JournalStorage
+from optuna.storages.journal import JournalFileBackend
+from sklearn.model_selection import StratifiedKFold
+from data_ingest import CACHE_DIR, EMPLOYEE_FILE, source_key
+from nill_model import MODEL_DIR, LGB_PARAMS, N_FOLDS, NUM_BOOST_ROUND, EARLY_STOPPING_ROUNDS, build_training_set
+
+FOLD_CACHE_DIR = os.path.join(CACHE_DIR, "lgb_folds")
+# Append-only Optuna journal; unlike SQLite it is safe for several worker processes writing at once
+STORAGE_PATH = os.path.join(MODEL_DIR, "tuning.journal")
+STUDY_NAME = "nill-lgbm"
+
+# Dataset construction parameters shared by every trial; feature_pre_filter is
+# off so trials can vary min_data_in_leaf over the same binned datasets
+DATASET_PARAMS = {"feature_pre_filter": False, "verbose": -1}
+
+
+def suggest_params(trial):
+    """The notebook's Optuna search space."""
+    return {
+        "objective": "binary",
+        "metric": "auc",
+        "boosting_type": trial.suggest_categorical("boosting_type", ["gbdt", "dart"]),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.1, log=True),
+        "num_leaves": trial.suggest_int("num_leaves", 31, 127),
+        "max_depth": trial.suggest_int("max_depth", 4, 12),
+        "feature_fraction": trial.suggest_float("feature_fraction", 0.6, 1.0),
+        "bagging_fraction": trial.suggest_float("bagging_fraction", 0.6, 1.0),
+        "bagging_freq": trial.suggest_int("bagging_freq", 1, 10),
+        "min_data_in_leaf": trial.suggest_int("min_data_in_leaf", 20, 100),
+        "lambda_l1": trial.suggest_float("lambda_l1", 0.0, 5.0),
+        "lambda_l2": trial.suggest_float("lambda_l2", 0.0, 5.0),
+        "is_unbalance": True,
+        "verbosity": -1,
+        "random_state": 42,
+    }
+
+
+def prepare_fold_datasets(X, y, cache_key, n_folds=N_FOLDS, cache_dir=FOLD_CACHE_DIR):
+    """Bin every StratifiedKFold split once and save it as LightGBM binary files.
+
+    Returns [(train_path, valid_path), ...]. Files are reused while cache_key
+    (data version, folds, features) is unchanged, so trials and later tuning
+    runs only load pre-binned data.
+    """
+    fold_dir = os.path.join(cache_dir, cache_key)
+    paths = [(os.path.join(fold_dir, f"fold_{i}_train.bin"), os.path.join(fold_dir, f"fold_{i}_valid.bin"))
+             for i in range(n_folds)]
+    if all(os.path.exists(train) and os.path.exists(valid) for train, valid in paths):
+        return paths
+
+    os.makedirs(fold_dir, exist_ok=True)
+    skf = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42)
+    for (train_path, valid_path), (train_idx, val_idx) in zip(paths, skf.split(X, y)):
+        train_data = lgb.Dataset(X.iloc[train_idx], label=y.iloc[train_idx], params=DATASET_PARAMS, free_raw_data=False)
+        valid_data = lgb.Dataset(X.iloc[val_idx], label=y.iloc[val_idx], reference=train_data,
+                                 params=DATASET_PARAMS, free_raw_data=False)
+        # Write to temporary names first so a crash never leaves half a cache behind
+        for dataset, path in [(train_data, train_path), (valid_data, valid_path)]:
+            dataset.save_binary(path + ".tmp")
+            os.replace(path + ".tmp", path)
+    return paths
+
+
+def fold_cache_key(X, n_folds=N_FOLDS):
+    digest = hashlib.sha256(f"{source_key(EMPLOYEE_FILE)}:{n_folds}:{list(X.columns)}:{len(X)}".encode())
+    return digest.hexdigest()[:16]
+
+
+def objective(trial, fold_paths, num_threads=1):
+    """Mean validation AUC over the cached folds; pruned after any fold that trails the median."""
+    params = dict(suggest_params(trial), num_threads=num_threads)
+    aucs = []
+    for step, (train_path, valid_path) in enumerate(fold_paths):
+        train_data = lgb.Dataset(train_path, params=DATASET_PARAMS)
+        valid_data = lgb.Dataset(valid_path, reference=train_data, params=DATASET_PARAMS)
+        booster = lgb.train(
+            params,
+            train_data,
+            valid_sets=[valid_data],
+            num_boost_round=NUM_BOOST_ROUND,
+            callbacks=[lgb.early_stopping(stopping_rounds=EARLY_STOPPING_ROUNDS, verbose=False)],
+        )
+        aucs.append(booster.best_score["valid_0"]["auc"])
+        trial.report(float(np.mean(aucs)), step)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return float(np.mean(aucs))
+
+
+def open_storage(path=STORAGE_PATH):
+    """Journal file storage of the study; each process opens its own."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return JournalStorage(JournalFileBackend(path))
+
+
+def create_study(study_name=STUDY_NAME, storage=STORAGE_PATH):
+    return optuna.create_study(
+        study_name=study_name,
+        storage=open_storage(storage),
+        direction="maximize",
+        sampler=optuna.samplers.TPESampler(seed=42),
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1),
+        load_if_exists=True,
+    )
+
+
+def _run_worker(study_name, storage, fold_paths, n_trials, seed):
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    # Each process samples with its own seed, coordinating through the shared storage
+    study = optuna.load_study(study_name=study_name, storage=open_storage(storage),
+                              sampler=optuna.samplers.TPESampler(seed=seed),
+                              pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1))
+    study.optimize(lambda trial: objective(trial, fold_paths), n_trials=n_trials)
+
+
+def tune(X, y, n_trials=50, workers=None, study_name=STUDY_NAME, storage=STORAGE_PATH):
+    """Run the NILL hyperparameter search in parallel processes sharing one journal study.
+
+    Each trial trains single-threaded on the cached fold binaries, one trial
+    per worker process at a time. Returns the study.
+    """
+    workers = max(1, min(workers or os.cpu_count(), n_trials))
+    fold_paths = prepare_fold_datasets(X, y, fold_cache_key(X))
+    study = create_study(study_name, storage)
+    shares = [n_trials // workers + (1 if i < n_trials % workers else 0) for i in range(workers)]
+    if workers == 1:
+        _run_worker(study_name, storage, fold_paths, n_trials, 42)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_worker, study_name, storage, fold_paths, share, 42 + i)
+                       for i, share in enumerate(shares) if share]
+            for future in futures:
+                future.result()
+    return optuna.load_study(study_name=study_name, storage=open_storage(storage))
+
+
+def best_params(study):
+    """LGB_PARAMS updated with the study's best trial."""
+    return dict(LGB_PARAMS, **study.best_params)
+
+
+if __name__ == "__main__":
+    from data_store import get_store
+    from nill_model import train_nill_model, save_model
+
+    parser = argparse.ArgumentParser(description="Tune the NILL LightGBM parameters with Optuna.")
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parallel trial processes")
+    parser.add_argument("--study", default=STUDY_NAME, help="Study name in the journal storage (resumable)")
+    parser.add_argument("--save-model", action="store_true", help="Train and register a model with the best parameters")
+    args = parser.parse_args()
+
+    employee = get_store().employee()
+    X, y = build_training_set(employee)
+    start = time.perf_counter()
+    study = tune(X, y, args.trials, args.workers, args.study)
+    pruned = sum(trial.state == optuna.trial.TrialState.PRUNED for trial in study.trials)
+    print(f"{len(study.trials)} trials ({pruned} pruned) in {time.perf_counter() - start:.1f}s; "
+          f"best AUC {study.best_value:.4f}")
+    print(json.dumps(study.best_params, indent=2))
+    if args.save_model:
+        model = train_nill_model(employee, params=best_params(study))
+        print(f"Saved NILL model {save_model(model)} (mean fold AUC {model.metadata['mean_auc']:.4f})")
@@ -64,6 +64,14 @@ def navbar():
                         transition: opacity 0.2s;
                         font-weight: 500;
                     ">Agents</a>
+                    <a href="/Risk_Leaderboard" target="_self" style="
+                        text-decoration: none;
+                        color: white;
+                        display: flex;
+                        align-items: center;
+                        transition: opacity 0.2s;
+                        font-weight: 500;
+                    ">Risk Leaderboard</a>
                 </div>
             </nav>
             """,